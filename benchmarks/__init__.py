@@ -0,0 +1,3 @@
+"""
+benchmark suite for properties-tools
+"""
@@ -0,0 +1,76 @@
+"""
+deterministic generator of synthetic properties files
+"""
+
+from pathlib import Path
+from random import Random
+from string import ascii_lowercase, digits
+from typing import Iterator, Tuple
+
+_ALPHABET = ascii_lowercase + digits + "._-/:"
+_WORDS = [
+    "app",
+    "database",
+    "cache",
+    "server",
+    "client",
+    "pool",
+    "timeout",
+    "url",
+    "user",
+    "password",
+    "max",
+    "min",
+    "size",
+    "enabled",
+    "jvm",
+    "options",
+]
+
+
+def iter_properties(
+    keys: int, value_size: int = 16, seed: int = 0
+) -> Iterator[Tuple[str, str]]:
+    """
+    Yield keys/values, keys are unique and not sorted
+    """
+    rnd = Random(seed)
+    for index in range(keys):
+        prefix = ".".join(rnd.choice(_WORDS) for _ in range(rnd.randint(1, 3)))
+        value = "".join(rnd.choices(_ALPHABET, k=rnd.randint(1, 2 * value_size)))
+        yield f"{prefix}.k{index}", value
+
+
+def generate(
+    file: Path,
+    keys: int,
+    value_size: int = 16,
+    comment_ratio: float = 0.05,
+    change_ratio: float = 0.0,
+    seed: int = 0,
+    separator: str = "=",
+):
+    """
+    Write a properties file with the given number of keys, values have an average
+    length of value_size, comment_ratio is the ratio of comment lines per key.
+    With a change_ratio, the same seed generates the same base file where this
+    ratio of keys are updated, deleted or added (one third each).
+    """
+    rnd = Random(seed + 1)
+    changes = Random(f"{seed}-{change_ratio}")
+    with file.open("w") as stream:
+        for key, value in iter_properties(keys, value_size=value_size, seed=seed):
+            if comment_ratio > 0 and rnd.random() < comment_ratio:
+                stream.write(f"# {key} {rnd.random()}\n")
+            if change_ratio > 0 and changes.random() < change_ratio:
+                change = changes.randrange(3)
+                if change == 0:
+                    # update value
+                    value = value[::-1] + "~"
+                elif change == 1:
+                    # delete key
+                    continue
+                else:
+                    # add key
+                    stream.write(f"{key}.new{separator}{value}\n")
+            stream.write(f"{key}{separator}{value}\n")
@@ -0,0 +1,224 @@
+"""
+benchmark suite: time parsing, diff, patch and rendering on generated files
+
+    python -m benchmarks.run --keys 1000 100000 --output results.json
+    python -m benchmarks.run --keys 1000 100000 --compare results.json
+"""
+
+import json
+import os
+import platform
+import sys
+from argparse import ArgumentParser
+from datetime import datetime
+from pathlib import Path
+from statistics import median
+from subprocess import CalledProcessError, run
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Any, Callable, Dict, List, Optional
+
+from properties_tools.color import Color
+from properties_tools.diff import TextRenderer
+from properties_tools.diffing import diff_dicts
+from properties_tools.output import OutputSink
+from properties_tools.patch import Patcher
+from properties_tools.utils import parse_file, propertiesfile_to_dict
+
+from .generator import generate
+
+MODES = ("simple", "diff", "wdiff")
+
+
+def measure(func: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    """
+    Run the function several times and return timings in seconds
+    """
+    timings = []
+    for _ in range(repeat):
+        start = perf_counter()
+        func()
+        timings.append(perf_counter() - start)
+    return {"min": min(timings), "median": median(timings), "max": max(timings)}
+
+
+def git_revision() -> Optional[str]:
+    """
+    Return the current commit of the repository if available
+    """
+    try:
+        process = run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return process.stdout.strip()
+    except (OSError, CalledProcessError):
+        return None
+
+
+def bench_size(
+    folder: Path,
+    keys: int,
+    value_size: int,
+    comment_ratio: float,
+    change_ratio: float,
+    repeat: int,
+) -> List[Dict[str, Any]]:
+    """
+    Generate a couple of files with the given number of keys and run all
+    benchmarks on them
+    """
+    left, right = (
+        folder / f"left-{keys}.properties",
+        folder / f"right-{keys}.properties",
+    )
+    generate(left, keys, value_size=value_size, comment_ratio=comment_ratio)
+    generate(
+        right,
+        keys,
+        value_size=value_size,
+        comment_ratio=comment_ratio,
+        change_ratio=change_ratio,
+    )
+    left_data = propertiesfile_to_dict(left)
+    right_data = propertiesfile_to_dict(right)
+    result = diff_dicts(left_data, right_data)
+    color = Color(False)
+
+    def patch():
+        with open(os.devnull, "w", encoding="utf-8") as devnull:
+            with OutputSink(devnull) as sink:
+                Patcher(right_data, ["add", "update", "delete"], color).apply(
+                    left, sink
+                )
+
+    def render(mode: str):
+        renderer = TextRenderer(color, mode=mode)
+
+        def func():
+            with open(os.devnull, "w", encoding="utf-8") as devnull:
+                with OutputSink(devnull) as sink:
+                    renderer.render(sink, left, right, result)
+
+        return func
+
+    benchmarks = {
+        "parse_file": lambda: sum(1 for _ in parse_file(left)),
+        "propertiesfile_to_dict": lambda: propertiesfile_to_dict(left),
+        "diff": lambda: diff_dicts(left_data, right_data),
+        "patch": patch,
+    }
+    for mode in MODES:
+        benchmarks[f"render_{mode}"] = render(mode)
+
+    out = []
+    try:
+        for name, func in benchmarks.items():
+            timings = measure(func, repeat)
+            out.append(
+                {
+                    "name": name,
+                    "keys": keys,
+                    "size": left.stat().st_size,
+                    "changes": len(result.added)
+                    + len(result.deleted)
+                    + len(result.updated),
+                    **timings,
+                }
+            )
+            print(
+                f"{name:>24} {keys:>10} keys  {timings['median']:10.4f}s",
+                file=sys.stderr,
+            )
+    finally:
+        left.unlink()
+        right.unlink()
+    return out
+
+
+def compare(results: List[Dict[str, Any]], reference: Path):
+    """
+    Print the ratio between the current results and a previous run
+    """
+    previous = {
+        (item["name"], item["keys"]): item
+        for item in json.loads(reference.read_text())["results"]
+    }
+    for item in results:
+        old = previous.get((item["name"], item["keys"]))
+        if old is not None and old["median"] > 0:
+            ratio = item["median"] / old["median"]
+            print(
+                f"{item['name']:>24} {item['keys']:>10} keys  "
+                f"{old['median']:10.4f}s -> {item['median']:10.4f}s  x{ratio:.2f}"
+            )
+
+
+def main(argv: Optional[List[str]] = None):
+    """
+    benchmark cli
+    """
+    parser = ArgumentParser()
+    parser.add_argument(
+        "-k",
+        "--keys",
+        type=int,
+        nargs="+",
+        default=[1000, 10000, 100000],
+        help="number of keys of the generated files, from 1k to 10M",
+    )
+    parser.add_argument("--value-size", type=int, default=16, help="value size")
+    parser.add_argument(
+        "--comment-ratio", type=float, default=0.05, help="comment lines per key"
+    )
+    parser.add_argument(
+        "--change-ratio", type=float, default=0.1, help="ratio of changed keys"
+    )
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="repetitions")
+    parser.add_argument("-o", "--output", type=Path, help="write results as json")
+    parser.add_argument(
+        "-c", "--compare", type=Path, help="compare with a previous json output"
+    )
+    args = parser.parse_args(argv)
+
+    results = []
+    with TemporaryDirectory() as folder:
+        for keys in args.keys:
+            results += bench_size(
+                Path(folder),
+                keys,
+                value_size=args.value_size,
+                comment_ratio=args.comment_ratio,
+                change_ratio=args.change_ratio,
+                repeat=args.repeat,
+            )
+
+    if args.output:
+        args.output.write_text(
+            json.dumps(
+                {
+                    "meta": {
+                        "date": datetime.now().isoformat(timespec="seconds"),
+                        "revision": git_revision(),
+                        "python": platform.python_version(),
+                        "platform": platform.platform(),
+                        "value_size": args.value_size,
+                        "comment_ratio": args.comment_ratio,
+                        "change_ratio": args.change_ratio,
+                        "repeat": args.repeat,
+                    },
+                    "results": results,
+                },
+                indent=2,
+            )
+            + "\n"
+        )
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,13 @@
 """
 project metadata
 """
-from importlib.metadata import version
 
-__version__ = version(__name__)
+
+def __getattr__(name: str):
+    # the version is only resolved when needed, importlib.metadata is slow to import
+    if name == "__version__":
+        # pylint: disable=import-outside-toplevel
+        from importlib.metadata import version
+
+        return version(__name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,183 @@
+"""
+persistent cache of parsed properties files
+"""
+
+import os
+from pathlib import Path
+from typing import Dict, Optional, Pattern
+
+from .utils import ENCODING, file_digest, is_stdin, propertiesfile_to_dict
+
+CACHE_ENV = "PROPERTIES_TOOLS_CACHE"
+CACHE_SIZE_ENV = "PROPERTIES_TOOLS_CACHE_SIZE"
+DEFAULT_CACHE_SIZE = 512 * 1024 * 1024
+CACHE_VERSION = 1
+_SUFFIX = ".pickle"
+
+
+class ParsedCache:
+    """
+    On-disk cache of parsed properties, entries are evicted when the total size
+    of the cache exceeds max_size, least recently used first
+    """
+
+    def __init__(self, folder: Path, max_size: int = DEFAULT_CACHE_SIZE):
+        self.folder = folder
+        self.max_size = max_size
+
+    def entry(
+        self,
+        file: Path,
+        separator: str = "=",
+        comment_char: str = "#",
+        engine: str = "line",
+        keys: Optional[Pattern[str]] = None,
+        encoding: str = ENCODING,
+    ) -> Path:
+        """
+        Return the cache entry of a file, the key is computed from the file path,
+        size, mtime and content, and the parsing options
+        """
+        from hashlib import blake2b  # pylint: disable=import-outside-toplevel
+
+        stat = file.stat()
+        key = blake2b(digest_size=20)
+        for item in (
+            CACHE_VERSION,
+            file.resolve(),
+            stat.st_size,
+            stat.st_mtime_ns,
+            file_digest(file),
+            separator,
+            comment_char,
+            engine,
+            "" if keys is None else keys.pattern,
+            encoding,
+        ):
+            key.update(f"{item}\0".encode())
+        return self.folder / f"{key.hexdigest()}{_SUFFIX}"
+
+    def get(self, entry: Path) -> Optional[Dict[str, str]]:
+        """
+        Return the cached properties or None if the entry does not exist
+        """
+        import pickle  # pylint: disable=import-outside-toplevel
+
+        try:
+            with entry.open("rb") as stream:
+                out = pickle.load(stream)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        # mark the entry as recently used
+        os.utime(entry)
+        return out
+
+    def put(self, entry: Path, data: Dict[str, str]):
+        """
+        Store the properties, then evict old entries if needed
+        """
+        # pylint: disable=import-outside-toplevel
+        import pickle
+        from tempfile import NamedTemporaryFile
+
+        self.folder.mkdir(parents=True, exist_ok=True)
+        with NamedTemporaryFile(
+            dir=self.folder, prefix=".", suffix=".tmp", delete=False
+        ) as stream:
+            pickle.dump(data, stream, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(stream.name, entry)
+        self.evict(keep=entry)
+
+    def evict(self, keep: Optional[Path] = None):
+        """
+        Delete least recently used entries until the cache fits in max_size, the
+        keep entry is never deleted
+        """
+        entries = []
+        for item in self.folder.glob(f"*{_SUFFIX}"):
+            try:
+                stat = item.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, item))
+        total = sum(size for _, size, _ in entries)
+        for _, size, item in sorted(entries):
+            if total <= self.max_size:
+                break
+            if item == keep:
+                continue
+            item.unlink(missing_ok=True)
+            total -= size
+
+    def load(
+        self,
+        file: Path,
+        separator: str = "=",
+        comment_char: str = "#",
+        engine: str = "line",
+        keys: Optional[Pattern[str]] = None,
+        encoding: str = ENCODING,
+    ) -> Dict[str, str]:
+        """
+        Return the properties of a file, from the cache if possible, the standard
+        input is never cached
+        """
+        options = dict(
+            separator=separator,
+            comment_char=comment_char,
+            engine=engine,
+            keys=keys,
+            encoding=encoding,
+        )
+        if is_stdin(file) or not file.is_file():
+            return propertiesfile_to_dict(file, **options)
+        entry = self.entry(file, **options)
+        out = self.get(entry)
+        if out is None:
+            out = propertiesfile_to_dict(file, **options)
+            self.put(entry, out)
+        return out
+
+
+def default_cache(
+    folder: Optional[Path] = None, max_size: Optional[int] = None
+) -> Optional[ParsedCache]:
+    """
+    Return the cache to use, from arguments or environment, None if disabled. The
+    max_size argument is in bytes, the environment variable in MB.
+    """
+    if folder is None and os.getenv(CACHE_ENV):
+        folder = Path(os.environ[CACHE_ENV])
+    if folder is None:
+        return None
+    if max_size is None and os.getenv(CACHE_SIZE_ENV):
+        # in MB, like --cache-size
+        max_size = int(os.environ[CACHE_SIZE_ENV]) * 1024 * 1024
+    if max_size is None:
+        max_size = DEFAULT_CACHE_SIZE
+    return ParsedCache(folder, max_size=max_size)
+
+
+def load_properties(
+    file: Path,
+    separator: str = "=",
+    comment_char: str = "#",
+    cache: Optional[ParsedCache] = None,
+    engine: str = "line",
+    keys: Optional[Pattern[str]] = None,
+    encoding: str = ENCODING,
+) -> Dict[str, str]:
+    """
+    Parse a properties file and return the dict of key:value, using the cache if
+    given, with only the keys selected by the filter if given
+    """
+    options = dict(
+        separator=separator,
+        comment_char=comment_char,
+        engine=engine,
+        keys=keys,
+        encoding=encoding,
+    )
+    if cache is not None:
+        return cache.load(file, **options)
+    return propertiesfile_to_dict(file, **options)
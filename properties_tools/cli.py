@@ -0,0 +1,141 @@
+"""
+helpers shared by the cli entrypoints
+"""
+
+from argparse import SUPPRESS, Action, ArgumentParser, Namespace
+from pathlib import Path
+from typing import Optional
+
+from .cache import (
+    CACHE_ENV,
+    CACHE_SIZE_ENV,
+    DEFAULT_CACHE_SIZE,
+    ParsedCache,
+    default_cache,
+)
+from .timings import PROFILE_ENV, STDERR, TIMINGS_ENV
+from .utils import ENCODING, ENGINES, KEY_REGEX_PREFIX, STDIN
+
+
+class VersionAction(Action):
+    """
+    Like argparse 'version' action, but the version is only resolved when the
+    option is used
+    """
+
+    def __init__(self, option_strings, dest=SUPPRESS, default=SUPPRESS, help=None):
+        # pylint: disable=redefined-builtin
+        super().__init__(
+            option_strings,
+            dest=dest,
+            default=default,
+            nargs=0,
+            help=help or "show program's version number and exit",
+        )
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        from . import __version__  # pylint: disable=import-outside-toplevel
+
+        print(f"{parser.prog} {__version__}")
+        parser.exit()
+
+
+def add_instrument_arguments(parser: ArgumentParser):
+    """
+    Add the --timings, --timings-file, --tracemalloc and --profile options, see
+    timings.instrument
+    """
+    timings_group = parser.add_mutually_exclusive_group()
+    timings_group.add_argument(
+        "--timings",
+        action="store_const",
+        const=STDERR,
+        help=f"report wall time per phase, counters and peak memory on stderr, default is ${TIMINGS_ENV} if set, to '1' or a json file",
+    )
+    timings_group.add_argument(
+        "--timings-file",
+        dest="timings",
+        metavar="FILE",
+        help="write the timings report as json in FILE",
+    )
+    parser.add_argument(
+        "--tracemalloc",
+        action="store_true",
+        help="trace python allocations for the timings peak memory, slows the run down",
+    )
+    parser.add_argument(
+        "--profile",
+        type=Path,
+        metavar="FILE",
+        help=f"dump cProfile stats of the run to FILE, default is ${PROFILE_ENV} if set",
+    )
+
+
+def add_engine_argument(parser: ArgumentParser):
+    """
+    Add the --engine option, see utils.propertiesfile_to_dict
+    """
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default="line",
+        help="parsing engine: line by line (line), bulk parsing with regular expressions (regex) or full Java properties grammar (java) which ignores --sep, default is 'line'",
+    )
+
+
+def add_cache_arguments(parser: ArgumentParser):
+    """
+    Add the --cache and --cache-size options, see cache_from_args
+    """
+    parser.add_argument(
+        "--cache",
+        type=Path,
+        metavar="DIR",
+        help=f"cache parsed files in the given directory, default is ${CACHE_ENV} if set",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        metavar="MB",
+        help=f"maximum size of the cache in MB, least recently used entries are evicted, default is ${CACHE_SIZE_ENV} if set, or {DEFAULT_CACHE_SIZE // 1024 // 1024}",
+    )
+
+
+def cache_from_args(args: Namespace) -> Optional[ParsedCache]:
+    """
+    Return the cache of the --cache and --cache-size options, see
+    cache.default_cache
+    """
+    return default_cache(
+        args.cache,
+        args.cache_size * 1024 * 1024 if args.cache_size is not None else None,
+    )
+
+
+def add_encoding_argument(parser: ArgumentParser):
+    """
+    Add the --encoding option, see utils.open_text
+    """
+    parser.add_argument(
+        "--encoding",
+        default=ENCODING,
+        help=f"encoding of the properties files, default is '{ENCODING}'. Files compressed with gzip, bzip2 or xz are decoded, '{STDIN}' reads the standard input",
+    )
+
+
+def add_filter_arguments(parser: ArgumentParser):
+    """
+    Add the --include and --exclude options, see utils.key_filter
+    """
+    parser.add_argument(
+        "--include",
+        action="append",
+        metavar="PATTERN",
+        help=f"only consider the keys matching the glob pattern, or the regular expression prefixed with '{KEY_REGEX_PREFIX}'",
+    )
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        metavar="PATTERN",
+        help=f"ignore the keys matching the glob pattern, or the regular expression prefixed with '{KEY_REGEX_PREFIX}'",
+    )
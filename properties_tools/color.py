@@ -1,9 +1,23 @@
 # pylint: disable=missing-function-docstring,missing-module-docstring
 import sys
 from dataclasses import dataclass
-from typing import Any, Optional
+from functools import lru_cache
+from typing import Any, Dict, Optional
 
-from colorama import Fore, Style
+
+@lru_cache(maxsize=None)
+def _styles() -> Dict[str, str]:
+    # colorama is only imported when colors are actually used
+    from colorama import Fore, Style  # pylint: disable=import-outside-toplevel
+
+    return {
+        "red": Fore.RED,
+        "green": Fore.GREEN,
+        "yellow": Fore.YELLOW,
+        "blue": Fore.BLUE,
+        "grey": Style.DIM,
+        "reset": Style.RESET_ALL,
+    }
 
 
 @dataclass
@@ -21,20 +35,21 @@ class Color:
     def _tostring(self, *messages: str, style: Optional[str] = None, sep: str = " "):
         text = sep.join(map(str, messages))
         if self.enabled and style:
-            return f"{style}{text}{Style.RESET_ALL}"
+            styles = _styles()
+            return f"{styles[style]}{text}{styles['reset']}"
         return text
 
     def red(self, *data: Any, **kwargs):
-        return self._tostring(*data, style=Fore.RED, **kwargs)
+        return self._tostring(*data, style="red", **kwargs)
 
     def green(self, *data: Any, **kwargs):
-        return self._tostring(*data, style=Fore.GREEN, **kwargs)
+        return self._tostring(*data, style="green", **kwargs)
 
     def yellow(self, *data: Any, **kwargs):
-        return self._tostring(*data, style=Fore.YELLOW, **kwargs)
+        return self._tostring(*data, style="yellow", **kwargs)
 
     def blue(self, *data: Any, **kwargs):
-        return self._tostring(*data, style=Fore.BLUE, **kwargs)
+        return self._tostring(*data, style="blue", **kwargs)
 
     def grey(self, *data: Any, **kwargs):
-        return self._tostring(*data, style=Style.DIM, **kwargs)
+        return self._tostring(*data, style="grey", **kwargs)
@@ -0,0 +1,179 @@
+"""
+decision files: the full change plan of a patch, reviewed in bulk then replayed
+without prompts
+"""
+
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from .patching import ADD, DELETE, KEEP, UPDATE, PatchPlanner
+from .utils import ENCODING, file_digest, key_matcher
+
+DECISIONS_VERSION = 1
+ACCEPT = "accept"
+REJECT = "reject"
+
+
+@dataclass
+class PlannedChange:
+    """
+    A change of a source file and the decision to apply it, a missing value is None
+    """
+
+    action: str
+    key: str
+    old: Optional[str] = None
+    new: Optional[str] = None
+    decision: str = ACCEPT
+
+    def is_accepted(self) -> bool:
+        return self.decision == ACCEPT
+
+
+@dataclass
+class SourcePlan:
+    """
+    Changes of a source file in the order they apply, with the resolved path and
+    the digest of the source content they were computed from
+    """
+
+    source: str
+    digest: str
+    changes: List[PlannedChange] = field(default_factory=list)
+
+    def verify(self, source: Path):
+        """
+        Check the source file content has not changed since the plan was made
+        """
+        if file_digest(source) != self.digest:
+            raise ValueError(f"{source} has changed since the plan was written")
+
+    def patches(self) -> Dict[str, str]:
+        """
+        Return the new values of added and updated keys
+        """
+        return {c.key: c.new for c in self.changes if c.new is not None}
+
+    def decisions(self) -> Dict[str, bool]:
+        """
+        Return for every changed key if the change is accepted
+        """
+        return {c.key: c.is_accepted() for c in self.changes}
+
+
+class DecisionPlanner(PatchPlanner):
+    """
+    Replay planner: actions come from the plan instead of comparing values with
+    patches, source properties not in the plan are kept
+    """
+
+    def __init__(self, plan: SourcePlan):
+        super().__init__(plan.patches())
+        self._actions = {c.key: c.action for c in plan.changes if c.action != ADD}
+        self._added = [c.key for c in plan.changes if c.action == ADD]
+
+    def classify(self, key: str, value: str) -> str:
+        return self._actions.get(key, KEEP)
+
+    def additions(self) -> List[str]:
+        return list(self._added)
+
+
+def decide(
+    changes: Iterable[PlannedChange],
+    accept: Optional[Iterable[str]] = None,
+    reject: Optional[Iterable[str]] = None,
+    default: Optional[str] = None,
+):
+    """
+    Set the decisions of changes by key glob patterns: changes matching a reject
+    pattern are rejected, then changes matching an accept pattern are accepted,
+    other changes get the default decision if given or keep theirs
+    """
+    accepted, rejected = key_matcher(accept or ()), key_matcher(reject or ())
+    for change in changes:
+        if rejected is not None and rejected(change.key):
+            change.decision = REJECT
+        elif accepted is not None and accepted(change.key):
+            change.decision = ACCEPT
+        elif default is not None:
+            change.decision = default
+
+
+@dataclass
+class DecisionFile:
+    """
+    Plans of the patched source files, with the options used to parse them
+    """
+
+    separator: str = "="
+    engine: str = "line"
+    encoding: str = ENCODING
+    sources: List[SourcePlan] = field(default_factory=list)
+
+    def find(self, source: Path) -> SourcePlan:
+        """
+        Return the plan of a source file, paths are compared once resolved so
+        that a plan can be replayed from another directory
+        """
+        resolved = source.resolve()
+        for plan in self.sources:
+            if Path(plan.source).resolve() == resolved:
+                return plan
+        raise ValueError(f"Cannot find {source} in the plan")
+
+    def save(self, file: Path):
+        """
+        Write the plan as json with one change per line, to be reviewed and edited
+        """
+
+        def members(data: Dict[str, Any]) -> str:
+            return ", ".join(
+                f"{json.dumps(key)}: {json.dumps(value, ensure_ascii=False)}"
+                for key, value in data.items()
+            )
+
+        header = {
+            "version": DECISIONS_VERSION,
+            "separator": self.separator,
+            "engine": self.engine,
+            "encoding": self.encoding,
+        }
+        with file.open("w", encoding=ENCODING) as stream:
+            stream.write(f'{{{members(header)}, "sources": [')
+            for position, plan in enumerate(self.sources):
+                stream.write("," if position > 0 else "")
+                source = {"source": plan.source, "digest": plan.digest}
+                stream.write(f'\n{{{members(source)}, "changes": [')
+                stream.write(
+                    ",".join(f"\n{{{members(vars(c))}}}" for c in plan.changes)
+                )
+                stream.write("\n]}")
+            stream.write("\n]}\n")
+
+    @classmethod
+    def load(cls, file: Path) -> "DecisionFile":
+        """
+        Read a plan, actions and decisions are checked
+        """
+        data = json.loads(file.read_text(encoding=ENCODING))
+        if data.get("version") != DECISIONS_VERSION:
+            raise ValueError(f"Unsupported plan version in {file}")
+        out = cls(
+            separator=data["separator"],
+            engine=data["engine"],
+            encoding=data.get("encoding", ENCODING),
+        )
+        for item in data["sources"]:
+            plan = SourcePlan(item["source"], item["digest"])
+            for fields in item["changes"]:
+                change = PlannedChange(**fields)
+                if change.action not in (ADD, UPDATE, DELETE):
+                    raise ValueError(f"Invalid action {change.action} in {file}")
+                if change.decision not in (ACCEPT, REJECT):
+                    raise ValueError(f"Invalid decision {change.decision} in {file}")
+                plan.changes.append(change)
+            out.sources.append(plan)
+        return out
@@ -2,24 +2,473 @@
 diff cli tool entrypoint
 """
 
+import json
+import os
 import sys
-from argparse import ArgumentParser
+from contextlib import ExitStack
+from functools import partial
 from pathlib import Path
-from typing import List, Optional
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Pattern,
+    Tuple,
+    Union,
+)
 
-from . import __version__
+from .cache import ParsedCache, load_properties
 from .color import Color
-from .utils import file_date, propertiesfile_to_dict
+from .diffing import (
+    ADDED,
+    DELETED,
+    UPDATED,
+    DiffResult,
+    collect_diff,
+    iter_diff,
+    pair_files,
+    same_content,
+)
+from .output import LineTemplate, OutputSink
+from .snapshot import Snapshot, diff_snapshot, is_snapshot
+from .sorting import (
+    RUN_SIZE,
+    Change,
+    SortedProperties,
+    Spool,
+    iter_blocks,
+    iter_sorted_diff,
+)
+from .timings import instrument
+from .tokens import DELIMITERS, diff_tokens
+from .utils import ENCODING, file_date, is_stdin, key_filter
+
+FORMATS = ("text", "json", "jsonl")
+
+Values = Tuple[str, Optional[str], Optional[str]]
+
+
+class _Section:
+    """
+    (key, left value, right value) of the keys of a section of a diff result, the
+    values are only looked up while iterating
+    """
+
+    def __init__(
+        self,
+        keys: List[str],
+        left: Optional[Mapping[str, str]] = None,
+        right: Optional[Mapping[str, str]] = None,
+    ):
+        self.keys = keys
+        self.left = left
+        self.right = right
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __iter__(self) -> Iterator[Values]:
+        left, right = self.left, self.right
+        for key in self.keys:
+            yield (
+                key,
+                None if left is None else left.get(key, ""),
+                None if right is None else right.get(key, ""),
+            )
+
+
+Section = Union[_Section, Spool[Values]]
+
+
+class TextRenderer:
+    """
+    Render a diff result using simple, diff or wdiff format
+    """
+
+    def __init__(
+        self,
+        color: Color,
+        mode: str = "wdiff",
+        separator: str = "=",
+        quote: bool = False,
+        quiet: bool = False,
+        sections: Optional[List[str]] = None,
+        delimiters: Optional[str] = None,
+    ):
+        self.color = color
+        self.mode = mode
+        self.separator = separator
+        self.quote = quote
+        self.quiet = quiet
+        self.sections = sections
+        self.delimiters = delimiters
+        if mode == "simple":
+            self.deleted_line = LineTemplate(style=color.red)
+            self.added_line = LineTemplate(style=color.green)
+        elif mode == "diff":
+            self.deleted_line = LineTemplate("- ", style=color.red)
+            self.added_line = LineTemplate("+ ", style=color.green)
+        else:
+            self.deleted_line = LineTemplate("[-", "-]", style=color.red)
+            self.added_line = LineTemplate("{+", "+}", style=color.green)
+
+    def _value(self, text: Optional[str]):
+        return f'"{text}"' if self.quote else text
+
+    def _header(self, marker: str, file: Path, side: str):
+        return " ".join(
+            (
+                self.color.yellow(marker),
+                self.color.yellow(file),
+                f"({side})",
+                "  ",
+                file_date(file),
+            )
+        )
+
+    def _show(self, section: str):
+        return self.sections is None or section in self.sections
+
+    def _wdiff(self, old: str, new: str) -> str:
+        """
+        Changed tokens of an updated value, or the whole values if there are no
+        delimiters or the values cannot be compared token by token
+        """
+        chunks = None
+        if self.delimiters is not None:
+            chunks = diff_tokens(old, new, delimiters=self.delimiters)
+        if chunks is None:
+            return self.deleted_line(old) + self.added_line(new)
+        return "".join(
+            (
+                text
+                if tag is None
+                else (
+                    self.deleted_line(text) if tag == DELETED else self.added_line(text)
+                )
+            )
+            for tag, text in chunks
+        )
+
+    def only_in(self, sink: OutputSink, folder: Path, side: str, path: Path):
+        """
+        Write a file found in one directory only
+        """
+        style = self.color.red if side == "left" else self.color.green
+        sink.write(style(f"Only in {folder} ({side}): {path}"))
+
+    def render_changes(
+        self,
+        sink: OutputSink,
+        left: Path,
+        right: Path,
+        left_data: Mapping[str, str],
+        right_data: Mapping[str, str],
+        changes: Iterable[Tuple[str, str]],
+        path: Optional[Path] = None,
+    ):
+        """
+        Collect the changes then write the differences, changes are grouped by
+        section
+        """
+        self.render(
+            sink, left, right, collect_diff(left_data, right_data, changes), path=path
+        )
+
+    def close(self, sink: OutputSink):
+        pass
+
+    def render(
+        self,
+        sink: OutputSink,
+        left: Path,
+        right: Path,
+        result: DiffResult,
+        path: Optional[Path] = None,
+    ):
+        """
+        Write the differences between left and right files to the sink
+        """
+        self.render_sections(
+            sink,
+            left,
+            right,
+            _Section(result.deleted, left=result.left),
+            _Section(result.added, right=result.right),
+            _Section(result.updated, left=result.left, right=result.right),
+        )
+
+    def render_values(
+        self,
+        sink: OutputSink,
+        left: Path,
+        right: Path,
+        changes: Iterable[Change],
+        path: Optional[Path] = None,
+    ):
+        """
+        Write the differences from (change, key, left value, right value) in key
+        order, sections are spooled to temporary files instead of memory
+        """
+        with Spool() as deleted, Spool() as added, Spool() as updated:
+            sections = {DELETED: deleted, ADDED: added, UPDATED: updated}
+            for change, key, left_value, right_value in changes:
+                sections[change].append((key, left_value, right_value))
+            self.render_sections(sink, left, right, deleted, added, updated)
+
+    def render_sections(
+        self,
+        sink: OutputSink,
+        left: Path,
+        right: Path,
+        deleted: Section,
+        added: Section,
+        updated: Section,
+    ):
+        """
+        Write the sections of (key, left value, right value) in key order, sections
+        are sized and can be iterated twice
+        """
+        color, sep, value = self.color, self.separator, self._value
+        deleted_line, added_line = self.deleted_line, self.added_line
+
+        if len(deleted) == 0 and len(added) == 0 and len(updated) == 0:
+            sink.write(f"Files {left} and {right} are similar")
+            return
+
+        if not self.quiet:
+            if self.mode == "simple":
+                sink.write(self._header("***", left, "left"))
+                sink.write(self._header("***", right, "right"))
+            else:
+                sink.write(self._header("---", left, "left"))
+                sink.write(self._header("+++", right, "right"))
+
+        if len(deleted) and self._show(DELETED):
+            sink.write(color.blue(f"# Only in {left} (left)"))
+            for key, old, _ in deleted:
+                sink.write(deleted_line(key, sep, value(old)))
+
+        if len(added) and self._show(ADDED):
+            sink.write(color.blue(f"# Only in {right} (right)"))
+            for key, _, new in added:
+                sink.write(added_line(key, sep, value(new)))
+
+        if len(updated) and self._show(UPDATED):
+            sink.write(color.blue(f"# Updated from {left} (left) to {right} (right)"))
+            if self.mode == "simple":
+                for key, old, _ in updated:
+                    sink.write(deleted_line(key, sep, value(old)))
+                for key, _, new in updated:
+                    sink.write(added_line(key, sep, value(new)))
+            elif self.mode == "diff":
+                for key, old, new in updated:
+                    sink.write(deleted_line(key, sep, value(old)))
+                    sink.write(added_line(key, sep, value(new)))
+            else:
+                for key, old, new in updated:
+                    sink.write(key + sep + self._wdiff(value(old), value(new)))
+
+
+class JsonRenderer:
+    """
+    Render diff results as records: one record per added, deleted or updated key
+    in key order, then a summary record for every pair of files. Records are
+    written as json lines (jsonl) or as items of a json array (json), as soon as
+    changes are computed.
+    """
+
+    def __init__(self, lines: bool = True, sections: Optional[List[str]] = None):
+        self.lines = lines
+        self.sections = sections
+        self._count = 0
+
+    def _write(self, sink: OutputSink, record: Dict[str, Any]):
+        text = json.dumps(record, ensure_ascii=False)
+        if not self.lines:
+            text = ("[" if self._count == 0 else ",") + text
+        self._count += 1
+        sink.write(text)
+
+    def only_in(self, sink: OutputSink, folder: Path, side: str, path: Path):
+        """
+        Write a file found in one directory only
+        """
+        self._write(sink, {"type": f"only_in_{side}", "file": str(path)})
+
+    def render_changes(
+        self,
+        sink: OutputSink,
+        left: Path,
+        right: Path,
+        left_data: Mapping[str, str],
+        right_data: Mapping[str, str],
+        changes: Iterable[Tuple[str, str]],
+        path: Optional[Path] = None,
+    ):
+        """
+        Write a record for every change of the selected sections, then the summary
+        """
+        sections = self.sections
+        self.render_values(
+            sink,
+            left,
+            right,
+            (
+                (
+                    (change, key, None, None)
+                    if sections is not None and change not in sections
+                    else (
+                        change,
+                        key,
+                        left_data[key] if change != ADDED else None,
+                        right_data[key] if change != DELETED else None,
+                    )
+                )
+                for change, key in changes
+            ),
+            path=path,
+        )
+
+    def render_values(
+        self,
+        sink: OutputSink,
+        left: Path,
+        right: Path,
+        changes: Iterable[Change],
+        path: Optional[Path] = None,
+    ):
+        """
+        Write a record for every (change, key, left value, right value) of the
+        selected sections, then the summary
+        """
+        counts = {ADDED: 0, DELETED: 0, UPDATED: 0}
+        file = {} if path is None else {"file": str(path)}
+        for change, key, left_value, right_value in changes:
+            counts[change] += 1
+            if self.sections is None or change in self.sections:
+                record: Dict[str, Any] = {"type": change, **file, "key": key}
+                if change != ADDED:
+                    record["left"] = left_value
+                if change != DELETED:
+                    record["right"] = right_value
+                self._write(sink, record)
+        self._write(
+            sink,
+            {
+                "type": "summary",
+                **file,
+                "left_file": str(left),
+                "right_file": str(right),
+                **counts,
+                "similar": sum(counts.values()) == 0,
+            },
+        )
+
+    def render(
+        self,
+        sink: OutputSink,
+        left: Path,
+        right: Path,
+        result: DiffResult,
+        path: Optional[Path] = None,
+    ):
+        """
+        Write the records of a diff result
+        """
+        self.render_changes(
+            sink, left, right, result.left, result.right, result.changes(), path=path
+        )
+
+    def close(self, sink: OutputSink):
+        """
+        Terminate the json array, once all results are written
+        """
+        if not self.lines:
+            sink.write("]" if self._count > 0 else "[]")
+
+
+def iter_pair(
+    left: Path,
+    right: Path,
+    separator: str = "=",
+    cache: Optional[ParsedCache] = None,
+    engine: str = "line",
+    keys: Optional[Pattern[str]] = None,
+    encoding: str = ENCODING,
+) -> Tuple[Mapping[str, str], Mapping[str, str], Iterator[Tuple[str, str]]]:
+    """
+    Load two files, both files must contain at least one property unless keys are
+    filtered, and return their properties with an iterator over the changes. When
+    both files have the same content, only the left file is parsed.
+    """
+    options: Dict[str, Any] = dict(
+        separator=separator, cache=cache, engine=engine, keys=keys, encoding=encoding
+    )
+    left_data = load_properties(left, **options)
+    assert keys is not None or len(left_data) > 0, f"Cannot find any property in {left}"
+    if same_content(left, right):
+        return left_data, left_data, iter(())
+    right_data = load_properties(right, **options)
+    assert (
+        keys is not None or len(right_data) > 0
+    ), f"Cannot find any property in {right}"
+    return left_data, right_data, iter_diff(left_data, right_data)
+
+
+def diff_pair(
+    left: Path,
+    right: Path,
+    separator: str = "=",
+    compact: bool = False,
+    cache: Optional[ParsedCache] = None,
+    engine: str = "line",
+    keys: Optional[Pattern[str]] = None,
+    encoding: str = ENCODING,
+) -> DiffResult:
+    """
+    Compare two files, both files must contain at least one property unless keys
+    are filtered. When both files have the same content, only the left file is
+    parsed.
+    """
+    out = collect_diff(
+        *iter_pair(
+            left,
+            right,
+            separator=separator,
+            cache=cache,
+            engine=engine,
+            keys=keys,
+            encoding=encoding,
+        )
+    )
+    return out.compact() if compact else out
 
 
 def run(argv: Optional[List[str]] = None):
     """
     diff cli
     """
-    parser = ArgumentParser()
-    parser.add_argument(
-        "--version", action="version", version=f"%(prog)s {__version__}"
+    # pylint: disable=import-outside-toplevel
+    from argparse import ArgumentParser
+    from concurrent.futures import ProcessPoolExecutor
+
+    from .cli import (
+        VersionAction,
+        add_cache_arguments,
+        add_encoding_argument,
+        add_engine_argument,
+        add_filter_arguments,
+        add_instrument_arguments,
+        cache_from_args,
     )
+
+    parser = ArgumentParser()
+    parser.add_argument("--version", action=VersionAction)
     parser.add_argument(
         "-q",
         "--quiet",
@@ -31,6 +480,12 @@ def run(argv: Optional[List[str]] = None):
         action="store_true",
         help='use double quotes for values, example: foo="bar"',
     )
+    parser.add_argument(
+        "--format",
+        choices=FORMATS,
+        default="text",
+        help="output format: text, a json array (json) or json lines (jsonl) with one record per change and a summary record, default is 'text'",
+    )
     color_group = parser.add_mutually_exclusive_group()
     color_group.add_argument(
         "--color",
@@ -47,11 +502,14 @@ def run(argv: Optional[List[str]] = None):
         help="disable colors",
     )
 
+    add_engine_argument(parser)
+    add_cache_arguments(parser)
     parser.add_argument(
         "--sep",
         default="=",
         help="key/value separator, default is '='",
     )
+    add_encoding_argument(parser)
     mode_group = parser.add_mutually_exclusive_group()
     mode_group.add_argument(
         "-m",
@@ -81,6 +539,16 @@ def run(argv: Optional[List[str]] = None):
         const="simple",
         help="use simple format to show differences",
     )
+    parser.add_argument(
+        "--tokens",
+        action="store_true",
+        help="in wdiff mode, only highlight the changed tokens of updated values, long or very different values are shown whole",
+    )
+    parser.add_argument(
+        "--delimiters",
+        default=DELIMITERS,
+        help=f"characters splitting values into tokens for --tokens, default is {DELIMITERS!r}",
+    )
     parser.add_argument(
         "-A",
         "--added",
@@ -105,128 +573,248 @@ def run(argv: Optional[List[str]] = None):
         const="updated",
         help="print updated properties",
     )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count(),
+        help="number of parallel jobs to compare directories, default is the number of cpus",
+    )
+    parser.add_argument(
+        "--glob",
+        default="*.properties",
+        help="pattern of the files to compare in directories, default is '*.properties'",
+    )
+    parser.add_argument(
+        "--external",
+        action="store_true",
+        help="compare files larger than memory: properties are sorted by key into temporary runs on disk, in $TMPDIR, then merge-joined, files already sorted by key are not sorted again",
+    )
+    parser.add_argument(
+        "--run-size",
+        type=int,
+        default=RUN_SIZE // 1024 // 1024,
+        metavar="MB",
+        help=f"memory budget of the runs of each file with --external, default is {RUN_SIZE // 1024 // 1024}",
+    )
+    add_filter_arguments(parser)
+    add_instrument_arguments(parser)
     parser.add_argument(
         "left",
         type=Path,
         metavar="left.properties",
-        help="left file to compare",
+        help="left file or directory to compare, '-' for the standard input",
+    )
+    parser.add_argument(
+        "--save-snapshot",
+        type=Path,
+        metavar="SNAPSHOT",
+        help="save a snapshot of left.properties to compare other files with it later, using the snapshot as left file",
     )
     parser.add_argument(
         "right",
         type=Path,
+        nargs="?",
         metavar="right.properties",
-        help="right file to compare",
+        help="right file or directory to compare, '-' for the standard input",
     )
 
     args = parser.parse_args(argv)
+    if args.save_snapshot is not None and args.right is not None:
+        parser.error("--save-snapshot only expects left.properties")
+    if args.save_snapshot is None and args.right is None:
+        parser.error("the following arguments are required: right.properties")
+    if args.right is not None and is_stdin(args.left) and is_stdin(args.right):
+        parser.error("the standard input can only be read once")
+    if args.tokens and (args.format != "text" or args.mode != "wdiff"):
+        parser.error("--tokens is only available in wdiff mode")
+    if args.external and args.save_snapshot is not None:
+        parser.error("--external only compares two files")
+    if args.external and args.cache is not None:
+        parser.error("--external does not use the cache")
+    if args.run_size < 1:
+        parser.error("--run-size must be at least 1")
+    cache = cache_from_args(args)
 
     color = Color(args.color)
+    renderer: Union[TextRenderer, JsonRenderer]
+    if args.format == "text":
+        renderer = TextRenderer(
+            color,
+            mode=args.mode,
+            separator=args.sep,
+            quote=args.quote,
+            quiet=args.quiet,
+            sections=args.sections,
+            delimiters=args.delimiters if args.tokens else None,
+        )
+    else:
+        renderer = JsonRenderer(lines=args.format == "jsonl", sections=args.sections)
 
-    def quote(data: dict, key: str):
-        text = data.get(key, "")
-        return f'"{text}"' if args.quote else text
-
-    try:
-        left = propertiesfile_to_dict(args.left, separator=args.sep)
-        assert len(left) > 0, f"Cannot find any property in {args.left}"
-        right = propertiesfile_to_dict(args.right, separator=args.sep)
-        assert len(right) > 0, f"Cannot find any property in {args.right}"
-
-        added = [key for key in sorted(right) if key not in left]
-        deleted = [key for key in sorted(left) if key not in right]
-        modified = [
-            key for key in sorted(left) if key in right and left[key] != right[key]
-        ]
-        if len(added) == 0 and len(deleted) == 0 and len(modified) == 0:
-            print(f"Files {args.left} and {args.right} are similar")
-        else:
-            if not args.quiet:
-                if args.mode == "simple":
-                    print(
-                        color.yellow("***"),
-                        color.yellow(args.left),
-                        "(left)",
-                        "  ",
-                        file_date(args.left),
-                    )
-                    print(
-                        color.yellow("***"),
-                        color.yellow(args.right),
-                        "(right)",
-                        "  ",
-                        file_date(args.right),
+    with instrument(
+        args.timings, args.profile, trace_memory=args.tracemalloc, rest="render"
+    ) as timings, ExitStack() as stack:
+        sink = OutputSink(timings.stream("print", sys.stdout))
+        try:
+            keys = key_filter(args.include or (), args.exclude or ())
+            if args.save_snapshot is not None:
+                with timings.phase("parse"):
+                    snapshot = Snapshot.build(
+                        args.left,
+                        separator=args.sep,
+                        keys=keys,
+                        encoding=args.encoding,
+                        engine=args.engine,
                     )
+                with timings.phase("write"):
+                    snapshot.save(args.save_snapshot)
+                timings.count("left_keys", len(snapshot.keys))
+            elif args.external:
+                if args.left.is_dir() or args.right.is_dir() or is_snapshot(args.left):
+                    raise ValueError("--external only compares two properties files")
+                if same_content(args.left, args.right):
+                    # only look for the first property
+                    assert keys is not None or any(
+                        iter_blocks(
+                            args.left,
+                            separator=args.sep,
+                            engine=args.engine,
+                            encoding=args.encoding,
+                        )
+                    ), f"Cannot find any property in {args.left}"
+                    values: Iterator[Change] = iter(())
                 else:
-                    print(
-                        color.yellow("---"),
-                        color.yellow(args.left),
-                        "(left)",
-                        "  ",
-                        file_date(args.left),
+                    options: Dict[str, Any] = dict(
+                        separator=args.sep,
+                        engine=args.engine,
+                        keys=keys,
+                        run_size=args.run_size * 1024 * 1024,
+                        encoding=args.encoding,
                     )
-                    print(
-                        color.yellow("+++"),
-                        color.yellow(args.right),
-                        "(right)",
-                        "  ",
-                        file_date(args.right),
+                    with timings.phase("sort"):
+                        left_sorted = stack.enter_context(
+                            SortedProperties(args.left, **options)
+                        )
+                        assert (
+                            keys is not None or left_sorted.properties > 0
+                        ), f"Cannot find any property in {args.left}"
+                        right_sorted = stack.enter_context(
+                            SortedProperties(args.right, **options)
+                        )
+                        assert (
+                            keys is not None or right_sorted.properties > 0
+                        ), f"Cannot find any property in {args.right}"
+                    timings.count("left_runs", len(left_sorted.runs))
+                    timings.count("right_runs", len(right_sorted.runs))
+                    values = iter_sorted_diff(left_sorted, right_sorted)
+                renderer.render_values(
+                    sink,
+                    args.left,
+                    args.right,
+                    timings.iterate("diff", values, counter="changes"),
+                )
+            elif is_snapshot(args.left):
+                with timings.phase("parse"):
+                    snapshot = Snapshot.load(args.left)
+                    if (snapshot.engine == "java") != (args.engine == "java"):
+                        raise ValueError(
+                            f"Snapshot {args.left} was taken with the {snapshot.engine} engine"
+                        )
+                    right = load_properties(
+                        args.right,
+                        separator=args.sep,
+                        cache=cache,
+                        engine=args.engine,
+                        keys=keys,
+                        encoding=args.encoding,
                     )
-
-            if len(deleted) and (args.sections is None or "deleted" in args.sections):
-                print(color.blue(f"# Only in {args.left} (left)"))
-                if args.mode == "simple":
-                    for key in deleted:
-                        print(color.red(f"{key}{args.sep}{quote(left, key)}"))
-                elif args.mode == "diff":
-                    for key in deleted:
-                        print(color.red(f"- {key}{args.sep}{quote(left, key)}"))
-                elif args.mode == "wdiff":
-                    for key in deleted:
-                        print(color.red(f"[-{key}{args.sep}{quote(left, key)}-]"))
-
-            if len(added) and (args.sections is None or "added" in args.sections):
-                print(color.blue(f"# Only in {args.right} (right)"))
-                if args.mode == "simple":
-                    for key in added:
-                        print(color.green(f"{key}{args.sep}{quote(right, key)}"))
-                elif args.mode == "diff":
-                    for key in added:
-                        print(color.green(f"+ {key}{args.sep}{quote(right, key)}"))
-                elif args.mode == "wdiff":
-                    for key in added:
-                        print(color.green(f"{{+{key}{args.sep}{quote(right, key)}+}}"))
-
-            if len(modified) and (args.sections is None or "updated" in args.sections):
-                print(
-                    color.blue(
-                        f"# Updated from {args.left} (left) to {args.right} (right)"
+                assert (
+                    keys is not None or len(right) > 0
+                ), f"Cannot find any property in {args.right}"
+                timings.count("left_keys", len(snapshot.keys))
+                timings.count("right_keys", len(right))
+                with timings.phase("diff"):
+                    result = diff_snapshot(snapshot, right, keys=keys)
+                renderer.render(sink, args.left, args.right, result)
+            elif args.left.is_dir() or args.right.is_dir():
+                if not (args.left.is_dir() and args.right.is_dir()):
+                    raise ValueError("Cannot compare a directory with a file")
+                pairs = pair_files(args.left, args.right, pattern=args.glob)
+                common = [(left, right) for _, left, right in pairs if left and right]
+                results = {}
+                timings.count("files", len(common))
+                if args.jobs is not None and args.jobs > 1 and len(common) > 1:
+                    with timings.phase("diff"), ProcessPoolExecutor(
+                        max_workers=args.jobs
+                    ) as executor:
+                        results = dict(
+                            zip(
+                                common,
+                                executor.map(
+                                    partial(
+                                        diff_pair,
+                                        separator=args.sep,
+                                        compact=True,
+                                        cache=cache,
+                                        engine=args.engine,
+                                        keys=keys,
+                                        encoding=args.encoding,
+                                    ),
+                                    *zip(*common),
+                                ),
+                            )
+                        )
+                for path, left, right in pairs:
+                    if left is None:
+                        renderer.only_in(sink, args.right, "right", path)
+                    elif right is None:
+                        renderer.only_in(sink, args.left, "left", path)
+                    else:
+                        result = results.get((left, right))
+                        if result is None:
+                            with timings.phase("diff"):
+                                result = diff_pair(
+                                    left,
+                                    right,
+                                    separator=args.sep,
+                                    cache=cache,
+                                    engine=args.engine,
+                                    keys=keys,
+                                    encoding=args.encoding,
+                                )
+                        renderer.render(sink, left, right, result, path=path)
+            else:
+                with timings.phase("parse"):
+                    left_data, right_data, changes = iter_pair(
+                        args.left,
+                        args.right,
+                        separator=args.sep,
+                        cache=cache,
+                        engine=args.engine,
+                        keys=keys,
+                        encoding=args.encoding,
                     )
+                timings.count("left_keys", len(left_data))
+                timings.count("right_keys", len(right_data))
+                renderer.render_changes(
+                    sink,
+                    args.left,
+                    args.right,
+                    left_data,
+                    right_data,
+                    timings.iterate("diff", changes, counter="changes"),
                 )
-                if args.mode == "simple":
-                    for key in modified:
-                        print(color.red(f"{key}{args.sep}{quote(left, key)}"))
-                    for key in modified:
-                        print(color.green(f"{key}{args.sep}{quote(right, key)}"))
-                elif args.mode == "diff":
-                    for key in modified:
-                        print(color.red(f"- {key}{args.sep}{quote(left, key)}"))
-                        print(color.green(f"+ {key}{args.sep}{quote(right, key)}"))
-                elif args.mode == "wdiff":
-                    for key in modified:
-                        print(
-                            key,
-                            args.sep,
-                            color.red(f"[-{quote(left, key)}-]"),
-                            color.green(f"{{+{quote(right, key)}+}}"),
-                            sep="",
-                        )
-    except BaseException as exc:  # pylint: disable=broad-except
-        print(color.red(f"ERROR: {exc}"), file=sys.stderr)
-        if isinstance(exc, SyntaxError):
-            print(
-                color.yellow(f"[{exc.filename}:{exc.lineno}]"),
-                "",
-                exc.text,
-                file=sys.stderr,
-            )
-        sys.exit(1)
+            if args.save_snapshot is None:
+                renderer.close(sink)
+            sink.flush()
+        except BaseException as exc:  # pylint: disable=broad-except
+            sink.flush()
+            print(color.red(f"ERROR: {exc}"), file=sys.stderr)
+            if isinstance(exc, SyntaxError):
+                print(
+                    color.yellow(f"[{exc.filename}:{exc.lineno}]"),
+                    "",
+                    exc.text,
+                    file=sys.stderr,
+                )
+            sys.exit(1)
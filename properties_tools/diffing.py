@@ -0,0 +1,158 @@
+"""
+compare properties: added, deleted and updated keys between two sets of properties
+"""
+
+import heapq
+from dataclasses import dataclass, field
+from itertools import chain, repeat
+from pathlib import Path
+from typing import Iterable, Iterator, List, Mapping, Optional, Tuple
+
+from .utils import is_stdin, propertiesfile_to_dict
+
+ADDED = "added"
+DELETED = "deleted"
+UPDATED = "updated"
+
+
+@dataclass
+class DiffResult:
+    """
+    Differences between left and right properties, keys are sorted
+    """
+
+    left: Mapping[str, str]
+    right: Mapping[str, str]
+    added: List[str] = field(default_factory=list)
+    deleted: List[str] = field(default_factory=list)
+    updated: List[str] = field(default_factory=list)
+
+    def is_similar(self) -> bool:
+        return (
+            len(self.added) == 0 and len(self.deleted) == 0 and len(self.updated) == 0
+        )
+
+    def changes(self) -> Iterator[Tuple[str, str]]:
+        """
+        Yield (change, key) in key order, like iter_diff
+        """
+        for key, change in heapq.merge(
+            zip(self.added, repeat(ADDED)),
+            zip(self.deleted, repeat(DELETED)),
+            zip(self.updated, repeat(UPDATED)),
+        ):
+            yield change, key
+
+    def compact(self) -> "DiffResult":
+        """
+        Return a copy only holding the values of changed keys, cheaper to send to
+        another process
+        """
+        return DiffResult(
+            {key: self.left[key] for key in chain(self.deleted, self.updated)},
+            {key: self.right[key] for key in chain(self.added, self.updated)},
+            added=self.added,
+            deleted=self.deleted,
+            updated=self.updated,
+        )
+
+
+def iter_diff(
+    left: Mapping[str, str], right: Mapping[str, str]
+) -> Iterator[Tuple[str, str]]:
+    """
+    Merge-join the sorted keys of both sides and yield (change, key) in key order,
+    change being one of added, deleted or updated. Each side is sorted once, equal
+    sets of properties are detected before sorting.
+    """
+    if left == right:
+        # same properties, maybe in another order or with other comments
+        return
+    left_keys, right_keys = iter(sorted(left)), iter(sorted(right))
+    left_key, right_key = next(left_keys, None), next(right_keys, None)
+    while left_key is not None and right_key is not None:
+        if left_key == right_key:
+            if left[left_key] != right[right_key]:
+                yield UPDATED, left_key
+            left_key, right_key = next(left_keys, None), next(right_keys, None)
+        elif left_key < right_key:
+            yield DELETED, left_key
+            left_key = next(left_keys, None)
+        else:
+            yield ADDED, right_key
+            right_key = next(right_keys, None)
+    if left_key is not None:
+        yield DELETED, left_key
+        for key in left_keys:
+            yield DELETED, key
+    if right_key is not None:
+        yield ADDED, right_key
+        for key in right_keys:
+            yield ADDED, key
+
+
+def same_content(left: Path, right: Path) -> bool:
+    """
+    Check if both files have the same content: sizes are compared first, then
+    bytes by chunks until the first difference. The standard input cannot be
+    read twice, it is never compared.
+    """
+    if is_stdin(left) or is_stdin(right):
+        return False
+    import filecmp  # pylint: disable=import-outside-toplevel
+
+    return filecmp.cmp(left, right, shallow=False)
+
+
+def collect_diff(
+    left: Mapping[str, str],
+    right: Mapping[str, str],
+    changes: Iterable[Tuple[str, str]],
+) -> DiffResult:
+    """
+    Build a diff result from (change, key) tuples
+    """
+    out = DiffResult(left, right)
+    sections = {ADDED: out.added, DELETED: out.deleted, UPDATED: out.updated}
+    for change, key in changes:
+        sections[change].append(key)
+    return out
+
+
+def diff_dicts(left: Mapping[str, str], right: Mapping[str, str]) -> DiffResult:
+    """
+    Compare two sets of properties
+    """
+    return collect_diff(left, right, iter_diff(left, right))
+
+
+def diff_files(
+    left: Path, right: Path, separator: str = "=", comment_char: str = "#"
+) -> DiffResult:
+    """
+    Parse and compare two properties files
+    """
+    return diff_dicts(
+        propertiesfile_to_dict(left, separator=separator, comment_char=comment_char),
+        propertiesfile_to_dict(right, separator=separator, comment_char=comment_char),
+    )
+
+
+def pair_files(
+    left: Path, right: Path, pattern: str = "*.properties"
+) -> List[Tuple[Path, Optional[Path], Optional[Path]]]:
+    """
+    Match the files of two directory trees by relative path, return a list of
+    (relative path, left file, right file) sorted by relative path, left or right
+    file is None when the file only exists on one side
+    """
+    left_files = {f.relative_to(left) for f in left.rglob(pattern) if f.is_file()}
+    right_files = {f.relative_to(right) for f in right.rglob(pattern) if f.is_file()}
+    return [
+        (
+            path,
+            left / path if path in left_files else None,
+            right / path if path in right_files else None,
+        )
+        for path in sorted(left_files | right_files)
+    ]
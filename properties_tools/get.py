@@ -0,0 +1,87 @@
+"""
+get cli tool entrypoint
+"""
+
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+from .color import Color
+from .index import open_index
+
+
+def run(argv: Optional[List[str]] = None):
+    """
+    get cli
+    """
+    # pylint: disable=import-outside-toplevel
+    from argparse import ArgumentParser
+
+    from .cli import VersionAction
+
+    parser = ArgumentParser(
+        description="print values of a properties file using a sidecar index, built on first use"
+    )
+    parser.add_argument("--version", action=VersionAction)
+    color_group = parser.add_mutually_exclusive_group()
+    color_group.add_argument(
+        "--color",
+        action="store_const",
+        dest="color",
+        const=True,
+        help="force colors",
+    )
+    color_group.add_argument(
+        "--nocolor",
+        action="store_const",
+        dest="color",
+        const=False,
+        help="disable colors",
+    )
+    parser.add_argument(
+        "--sep",
+        default="=",
+        help="key/value separator, default is '='",
+    )
+    parser.add_argument(
+        "--rebuild",
+        action="store_true",
+        help="rebuild the index even if it is up to date",
+    )
+    parser.add_argument(
+        "source",
+        type=Path,
+        metavar="file.properties",
+        help="file to read, the index file.properties.idx is written next to it",
+    )
+    parser.add_argument(
+        "keys",
+        nargs="+",
+        metavar="KEY",
+        help="keys to read, values are printed in the same order",
+    )
+    args = parser.parse_args(argv)
+    color = Color(args.color)
+
+    try:
+        missing = []
+        with open_index(args.source, separator=args.sep, rebuild=args.rebuild) as index:
+            for key in args.keys:
+                value = index.get(key)
+                if value is None:
+                    missing.append(key)
+                else:
+                    print(value)
+        if len(missing) > 0:
+            raise KeyError(f"Cannot find {', '.join(missing)} in {args.source}")
+    except BaseException as exc:  # pylint: disable=broad-except
+        message = exc.args[0] if isinstance(exc, KeyError) else exc
+        print(color.red(f"ERROR: {message}"), file=sys.stderr)
+        if isinstance(exc, SyntaxError):
+            print(
+                color.yellow(f"[{exc.filename}:{exc.lineno}]"),
+                "",
+                exc.text,
+                file=sys.stderr,
+            )
+        sys.exit(1)
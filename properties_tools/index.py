@@ -0,0 +1,202 @@
+"""
+sidecar index of a properties file: sorted keys with the byte offset of their
+line, to read a few values without parsing the whole file
+"""
+
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Dict, Optional
+
+from .output import default_mode
+from .utils import ENCODING, ParsedLine, syntax_error
+
+INDEX_SUFFIX = ".idx"
+INDEX_MAGIC = b"PTIDX01\n"
+# source size, source mtime, keys count, separator and comment char lengths
+_HEADER = struct.Struct("<QqQHH")
+# key offset in the index, line offset in the source
+_RECORD = struct.Struct("<QQ")
+
+
+def index_path(source: Path) -> Path:
+    """
+    Return the sidecar index file of a properties file
+    """
+    return source.with_name(source.name + INDEX_SUFFIX)
+
+
+def build_index(
+    source: Path,
+    separator: str = "=",
+    comment_char: str = "#",
+    index: Optional[Path] = None,
+    encoding: str = ENCODING,
+) -> Path:
+    """
+    Parse the source file once and write its index, keys are sorted by their encoded
+    bytes, the last occurrence of a key wins
+    """
+    # pylint: disable=import-outside-toplevel
+    from tempfile import NamedTemporaryFile
+
+    if not separator:
+        raise ValueError("Invalid separator")
+    if index is None:
+        index = index_path(source)
+    stat = source.stat()
+    offsets: Dict[bytes, int] = {}
+    offset = 0
+    with source.open("rb") as stream:
+        for lineno, raw in enumerate(stream, 1):
+            line = raw.decode(encoding).rstrip("\r\n")
+            try:
+                parsed = ParsedLine(
+                    line, separator_char=separator, comment_char=comment_char
+                )
+            except ValueError as ex:
+                raise syntax_error(ex, source, line, lineno)
+            if parsed.is_property():
+                offsets[parsed.key.encode(encoding)] = offset
+            offset += len(raw)
+
+    keys = sorted(offsets)
+    options = separator.encode(encoding), comment_char.encode(encoding)
+    key_offset = (
+        len(INDEX_MAGIC)
+        + _HEADER.size
+        + sum(map(len, options))
+        + len(keys) * _RECORD.size
+    )
+    with NamedTemporaryFile(
+        dir=index.parent, prefix=f".{index.name}", suffix=".tmp", delete=False
+    ) as stream:
+        stream.write(INDEX_MAGIC)
+        stream.write(
+            _HEADER.pack(stat.st_size, stat.st_mtime_ns, len(keys), *map(len, options))
+        )
+        stream.write(b"".join(options))
+        for key in keys:
+            stream.write(_RECORD.pack(key_offset, offsets[key]))
+            key_offset += len(key) + 1
+        for key in keys:
+            stream.write(key + b"\0")
+    os.chmod(stream.name, default_mode())
+    os.replace(stream.name, index)
+    return index
+
+
+class PropertiesIndex:
+    """
+    Read values of a properties file using its index: keys are found by binary
+    search in the memory mapped index, then only their line is parsed in the
+    memory mapped source file
+    """
+
+    def __init__(
+        self, source: Path, index: Optional[Path] = None, encoding: str = ENCODING
+    ):
+        self.source = source
+        self.index = index if index is not None else index_path(source)
+        self.encoding = encoding
+        with self.index.open("rb") as stream:
+            self._index = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._index[: len(INDEX_MAGIC)] != INDEX_MAGIC:
+            self.close()
+            raise ValueError(f"Invalid index {self.index}")
+        size, mtime_ns, self.count, sep_len, comment_len = _HEADER.unpack_from(
+            self._index, len(INDEX_MAGIC)
+        )
+        stat = source.stat()
+        if (stat.st_size, stat.st_mtime_ns) != (size, mtime_ns):
+            self.close()
+            raise ValueError(f"Index {self.index} is outdated")
+        start = len(INDEX_MAGIC) + _HEADER.size
+        self.separator = self._index[start : start + sep_len].decode(encoding)
+        start += sep_len
+        self.comment_char = self._index[start : start + comment_len].decode(encoding)
+        self._records = start + comment_len
+        self._source: Optional[mmap.mmap] = None
+        if size > 0:
+            with source.open("rb") as stream:
+                self._source = mmap.mmap(stream.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        self._index.close()
+        if getattr(self, "_source", None) is not None:
+            self._source.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_args):
+        self.close()
+
+    def _key(self, position: int) -> bytes:
+        key_offset, _ = _RECORD.unpack_from(
+            self._index, self._records + position * _RECORD.size
+        )
+        return self._index[key_offset : self._index.find(b"\0", key_offset)]
+
+    def offset(self, key: str) -> Optional[int]:
+        """
+        Return the offset of the line of the key in the source file, None if the
+        key is not found
+        """
+        wanted = key.encode(self.encoding)
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._key(middle) < wanted:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.count and self._key(low) == wanted:
+            _, out = _RECORD.unpack_from(
+                self._index, self._records + low * _RECORD.size
+            )
+            return out
+        return None
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Return the value of the key, None if the key is not found
+        """
+        offset = self.offset(key)
+        if offset is None or self._source is None:
+            return None
+        end = self._source.find(b"\n", offset)
+        line = self._source[offset : end if end >= 0 else len(self._source)]
+        return ParsedLine(
+            line.decode(self.encoding).rstrip("\r"),
+            separator_char=self.separator,
+            comment_char=self.comment_char,
+        ).value
+
+
+def open_index(
+    source: Path,
+    separator: str = "=",
+    comment_char: str = "#",
+    rebuild: bool = False,
+    encoding: str = ENCODING,
+) -> PropertiesIndex:
+    """
+    Open the index of a properties file, the index is built if it does not exist,
+    is outdated or was built with other parsing options
+    """
+    if not source.is_file():
+        raise FileExistsError(f"Cannot find file {source}")
+    if not rebuild:
+        try:
+            out = PropertiesIndex(source, encoding=encoding)
+            if (out.separator, out.comment_char) == (separator, comment_char):
+                return out
+            out.close()
+        except (OSError, ValueError, struct.error):
+            pass
+    build_index(
+        source, separator=separator, comment_char=comment_char, encoding=encoding
+    )
+    return PropertiesIndex(source, encoding=encoding)
@@ -0,0 +1,171 @@
+"""
+merge cli tool entrypoint
+"""
+
+import json
+import sys
+from dataclasses import asdict
+from pathlib import Path
+from typing import List, Optional
+
+from .cache import load_properties
+from .color import Color
+from .merging import OURS, THEIRS, Conflict, LineMerger
+from .output import OutputSink, atomic_output
+from .utils import parse_file, parse_file_java
+
+
+def conflict_message(conflict: Conflict, color: Color) -> str:
+    """
+    Describe a conflict on one line
+    """
+
+    def value(text: Optional[str]) -> str:
+        return "(missing)" if text is None else text
+
+    return (
+        f"CONFLICT {color.yellow(conflict.key)}: base={value(conflict.base)}, "
+        f"ours={color.red(value(conflict.ours))}, "
+        f"theirs={color.green(value(conflict.theirs))}"
+    )
+
+
+def run(argv: Optional[List[str]] = None):
+    """
+    merge cli
+    """
+    # pylint: disable=import-outside-toplevel
+    from argparse import ArgumentParser
+
+    from .cli import (
+        VersionAction,
+        add_cache_arguments,
+        add_engine_argument,
+        cache_from_args,
+    )
+
+    parser = ArgumentParser(
+        description="merge the changes between base and theirs into ours"
+    )
+    parser.add_argument("--version", action=VersionAction)
+    color_group = parser.add_mutually_exclusive_group()
+    color_group.add_argument(
+        "--color",
+        action="store_const",
+        dest="color",
+        const=True,
+        help="force colors",
+    )
+    color_group.add_argument(
+        "--nocolor",
+        action="store_const",
+        dest="color",
+        const=False,
+        help="disable colors",
+    )
+    add_engine_argument(parser)
+    add_cache_arguments(parser)
+    parser.add_argument(
+        "--sep",
+        default="=",
+        help="key/value separator, default is '='",
+    )
+    favor_group = parser.add_mutually_exclusive_group()
+    favor_group.add_argument(
+        "--ours",
+        action="store_const",
+        dest="favor",
+        const=OURS,
+        help="resolve conflicts with ours values",
+    )
+    favor_group.add_argument(
+        "--theirs",
+        action="store_const",
+        dest="favor",
+        const=THEIRS,
+        help="resolve conflicts with theirs values",
+    )
+    parser.add_argument(
+        "--conflicts",
+        type=Path,
+        metavar="conflicts.json",
+        help="write conflicts as json",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=Path,
+        metavar="output.properties",
+        help="merged file, default is to print the merged content",
+    )
+    parser.add_argument(
+        "-f",
+        "--force",
+        action="store_true",
+        help="force output file (--output) overwrite if it already exists",
+    )
+    parser.add_argument(
+        "base", type=Path, metavar="base.properties", help="common ancestor"
+    )
+    parser.add_argument(
+        "ours", type=Path, metavar="ours.properties", help="file to merge into"
+    )
+    parser.add_argument(
+        "theirs", type=Path, metavar="theirs.properties", help="file to merge from"
+    )
+
+    args = parser.parse_args(argv)
+    cache = cache_from_args(args)
+    color = Color(args.color)
+
+    sink = OutputSink(sys.stdout)
+    try:
+        if args.output is not None and args.output.exists() and not args.force:
+            raise ValueError(
+                f"output file {args.output} already exists, use '--force' to overwrite it"
+            )
+        base, theirs = (
+            load_properties(file, separator=args.sep, cache=cache, engine=args.engine)
+            for file in (args.base, args.theirs)
+        )
+        if not args.ours.exists():
+            raise FileExistsError(f"Cannot find file {args.ours}")
+        # ours is streamed once, not loaded
+        lines = (
+            parse_file_java(args.ours)
+            if args.engine == "java"
+            else parse_file(args.ours, separator=args.sep)
+        )
+        merger = LineMerger(
+            base, theirs, favor=args.favor, separator=args.sep, engine=args.engine
+        )
+        merged = merger.merge(lines)
+        if args.output is None:
+            for line in merged:
+                sink.write(line)
+        else:
+            # ours may be the output file, it is replaced once fully merged
+            with atomic_output(args.output) as stream, OutputSink(stream) as file_sink:
+                for line in merged:
+                    file_sink.write(line)
+        sink.flush()
+        for conflict in merger.conflicts:
+            print(conflict_message(conflict, color), file=sys.stderr)
+        if args.conflicts is not None:
+            args.conflicts.write_text(
+                json.dumps([asdict(c) for c in merger.conflicts], indent=2) + "\n"
+            )
+    except BaseException as exc:  # pylint: disable=broad-except
+        sink.flush()
+        print(color.red(f"ERROR: {exc}"), file=sys.stderr)
+        if isinstance(exc, SyntaxError):
+            print(
+                color.yellow(f"[{exc.filename}:{exc.lineno}]"),
+                "",
+                exc.text,
+                file=sys.stderr,
+            )
+        sys.exit(1)
+    if not merger.is_clean() and args.favor is None:
+        # unresolved conflicts
+        sys.exit(1)
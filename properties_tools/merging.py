@@ -0,0 +1,161 @@
+"""
+three-way merge of properties: apply the changes between base and theirs to ours
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Set, Tuple
+
+from .utils import ParsedLine, java_escape
+
+OURS = "ours"
+THEIRS = "theirs"
+
+
+@dataclass
+class Conflict:
+    """
+    A key changed differently on both sides, a missing value is None
+    """
+
+    key: str
+    base: Optional[str]
+    ours: Optional[str]
+    theirs: Optional[str]
+
+
+@dataclass
+class MergeResult:
+    """
+    Merged properties, in ours order followed by keys added by theirs, and
+    conflicts
+    """
+
+    merged: Dict[str, str] = field(default_factory=dict)
+    conflicts: List[Conflict] = field(default_factory=list)
+
+    def is_clean(self) -> bool:
+        return len(self.conflicts) == 0
+
+
+def resolve(
+    base_value: Optional[str],
+    ours_value: Optional[str],
+    theirs_value: Optional[str],
+    favor: Optional[str] = None,
+) -> Tuple[Optional[str], bool]:
+    """
+    Merge the values of a key, a missing value is None: return the merged value,
+    None if the key is deleted, and True if the key changed differently on both
+    sides. A conflict keeps ours value, or the value of the favored side.
+    """
+    if ours_value == theirs_value or theirs_value == base_value:
+        return ours_value, False
+    if ours_value == base_value:
+        # changed, added or deleted by theirs
+        return theirs_value, False
+    return (theirs_value if favor == THEIRS else ours_value), True
+
+
+def merge_dicts(
+    base: Mapping[str, str],
+    ours: Mapping[str, str],
+    theirs: Mapping[str, str],
+    favor: Optional[str] = None,
+) -> MergeResult:
+    """
+    Merge in a single pass over ours then theirs keys, every key is looked up once
+    on each side, see resolve
+    """
+    out = MergeResult()
+    for key, ours_value in ours.items():
+        theirs_value, base_value = theirs.get(key), base.get(key)
+        value, conflict = resolve(base_value, ours_value, theirs_value, favor=favor)
+        if conflict:
+            out.conflicts.append(Conflict(key, base_value, ours_value, theirs_value))
+        if value is not None:
+            out.merged[key] = value
+    for key, theirs_value in theirs.items():
+        if key in ours:
+            continue
+        base_value = base.get(key)
+        value, conflict = resolve(base_value, None, theirs_value, favor=favor)
+        if conflict:
+            # deleted by ours, changed by theirs
+            out.conflicts.append(Conflict(key, base_value, None, theirs_value))
+        if value is not None:
+            out.merged[key] = value
+    return out
+
+
+class LineMerger:
+    """
+    Single pass merge of ours lines, ours file is not loaded: every ours property
+    is resolved against base and theirs when it is read, and only ours keys are
+    remembered to add theirs keys at the end. Conflicts are collected along the
+    way. Every line of a key duplicated in ours is resolved with its own value,
+    the conflict of the key is the one of its last line, like in a dict.
+    """
+
+    def __init__(
+        self,
+        base: Mapping[str, str],
+        theirs: Mapping[str, str],
+        favor: Optional[str] = None,
+        separator: str = "=",
+        engine: str = "line",
+    ):
+        self.base = base
+        self.theirs = theirs
+        self.favor = favor
+        self.separator = separator
+        self.engine = engine
+        self._conflicts: Dict[str, Conflict] = {}
+        self._ours: Set[str] = set()
+
+    @property
+    def conflicts(self) -> List[Conflict]:
+        """
+        Conflicts of the lines merged so far, in ours order followed by theirs
+        """
+        return list(self._conflicts.values())
+
+    def is_clean(self) -> bool:
+        return len(self._conflicts) == 0
+
+    def _resolve(self, key: str, ours_value: Optional[str]) -> Optional[str]:
+        base_value, theirs_value = self.base.get(key), self.theirs.get(key)
+        value, conflict = resolve(
+            base_value, ours_value, theirs_value, favor=self.favor
+        )
+        if conflict:
+            self._conflicts[key] = Conflict(key, base_value, ours_value, theirs_value)
+        else:
+            self._conflicts.pop(key, None)
+        return value
+
+    def _property_line(self, key: str, value: str) -> str:
+        if self.engine == "java":
+            key, value = java_escape(key, key=True), java_escape(value)
+        return f"{key}{self.separator}{value}"
+
+    def merge(self, lines: Iterable[ParsedLine]) -> Iterator[str]:
+        """
+        Yield the merged content: ours lines in their order, comments included,
+        with updated values and without deleted keys, then keys added by theirs
+        """
+        for line in lines:
+            if not line.is_property():
+                yield str(line)
+                continue
+            key = line.key
+            self._ours.add(key)
+            value = self._resolve(key, line.value)
+            if value == line.value:
+                yield str(line)
+            elif value is not None:
+                yield self._property_line(key, value)
+        for key in self.theirs:
+            if key not in self._ours:
+                value = self._resolve(key, None)
+                if value is not None:
+                    yield self._property_line(key, value)
@@ -0,0 +1,120 @@
+"""
+buffered output and line templates used to render diff and patch results
+"""
+
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, TextIO
+
+from .utils import ENCODING
+
+BUFFER_SIZE = 64 * 1024
+_MARKER = "\0"
+
+
+class LineTemplate:
+    """
+    A line format compiled once: optional prefix and suffix, wrapped with an
+    optional style. The style function is only called when the template is built,
+    rendering a line is a simple concatenation
+    """
+
+    __slots__ = ("head", "tail")
+
+    def __init__(
+        self,
+        prefix: str = "",
+        suffix: str = "",
+        style: Optional[Callable[..., str]] = None,
+    ):
+        text = f"{prefix}{_MARKER}{suffix}"
+        if style is not None:
+            text = style(text)
+        self.head, _, self.tail = text.partition(_MARKER)
+
+    def __call__(self, *parts: str) -> str:
+        return self.head + "".join(parts) + self.tail
+
+
+class OutputSink:
+    """
+    Collect lines and write them to the stream by large blocks
+    """
+
+    def __init__(self, stream: TextIO, buffer_size: int = BUFFER_SIZE):
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self._lines: List[str] = []
+        self._size = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.flush()
+
+    def write(self, line: str):
+        """
+        Append a line, the line terminator is added
+        """
+        self._lines.append(line)
+        self._size += len(line) + 1
+        if self._size >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Write all pending lines to the stream
+        """
+        if len(self._lines) > 0:
+            self._lines.append("")
+            self.stream.write("\n".join(self._lines))
+            self._lines = []
+            self._size = 0
+        self.stream.flush()
+
+
+def default_mode() -> int:
+    """
+    Return the mode of a new file, from the umask, temporary files are only
+    readable by their owner
+    """
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+@contextmanager
+def atomic_output(file: Path, encoding: str = ENCODING) -> Iterator[TextIO]:
+    """
+    Write a file through a temporary file in the same directory, synced to disk
+    then renamed over the file, so an interrupted write never leaves a truncated
+    file. The mode of an existing file is kept, a symbolic link is written through.
+    """
+    from tempfile import NamedTemporaryFile  # pylint: disable=import-outside-toplevel
+
+    # the target of a link, renamed on the same filesystem
+    file = file.resolve()
+    stream = NamedTemporaryFile(
+        "w",
+        encoding=encoding,
+        dir=file.parent,
+        prefix=f".{file.name}.",
+        suffix=".tmp",
+        delete=False,
+    )
+    try:
+        with stream:
+            yield stream
+            stream.flush()
+            os.fsync(stream.fileno())
+        if file.exists():
+            mode = file.stat().st_mode & 0o7777
+        else:
+            mode = default_mode()
+        os.chmod(stream.name, mode)
+        os.replace(stream.name, file)
+    except BaseException:
+        Path(stream.name).unlink(missing_ok=True)
+        raise
@@ -2,27 +2,368 @@
 diff cli tool entrypoint
 """
 
+import os
 import sys
-from argparse import ArgumentParser
-from datetime import datetime
+from contextlib import ExitStack
+from dataclasses import dataclass
+from io import StringIO
 from pathlib import Path
-from typing import Any, Callable, List, Optional
+from typing import Any, Iterator, List, Mapping, Optional, Pattern, Tuple
 
-from colorama.ansi import Cursor, clear_line
-
-from . import __version__
+from .cache import load_properties
 from .color import Color
-from .utils import parse_file, propertiesfile_to_dict
+from .decisions import (
+    REJECT,
+    DecisionFile,
+    DecisionPlanner,
+    PlannedChange,
+    SourcePlan,
+    decide,
+)
+from .output import LineTemplate, OutputSink, atomic_output
+from .patching import ADD, DELETE, UPDATE, PatchLayers, PatchPlanner
+from .timings import Timings, instrument
+from .utils import (
+    ENCODING,
+    ParsedLine,
+    file_digest,
+    is_compressed,
+    is_stdin,
+    java_escape,
+    key_filter,
+    now,
+    parse_file,
+    parse_file_java,
+)
+
+
+@dataclass
+class PatchStats:
+    """
+    Changes applied to a source file
+    """
+
+    source: Path
+    added: int = 0
+    updated: int = 0
+    deleted: int = 0
+
+    def __str__(self):
+        return f"{self.source}: {self.added} added, {self.updated} updated, {self.deleted} deleted"
+
+
+class Patcher:
+    """
+    Apply patches to source files and render the patched content
+    """
+
+    def __init__(
+        self,
+        patches: Mapping[str, str],
+        actions: List[str],
+        color: Color,
+        separator: str = "=",
+        quote: bool = False,
+        comments: bool = False,
+        interactive: bool = False,
+        engine: str = "line",
+        timings: Optional[Timings] = None,
+        keys: Optional[Pattern[str]] = None,
+        encoding: str = ENCODING,
+    ):
+        self.patches = patches
+        self.actions = actions
+        self.color = color
+        self.separator = separator
+        self.quote = quote
+        self.comments = comments
+        self.interactive = interactive
+        self.engine = engine
+        self.timings = timings if timings is not None else Timings()
+        self.keys = keys
+        self.encoding = encoding
+        self.date_now = now()
+        self.grey_line = LineTemplate(style=color.grey)
+        self.red_line = LineTemplate(style=color.red)
+        self.yellow_line = LineTemplate(style=color.yellow)
+        self.green_line = LineTemplate(style=color.green)
+
+    def _property(self, key: str):
+        text = self.patches.get(key, "")
+        if self.engine == "java":
+            key, text = java_escape(key, key=True), java_escape(text)
+        if self.quote:
+            text = f'"{text}"'
+        return f"{key}{self.separator}{text}"
+
+    def _comment(self, message: str, line: Any, key: Optional[str] = None):
+        # every physical line of a continued line must be commented
+        text = str(line).replace("\n", "\n# ")
+        out = f"# {self.date_now}  {message}: {text}"
+        if (
+            key is not None
+            and isinstance(self.patches, PatchLayers)
+            and len(self.patches.layers) > 1
+        ):
+            # name the patch supplying the value when there are several
+            out += f"  (from {self.patches.source(key)})"
+        return out
+
+    def confirm(
+        self,
+        sink: OutputSink,
+        message: str,
+        key: Optional[str] = None,
+        force: bool = False,
+    ):
+        # pylint: disable=unused-argument
+        if force or self.interactive:
+            # pylint: disable=import-outside-toplevel
+            from colorama.ansi import Cursor, clear_line
+
+            # pending lines must be printed before the prompt
+            sink.flush()
+            with self.timings.phase("prompt"):
+                while True:
+                    answer = input(f"💬  {message} [Y/n] ")
+                    print(Cursor.UP(), clear_line(), sep="", end="")
+                    if answer.lower() in ("y", ""):
+                        return True
+                    if answer.lower() == "n":
+                        return False
+        return True
+
+    def lines(self, source: Path) -> Iterator[ParsedLine]:
+        """
+        Parse the source file
+        """
+        if self.engine == "java":
+            return parse_file_java(source, encoding=self.encoding)
+        return parse_file(source, separator=self.separator, encoding=self.encoding)
+
+    def planner(self) -> PatchPlanner:
+        return PatchPlanner(self.patches, keys=self.keys)
+
+    def plan(self, source: Path) -> SourcePlan:
+        """
+        Compute every change of the enabled actions for the source file, all
+        accepted
+        """
+        out = SourcePlan(str(source.resolve()), file_digest(source))
+        planner = self.planner()
+        for action, line in planner.steps(self.lines(source)):
+            if action in (UPDATE, DELETE) and action in self.actions:
+                out.changes.append(
+                    PlannedChange(
+                        action, line.key, old=line.value, new=self.patches.get(line.key)
+                    )
+                )
+        if ADD in self.actions:
+            out.changes.extend(
+                PlannedChange(ADD, key, new=self.patches[key])
+                for key in planner.additions()
+            )
+        return out
+
+    def apply(
+        self, source: Path, sink: OutputSink, output: Optional[Path] = None
+    ) -> PatchStats:
+        """
+        Patch the source file, print the patched content to the sink and write it
+        to the output file if given, lines are streamed from the source to the
+        output file which replaces the target once complete
+        """
+        with ExitStack() as stack:
+            file_sink = None
+            if output is not None:
+                stream = stack.enter_context(
+                    atomic_output(output, encoding=self.encoding)
+                )
+                file_sink = stack.enter_context(
+                    OutputSink(self.timings.stream("write", stream))
+                )
+            stats = self._apply(source, sink, file_sink)
+            with self.timings.phase("write"):
+                # flush, sync and replace the output file
+                stack.close()
+        return stats
+
+    def _apply(
+        self, source: Path, sink: OutputSink, file_sink: Optional[OutputSink]
+    ) -> PatchStats:
+        color, patches = self.color, self.patches
+        stats = PatchStats(source)
+
+        def print_line(line: Any, template: Optional[LineTemplate] = None):
+            """
+            print a line with optional color, and write it to the output file
+            """
+            assert line is not None
+            line = str(line)
+            if file_sink is not None:
+                file_sink.write(line)
+            sink.write(template(line) if template else line)
+
+        planner = self.planner()
+        lines = self.timings.iterate("parse", self.lines(source), counter="lines")
+        for action, parsed_line in planner.steps(lines):
+            if action is None:
+                # comment or blank line
+                print_line(parsed_line, self.grey_line)
+            elif action == DELETE:
+                if DELETE in self.actions and self.confirm(
+                    sink, f"Delete {color.red(parsed_line)} ?", parsed_line.key
+                ):
+                    # delete or comment the line
+                    stats.deleted += 1
+                    if self.comments:
+                        print_line(self._comment("remove", parsed_line), self.red_line)
+                else:
+                    # discard change, keep the line
+                    print_line(parsed_line)
+            elif action == UPDATE:
+                if UPDATE in self.actions and self.confirm(
+                    sink,
+                    f"Update {color.yellow(parsed_line.key)}={color.red(parsed_line.value)},{color.green(patches[parsed_line.key])} ?",
+                    parsed_line.key,
+                ):
+                    # update the line
+                    stats.updated += 1
+                    if self.comments:
+                        print_line(
+                            self._comment("update", parsed_line, parsed_line.key),
+                            self.yellow_line,
+                        )
+                    print_line(self._property(parsed_line.key), self.yellow_line)
+                else:
+                    # discard change, keep the line
+                    print_line(parsed_line)
+            else:
+                # same key/value, keep the line
+                print_line(parsed_line)
+
+        # add new properties
+        if ADD in self.actions:
+            for key in planner.additions():
+                line = self._property(key)
+                if self.confirm(sink, f"Add {color.green(line)} ?", key):
+                    # add property
+                    stats.added += 1
+                    if self.comments:
+                        print_line(self._comment("add", key, key), self.green_line)
+                    print_line(line, self.green_line)
+        return stats
+
+
+class DecisionPatcher(Patcher):
+    """
+    Replay the decisions of a plan instead of asking for confirmation, the source
+    file must not have changed since the plan was made
+    """
+
+    def __init__(self, plan: SourcePlan, color: Color, **kwargs):
+        super().__init__(plan.patches(), [ADD, UPDATE, DELETE], color, **kwargs)
+        self.source_plan = plan
+        self.decisions = plan.decisions()
+
+    def planner(self) -> PatchPlanner:
+        return DecisionPlanner(self.source_plan)
+
+    def confirm(
+        self,
+        sink: OutputSink,
+        message: str,
+        key: Optional[str] = None,
+        force: bool = False,
+    ):
+        return self.decisions.get(key, False)
+
+    def apply(
+        self, source: Path, sink: OutputSink, output: Optional[Path] = None
+    ) -> PatchStats:
+        self.source_plan.verify(source)
+        return super().apply(source, sink, output)
+
+
+def print_stats(all_stats: List[PatchStats]):
+    """
+    Print the changes of every patched file and their total
+    """
+    for stats in all_stats:
+        print(stats, file=sys.stderr)
+    print(
+        f"{len(all_stats)} files patched: "
+        f"{sum(s.added for s in all_stats)} added, "
+        f"{sum(s.updated for s in all_stats)} updated, "
+        f"{sum(s.deleted for s in all_stats)} deleted",
+        file=sys.stderr,
+    )
+
+
+def output_files(
+    sources: List[Path], output: Optional[Path], overwrite: bool
+) -> List[Optional[Path]]:
+    """
+    Return the file to write for every source file, None to only print the content.
+    When multiple source files are patched, output is a directory.
+    """
+    if overwrite:
+        return list(sources)
+    if output is None:
+        return [None] * len(sources)
+    if len(sources) == 1:
+        return [output]
+    if output.exists() and not output.is_dir():
+        raise ValueError(f"output {output} must be a directory to patch multiple files")
+    names = [source.name for source in sources]
+    if len(set(names)) != len(names):
+        raise ValueError("cannot write multiple source files with the same name")
+    output.mkdir(parents=True, exist_ok=True)
+    return [output / name for name in names]
+
+
+_WORKER_PATCHER: Optional[Patcher] = None
+
+
+def _init_worker(patcher: Patcher):
+    """
+    Keep the patcher, with its parsed patches, in the worker process
+    """
+    global _WORKER_PATCHER  # pylint: disable=global-statement
+    _WORKER_PATCHER = patcher
+
+
+def _apply_in_worker(source: Path, output: Optional[Path]) -> Tuple[PatchStats, str]:
+    """
+    Patch a source file in a worker, return the stats and the printed content
+    """
+    assert _WORKER_PATCHER is not None
+    buffer = StringIO()
+    with OutputSink(buffer) as sink:
+        stats = _WORKER_PATCHER.apply(source, sink, output)
+    return stats, buffer.getvalue()
 
 
 def run(argv: Optional[List[str]] = None):
     """
     patch cli
     """
-    parser = ArgumentParser()
-    parser.add_argument(
-        "--version", action="version", version=f"%(prog)s {__version__}"
+    # pylint: disable=import-outside-toplevel
+    from argparse import ArgumentParser
+    from concurrent.futures import ProcessPoolExecutor
+
+    from .cli import (
+        VersionAction,
+        add_cache_arguments,
+        add_encoding_argument,
+        add_engine_argument,
+        add_filter_arguments,
+        add_instrument_arguments,
+        cache_from_args,
     )
+
+    parser = ArgumentParser()
+    parser.add_argument("--version", action=VersionAction)
     color_group = parser.add_mutually_exclusive_group()
     color_group.add_argument(
         "--color",
@@ -56,11 +397,14 @@ def run(argv: Optional[List[str]] = None):
         action="store_true",
         help='use double quotes for values, example: foo="bar"',
     )
+    add_engine_argument(parser)
+    add_cache_arguments(parser)
     parser.add_argument(
         "--sep",
         default="=",
         help="key/value separator, default is '='",
     )
+    add_encoding_argument(parser)
     action_group = parser.add_argument_group()
     action_group.add_argument(
         "-A",
@@ -92,8 +436,7 @@ def run(argv: Optional[List[str]] = None):
         action="append",
         type=Path,
         metavar="patch.properties",
-        required=True,
-        help="patch file",
+        help="patch file, '-' for the standard input, required unless decisions are replayed",
     )
     output_group = parser.add_mutually_exclusive_group()
     output_group.add_argument(
@@ -101,7 +444,7 @@ def run(argv: Optional[List[str]] = None):
         "--output",
         type=Path,
         metavar="output.properties",
-        help="modified file",
+        help="modified file, or output directory when patching multiple files",
     )
     output_group.add_argument(
         "-w",
@@ -116,123 +459,232 @@ def run(argv: Optional[List[str]] = None):
         help="force output file (--output) overwrite if it already exists",
     )
     parser.add_argument(
-        "source",
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count(),
+        help="number of parallel jobs to patch multiple files, default is the number of cpus",
+    )
+    plan_group = parser.add_mutually_exclusive_group()
+    plan_group.add_argument(
+        "--write-plan",
+        type=Path,
+        metavar="PLAN",
+        help="write every change with its decision to a json file to review, instead of patching",
+    )
+    plan_group.add_argument(
+        "--decisions",
+        type=Path,
+        metavar="PLAN",
+        help="replay the accepted changes of a plan without patch files, the sources must not have changed, default sources are the ones of the plan",
+    )
+    parser.add_argument(
+        "--accept",
+        action="append",
+        metavar="GLOB",
+        help="accept the changes of the keys matching the pattern, when writing a plan other changes are rejected",
+    )
+    parser.add_argument(
+        "--reject",
+        action="append",
+        metavar="GLOB",
+        help="reject the changes of the keys matching the pattern, wins over --accept",
+    )
+    add_filter_arguments(parser)
+    add_instrument_arguments(parser)
+    parser.add_argument(
+        "sources",
         type=Path,
+        nargs="*",
         metavar="source.properties",
-        help="file to modify",
+        help="file(s) to modify, '-' to patch the standard input",
     )
 
     args = parser.parse_args(argv)
+    cache = cache_from_args(args)
 
     color = Color(args.color)
 
-    if args.actions is None:
+    if args.decisions is not None:
+        if (
+            args.patch is not None
+            or args.actions is not None
+            or args.interactive
+            or args.include
+            or args.exclude
+        ):
+            parser.error(
+                "--decisions cannot be used with patches, actions, filters or --interactive"
+            )
+    else:
+        if len(args.sources) == 0:
+            parser.error("the following arguments are required: source.properties")
+        if args.patch is None:
+            parser.error("the following arguments are required: -p/--patch")
+        if args.actions is None:
+            parser.error(
+                "at least one action is required --add|-A, --update|-U, --delete|-D"
+            )
+    if args.write_plan is not None and (
+        args.output is not None or args.overwrite or args.interactive
+    ):
         parser.error(
-            "at least one action is required --add|-A, --update|-U, --delete|-D"
+            "--write-plan cannot be used with --output, --overwrite or --interactive"
         )
-
-    output_content = [] if args.output or args.overwrite else None
-
-    def confirm(message: str, force: bool = False):
-        if force or args.interactive:
-            while True:
-                answer = input(f"💬  {message} [Y/n] ")
-                print(Cursor.UP(), clear_line(), sep="", end="")
-                if answer.lower() in ("y", ""):
-                    return True
-                if answer.lower() == "n":
-                    return False
-        return True
-
-    def print_line(line: Any, color_fnc: Optional[Callable] = None):
-        """
-        print a line with optional color, and keep it to write outputfile at the end
-        """
-        assert line is not None
-        line = str(line)
-        if output_content is not None:
-            output_content.append(line)
-        print(color_fnc(line) if color_fnc else line)
-
-    def quote(data: dict, key: str):
-        text = data.get(key, "")
-        return f'"{text}"' if args.quote else text
-
-    try:
-        # check output file does not exists
-        if args.output and args.output.exists():
-            raise ValueError(
-                "output file already exists, use '--force' to overwrite it"
+    if (args.accept or args.reject) and (
+        args.write_plan is None and args.decisions is None
+    ):
+        parser.error("--accept and --reject require --write-plan or --decisions")
+    if len(args.sources) > 1 and args.interactive:
+        parser.error("--interactive cannot be used with multiple source files")
+    stdin_inputs = [f for f in (args.patch or []) + args.sources if is_stdin(f)]
+    if len(stdin_inputs) > 1:
+        parser.error("the standard input can only be read once")
+    if len(stdin_inputs) > 0 and args.interactive:
+        parser.error("--interactive cannot be used with the standard input")
+    if any(is_stdin(source) for source in args.sources):
+        if len(args.sources) > 1:
+            parser.error("the standard input cannot be patched with other source files")
+        if args.overwrite or args.write_plan is not None or args.decisions is not None:
+            parser.error(
+                "--overwrite, --write-plan and --decisions cannot be used with the standard input"
             )
 
-        patches = {}
-        for patch in args.patch:
-            patches.update(propertiesfile_to_dict(patch, separator=args.sep))
-
-        date_now = datetime.now().isoformat(timespec="seconds", sep=" ")
-
-        source_keys = []
-        for parsed_line in list(parse_file(args.source, separator=args.sep)):
-            if parsed_line.is_property():
-                source_keys.append(parsed_line.key)
-
-            if not parsed_line.is_property():
-                # comment or blank line
-                print_line(parsed_line, color.grey)
-            elif parsed_line.key not in patches:
-                if "delete" in args.actions and confirm(
-                    f"Delete {color.red(parsed_line)} ?"
-                ):
-                    # delete or comment the line
-                    if args.comments:
-                        print_line(f"# {date_now}  remove: {parsed_line}", color.red)
-                else:
-                    # discard change, keep the line
-                    print_line(parsed_line)
-            elif parsed_line.value != patches[parsed_line.key]:
-                if "update" in args.actions and confirm(
-                    f"Update {color.yellow(parsed_line.key)}={color.red(parsed_line.value)},{color.green(patches[parsed_line.key])} ?"
-                ):
-                    # update the line
-                    if args.comments:
-                        print_line(
-                            f"# {date_now}  update: {parsed_line}",
-                            color.yellow,
+    with instrument(
+        args.timings, args.profile, trace_memory=args.tracemalloc, rest="plan"
+    ) as timings:
+        sink = OutputSink(timings.stream("print", sys.stdout))
+        try:
+            decision_file = None
+            sources = args.sources
+            if args.decisions is not None:
+                decision_file = DecisionFile.load(args.decisions)
+                decide(
+                    (c for plan in decision_file.sources for c in plan.changes),
+                    accept=args.accept,
+                    reject=args.reject,
+                )
+                if len(sources) == 0:
+                    sources = [Path(plan.source) for plan in decision_file.sources]
+            targets = output_files(sources, args.output, args.overwrite)
+            if args.overwrite:
+                for source in sources:
+                    if is_compressed(source):
+                        raise ValueError(f"Cannot overwrite compressed file {source}")
+            if not args.overwrite and not args.force:
+                # check output files do not exist
+                for target in targets:
+                    if target is not None and target.exists():
+                        raise ValueError(
+                            f"output file {target} already exists, use '--force' to overwrite it"
                         )
-                    print_line(
-                        f"{parsed_line.key}{args.sep}{quote(patches, parsed_line.key)}",
-                        color.yellow,
+
+            if decision_file is not None:
+                all_stats = []
+                for source, target in zip(sources, targets):
+                    patcher = DecisionPatcher(
+                        decision_file.find(source),
+                        color,
+                        separator=decision_file.separator,
+                        quote=args.quote,
+                        comments=args.comments,
+                        engine=decision_file.engine,
+                        timings=timings,
+                        encoding=decision_file.encoding,
                     )
-                else:
-                    # discard change, keep the line
-                    print_line(parsed_line)
+                    all_stats.append(patcher.apply(source, sink, target))
+                sink.flush()
+                if len(all_stats) > 1:
+                    print_stats(all_stats)
             else:
-                # same key/value, keep the line
-                print_line(parsed_line)
+                keys = key_filter(args.include or (), args.exclude or ())
+                patches = PatchLayers()
+                with timings.phase("parse"):
+                    for patch in args.patch:
+                        patches.add(
+                            str(patch),
+                            load_properties(
+                                patch,
+                                separator=args.sep,
+                                cache=cache,
+                                engine=args.engine,
+                                keys=keys,
+                                encoding=args.encoding,
+                            ),
+                        )
+                timings.count("patch_keys", len(patches))
 
-        # add new properties
-        if "add" in args.actions:
-            for key in patches:
-                line = f"{key}{args.sep}{quote(patches, key)}"
-                if key not in source_keys and confirm(f"Add {color.green(line)} ?"):
-                    # add property
-                    if args.comments:
-                        print_line(f"# {date_now}  add: {key}", color.green)
-                    print_line(line, color.green)
-
-        if output_content and len(output_content) > 0:
-            # write output file
-            (args.source if args.overwrite else args.output).write_text(
-                "\n".join(output_content) + "\n"
-            )
+                patcher = Patcher(
+                    patches,
+                    args.actions,
+                    color,
+                    separator=args.sep,
+                    quote=args.quote,
+                    comments=args.comments,
+                    interactive=args.interactive,
+                    engine=args.engine,
+                    timings=timings,
+                    keys=keys,
+                    encoding=args.encoding,
+                )
+                if args.write_plan is not None:
+                    all_stats = []
+                    decision_file = DecisionFile(
+                        separator=args.sep, engine=args.engine, encoding=args.encoding
+                    )
+                    for source in sources:
+                        plan = patcher.plan(source)
+                        decide(
+                            plan.changes,
+                            accept=args.accept,
+                            reject=args.reject,
+                            default=REJECT if args.accept else None,
+                        )
+                        decision_file.sources.append(plan)
+                        accepted = sum(c.is_accepted() for c in plan.changes)
+                        print(
+                            f"{source}: {len(plan.changes)} changes, {accepted} accepted, "
+                            f"{len(plan.changes) - accepted} rejected",
+                            file=sys.stderr,
+                        )
+                    decision_file.save(args.write_plan)
+                elif len(sources) == 1:
+                    all_stats = [patcher.apply(sources[0], sink, targets[0])]
+                else:
+                    all_stats = []
+                    with ExitStack() as stack:
+                        if args.jobs is not None and args.jobs > 1:
+                            executor = stack.enter_context(
+                                ProcessPoolExecutor(
+                                    max_workers=args.jobs,
+                                    initializer=_init_worker,
+                                    initargs=(patcher,),
+                                )
+                            )
+                            results = executor.map(_apply_in_worker, sources, targets)
+                        else:
+                            _init_worker(patcher)
+                            results = map(_apply_in_worker, sources, targets)
+                        # print patched contents in source order
+                        for stats, text in results:
+                            with timings.phase("print"):
+                                sys.stdout.write(text)
+                            all_stats.append(stats)
+                    print_stats(all_stats)
+            sink.flush()
+            for stats in all_stats:
+                timings.count("added", stats.added)
+                timings.count("updated", stats.updated)
+                timings.count("deleted", stats.deleted)
 
-    except BaseException as exc:  # pylint: disable=broad-except
-        print(color.red(f"ERROR: {exc}"), file=sys.stderr)
-        if isinstance(exc, SyntaxError):
-            print(
-                color.yellow(f"[{exc.filename}:{exc.lineno}]"),
-                "",
-                exc.text,
-                file=sys.stderr,
-            )
-        sys.exit(1)
+        except BaseException as exc:  # pylint: disable=broad-except
+            sink.flush()
+            print(color.red(f"ERROR: {exc}"), file=sys.stderr)
+            if isinstance(exc, SyntaxError):
+                print(
+                    color.yellow(f"[{exc.filename}:{exc.lineno}]"),
+                    "",
+                    exc.text,
+                    file=sys.stderr,
+                )
+            sys.exit(1)
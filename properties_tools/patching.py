@@ -0,0 +1,147 @@
+"""
+patch planning: classify source properties against patches
+"""
+
+from dataclasses import dataclass, field
+from itertools import repeat
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Pattern,
+    Set,
+    Tuple,
+)
+
+from .utils import ParsedLine
+
+KEEP = "keep"
+ADD = "add"
+UPDATE = "update"
+DELETE = "delete"
+
+
+@dataclass
+class PatchPlan:
+    """
+    Keys of a source file to add, update, delete or keep
+    """
+
+    add: List[str] = field(default_factory=list)
+    update: Set[str] = field(default_factory=set)
+    delete: Set[str] = field(default_factory=set)
+    keep: Set[str] = field(default_factory=set)
+
+
+class PatchLayers(Mapping[str, str]):
+    """
+    Stack of patches, the last layer added has the highest priority. Every key is
+    indexed to the top layer defining it, layers are not copied and a value is
+    looked up in a single layer.
+    """
+
+    def __init__(self):
+        self.layers: List[Mapping[str, str]] = []
+        self.names: List[str] = []
+        self._index: Dict[str, int] = {}
+
+    def add(self, name: str, layer: Mapping[str, str]):
+        """
+        Add a layer on top of the others
+        """
+        self._index.update(zip(layer, repeat(len(self.layers))))
+        self.layers.append(layer)
+        self.names.append(name)
+
+    def source(self, key: str) -> str:
+        """
+        Return the name of the layer supplying the value of the key
+        """
+        return self.names[self._index[key]]
+
+    def get(self, key: str, default=None):
+        position = self._index.get(key)
+        return default if position is None else self.layers[position][key]
+
+    def __getitem__(self, key: str) -> str:
+        return self.layers[self._index[key]][key]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+
+class PatchPlanner:
+    """
+    Single pass planner: every source property is looked up once in the patches
+    index, only the patch keys found in the source are remembered to compute the
+    keys to add
+    """
+
+    def __init__(self, patches: Mapping[str, str], keys: Optional[Pattern[str]] = None):
+        self.patches = patches
+        self.keys = keys
+        self._found: Set[str] = set()
+
+    def classify(self, key: str, value: str) -> str:
+        """
+        Return the action for a source property: keep, update or delete, the
+        properties not selected by the keys filter are kept
+        """
+        if self.keys is not None and not self.keys.match(key):
+            return KEEP
+        patch_value = self.patches.get(key)
+        if patch_value is None:
+            return DELETE
+        self._found.add(key)
+        return KEEP if patch_value == value else UPDATE
+
+    def steps(
+        self, lines: Iterable[ParsedLine]
+    ) -> Iterator[Tuple[Optional[str], ParsedLine]]:
+        """
+        Yield every source line with its action, None for comments and empty lines
+        """
+        for line in lines:
+            if line.is_property():
+                yield self.classify(line.key, line.value), line
+            else:
+                yield None, line
+
+    def additions(self) -> List[str]:
+        """
+        Return the patch keys not found in the source and selected by the keys
+        filter, in patches order, must be called once all source lines have been
+        classified
+        """
+        keys = self.keys
+        return [
+            key
+            for key in self.patches
+            if key not in self._found and (keys is None or keys.match(key))
+        ]
+
+
+def plan_patch(lines: Iterable[ParsedLine], patches: Mapping[str, str]) -> PatchPlan:
+    """
+    Compute the plan to patch the given source lines
+    """
+    planner = PatchPlanner(patches)
+    plan = PatchPlan()
+    for action, line in planner.steps(lines):
+        if action == UPDATE:
+            plan.update.add(line.key)
+        elif action == DELETE:
+            plan.delete.add(line.key)
+        elif action == KEEP:
+            plan.keep.add(line.key)
+    plan.add.extend(planner.additions())
+    return plan
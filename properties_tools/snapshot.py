@@ -0,0 +1,229 @@
+"""
+snapshot of a properties file: sorted keys and value hashes, to diff a file against
+a baseline without parsing the baseline again
+"""
+
+import json
+import zlib
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Pattern,
+    Set,
+    Tuple,
+)
+
+from .diffing import DiffResult, diff_dicts
+from .utils import (
+    ENCODING,
+    ParsedLine,
+    is_stdin,
+    iter_lines,
+    open_text,
+    parse_file,
+    parse_file_java,
+    read_java_property,
+)
+
+SNAPSHOT_MAGIC = b"PTSNAP1\n"
+
+
+def value_hash(value: str) -> str:
+    """
+    Short hash of a property value
+    """
+    from hashlib import blake2b  # pylint: disable=import-outside-toplevel
+
+    return blake2b(value.encode(), digest_size=8).hexdigest()
+
+
+def value_hashes(values: Iterable[str]) -> List[str]:
+    """
+    Short hashes of property values
+    """
+    from hashlib import blake2b  # pylint: disable=import-outside-toplevel
+
+    return [blake2b(value.encode(), digest_size=8).hexdigest() for value in values]
+
+
+@dataclass
+class Snapshot:
+    """
+    Sorted keys, value hashes and physical line numbers of a properties file, and
+    the engine it was parsed with
+    """
+
+    source: str
+    size: int
+    mtime_ns: int
+    separator: str = "="
+    comment_char: str = "#"
+    encoding: str = ENCODING
+    engine: str = "line"
+    keys: List[str] = field(default_factory=list)
+    hashes: List[str] = field(default_factory=list)
+    lines: List[int] = field(default_factory=list)
+
+    @classmethod
+    def build(
+        cls,
+        file: Path,
+        separator: str = "=",
+        comment_char: str = "#",
+        keys: Optional[Pattern[str]] = None,
+        encoding: str = ENCODING,
+        engine: str = "line",
+    ) -> "Snapshot":
+        """
+        Parse the file and build its snapshot, with only the keys selected by the
+        filter if given. The regex engine shares the grammar of the line engine.
+        The values are read back from the file, it cannot be the standard input.
+        """
+        if is_stdin(file):
+            raise ValueError("Cannot take a snapshot of the standard input")
+        stat = file.stat()
+        if engine == "java":
+            lines = parse_file_java(file, encoding=encoding)
+        else:
+            lines = parse_file(
+                file, separator=separator, comment_char=comment_char, encoding=encoding
+            )
+        properties: Dict[str, Tuple[int, str]] = {}
+        lineno = 1
+        for line in lines:
+            if line.is_property() and (keys is None or keys.match(line.key)):
+                properties[line.key] = (lineno, line.value)
+            # a continued java line holds several physical lines
+            lineno += line.line.count("\n") + 1
+        keys = sorted(properties)
+        hashes = value_hashes(properties[key][1] for key in keys)
+        return cls(
+            str(file.resolve()),
+            stat.st_size,
+            stat.st_mtime_ns,
+            separator=separator,
+            comment_char=comment_char,
+            encoding=encoding,
+            engine="java" if engine == "java" else "line",
+            keys=keys,
+            hashes=hashes,
+            lines=[properties[key][0] for key in keys],
+        )
+
+    def save(self, file: Path):
+        """
+        Write the snapshot, as compressed json
+        """
+        payload = json.dumps(asdict(self), separators=(",", ":")).encode()
+        file.write_bytes(SNAPSHOT_MAGIC + zlib.compress(payload))
+
+    @classmethod
+    def load(cls, file: Path) -> "Snapshot":
+        """
+        Read a snapshot written by save
+        """
+        content = file.read_bytes()
+        if not content.startswith(SNAPSHOT_MAGIC):
+            raise ValueError(f"Invalid snapshot {file}")
+        return cls(**json.loads(zlib.decompress(content[len(SNAPSHOT_MAGIC) :])))
+
+
+def is_snapshot(file: Path) -> bool:
+    """
+    Check if the file is a snapshot
+    """
+    if not file.is_file():
+        return False
+    with file.open("rb") as stream:
+        return stream.read(len(SNAPSHOT_MAGIC)) == SNAPSHOT_MAGIC
+
+
+class SnapshotValues(Mapping[str, str]):
+    """
+    Values of a snapshot, loaded lazily from the snapshot source file: the file is
+    only read when a value is first needed, and only the lines of the wanted keys
+    are parsed. If the source file changed since the snapshot was taken, the value
+    hash is returned instead.
+    """
+
+    def __init__(self, snapshot: Snapshot, wanted: Iterable[str]):
+        self.snapshot = snapshot
+        self.wanted: Set[str] = set(wanted)
+        self._hashes = dict(zip(snapshot.keys, snapshot.hashes))
+        self._values: Optional[Dict[str, str]] = None
+
+    def _load(self) -> Dict[str, str]:
+        out: Dict[str, str] = {}
+        source = Path(self.snapshot.source)
+        if not self.wanted or not source.is_file():
+            return out
+        stat = source.stat()
+        if (stat.st_size, stat.st_mtime_ns) != (
+            self.snapshot.size,
+            self.snapshot.mtime_ns,
+        ):
+            return out
+        lines = {
+            lineno: key
+            for key, lineno in zip(self.snapshot.keys, self.snapshot.lines)
+            if key in self.wanted
+        }
+        last = max(lines)
+        java = self.snapshot.engine == "java"
+        with open_text(source, encoding=self.snapshot.encoding) as stream:
+            physical = enumerate(iter_lines(stream), 1)
+            for lineno, text in physical:
+                key = lines.get(lineno)
+                if key is not None:
+                    if java:
+                        line = read_java_property(source, lineno, text, physical)
+                    else:
+                        line = ParsedLine(
+                            text,
+                            separator_char=self.snapshot.separator,
+                            comment_char=self.snapshot.comment_char,
+                        )
+                    if line.is_property() and line.key == key:
+                        out[key] = line.value
+                if lineno >= last:
+                    break
+        return out
+
+    def __getitem__(self, key: str) -> str:
+        expected = self._hashes[key]
+        if self._values is None:
+            self._values = self._load()
+        out = self._values.get(key)
+        if out is None or value_hash(out) != expected:
+            return f"<{expected}>"
+        return out
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.snapshot.keys)
+
+    def __len__(self) -> int:
+        return len(self.snapshot.keys)
+
+
+def diff_snapshot(
+    snapshot: Snapshot, right: Mapping[str, str], keys: Optional[Pattern[str]] = None
+) -> DiffResult:
+    """
+    Compare a snapshot (left) with properties (right), left values of deleted and
+    updated keys are loaded lazily from the snapshot source file. Only the snapshot
+    keys selected by the filter are compared if given.
+    """
+    right_hashes = dict(zip(right, value_hashes(right.values())))
+    left_hashes: Iterable[Tuple[str, str]] = zip(snapshot.keys, snapshot.hashes)
+    if keys is not None:
+        left_hashes = ((k, h) for k, h in left_hashes if keys.match(k))
+    out = diff_dicts(dict(left_hashes), right_hashes)
+    out.left = SnapshotValues(snapshot, out.deleted + out.updated)
+    out.right = right
+    return out
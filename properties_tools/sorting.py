@@ -0,0 +1,339 @@
+"""
+out-of-core diff: the properties of a file are sorted by key into temporary runs
+on disk with bounded memory, then the sorted streams of both files are merge-joined
+"""
+
+import heapq
+from itertools import chain, islice
+from operator import itemgetter
+from pathlib import Path
+from typing import (
+    Any,
+    Dict,
+    Generic,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Pattern,
+    Tuple,
+    TypeVar,
+)
+
+from .diffing import ADDED, DELETED, UPDATED
+from .utils import ENCODING, is_stdin, iter_file_bulk, parse_file, parse_file_java
+
+# memory budget of the runs of a file, in bytes
+RUN_SIZE = 128 * 1024 * 1024
+# estimated memory of a property held in a run, on top of its characters
+ENTRY_OVERHEAD = 200
+# items per pickled batch of a spool file
+BATCH_SIZE = 1024
+# maximum number of runs merged at once, earlier runs are merged into one run
+# when a file needs more
+MAX_RUNS = 128
+
+T = TypeVar("T")
+Property = Tuple[str, str]
+Change = Tuple[str, str, Optional[str], Optional[str]]
+
+
+class Spool(Generic[T]):
+    """
+    Items appended to an anonymous temporary file by pickled batches, then read
+    back in order, as many times as needed, with one batch in memory per reader
+    """
+
+    def __init__(self, folder: Optional[Path] = None, batch_size: int = BATCH_SIZE):
+        from tempfile import TemporaryFile  # pylint: disable=import-outside-toplevel
+
+        self.batch_size = batch_size
+        self._file = TemporaryFile(dir=folder)
+        self._batch: List[T] = []
+        self._size = 0
+
+    def append(self, item: T):
+        self._batch.append(item)
+        self._size += 1
+        if len(self._batch) >= self.batch_size:
+            self._flush()
+
+    def extend(self, items: Iterable[T]):
+        items = iter(items)
+        while True:
+            batch = list(islice(items, self.batch_size - len(self._batch)))
+            if not batch:
+                break
+            self._batch.extend(batch)
+            self._size += len(batch)
+            if len(self._batch) >= self.batch_size:
+                self._flush()
+
+    def _flush(self):
+        import pickle  # pylint: disable=import-outside-toplevel
+
+        if self._batch:
+            self._file.seek(0, 2)
+            pickle.dump(self._batch, self._file, protocol=pickle.HIGHEST_PROTOCOL)
+            self._batch = []
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[T]:
+        import pickle  # pylint: disable=import-outside-toplevel
+
+        self._flush()
+        # readers keep their own offset, they can be interleaved with each other
+        position, end = 0, self._file.seek(0, 2)
+        while position < end:
+            self._file.seek(position)
+            batch = pickle.load(self._file)
+            position = self._file.tell()
+            yield from batch
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self) -> "Spool[T]":
+        return self
+
+    def __exit__(self, *exc: Any):
+        self.close()
+
+
+def iter_blocks(
+    file: Path,
+    separator: str = "=",
+    comment_char: str = "#",
+    engine: str = "line",
+    keys: Optional[Pattern[str]] = None,
+    encoding: str = ENCODING,
+    block_size: int = BATCH_SIZE,
+) -> Iterator[List[Property]]:
+    """
+    Stream the (key, value) properties of a file in file order, by blocks: blocks
+    of lines with the regex engine, or blocks of block_size properties
+    """
+    if not is_stdin(file) and not file.exists():
+        raise FileExistsError(f"Cannot find file {file}")
+    if not separator:
+        raise ValueError("Invalid separator")
+    if engine == "regex":
+        for block_keys, values in iter_file_bulk(
+            file,
+            separator=separator,
+            comment_char=comment_char,
+            keys=keys,
+            encoding=encoding,
+        ):
+            yield list(zip(block_keys, values))
+        return
+    if engine == "java":
+        lines = parse_file_java(file, keys=keys, encoding=encoding)
+    elif engine == "line":
+        lines = parse_file(
+            file,
+            separator=separator,
+            comment_char=comment_char,
+            keys=keys,
+            encoding=encoding,
+        )
+    else:
+        raise ValueError(f"Invalid engine {engine}")
+    properties = ((line.key, line.value) for line in lines if line.is_property())
+    while True:
+        block = list(islice(properties, block_size))
+        if not block:
+            return
+        yield block
+
+
+def _size(block: List[Property]) -> int:
+    return sum(len(key) + len(value) for key, value in block) + ENTRY_OVERHEAD * len(
+        block
+    )
+
+
+def unique_last(properties: Iterable[Property]) -> Iterator[Property]:
+    """
+    Only keep the last property of consecutive equal keys, like a dict does
+    """
+    pending: Optional[Property] = None
+    for item in properties:
+        if pending is not None and item[0] != pending[0]:
+            yield pending
+        pending = item
+    if pending is not None:
+        yield pending
+
+
+def merge_runs(runs: Iterable[Iterable[Property]]) -> Iterator[Property]:
+    """
+    Merge runs sorted by unique keys, a key found in several runs gets the value of
+    the last run
+    """
+    # heapq.merge yields equal keys in the order of the runs
+    return unique_last(heapq.merge(*runs, key=itemgetter(0)))
+
+
+class SortedProperties:
+    """
+    Properties of a file sorted by key with bounded memory, a duplicated key gets
+    its last value like in a dict. A file already sorted by key is detected while
+    it is read, and streamed again when iterated, unless it is the standard input
+    which can only be read once. Other files are sorted by runs:
+    properties are gathered in a dict up to run_size bytes, then the run is written
+    sorted to a temporary file, and runs are merged when iterated. A file fitting
+    in a single run is kept in memory.
+    """
+
+    def __init__(
+        self,
+        file: Path,
+        separator: str = "=",
+        comment_char: str = "#",
+        engine: str = "line",
+        keys: Optional[Pattern[str]] = None,
+        run_size: int = RUN_SIZE,
+        folder: Optional[Path] = None,
+        encoding: str = ENCODING,
+    ):
+        self.file = file
+        self.options: Dict[str, Any] = dict(
+            separator=separator,
+            comment_char=comment_char,
+            engine=engine,
+            keys=keys,
+            encoding=encoding,
+        )
+        self.run_size = run_size
+        self.folder = folder
+        self.presorted = False
+        # properties read, duplicated keys included
+        self.properties = 0
+        self.runs: List[Spool[Property]] = []
+        self._memory: Optional[List[Property]] = None
+        try:
+            self._load()
+        except BaseException:
+            self.close()
+            raise
+
+    def _blocks(self) -> Iterator[List[Property]]:
+        return iter_blocks(self.file, **self.options)
+
+    def _load(self):
+        stdin = is_stdin(self.file)
+        blocks = self._blocks()
+        # properties read so far, None once too large to be kept in memory
+        buffer: Optional[Dict[str, str]] = {}
+        size, previous = 0, None
+        for block in blocks:
+            if not block:
+                continue
+            block_keys = [key for key, _ in block]
+            if (previous is not None and block_keys[0] < previous) or sorted(
+                block_keys
+            ) != block_keys:
+                if buffer is not None:
+                    # the properties read so far are the start of the first run
+                    self._sort(chain([block], blocks), buffer, size)
+                else:
+                    self.properties = 0
+                    self._sort(self._blocks(), {}, 0)
+                return
+            self.properties += len(block)
+            previous = block_keys[-1]
+            if buffer is not None:
+                buffer.update(block)
+                size += _size(block)
+                if size >= self.run_size:
+                    if stdin:
+                        # cannot be read again, sort it
+                        self._sort(blocks, buffer, size)
+                        return
+                    # only check the order
+                    buffer = None
+        self.presorted = True
+        if buffer is not None:
+            # sorted keys were inserted in order
+            self._memory = list(buffer.items())
+
+    def _sort(
+        self, blocks: Iterator[List[Property]], buffer: Dict[str, str], size: int
+    ):
+        for block in blocks:
+            self.properties += len(block)
+            buffer.update(block)
+            size += _size(block)
+            if size >= self.run_size:
+                self._spill(sorted(buffer.items()))
+                buffer, size = {}, 0
+        if not self.runs:
+            self._memory = sorted(buffer.items())
+        elif buffer:
+            self._spill(sorted(buffer.items()))
+
+    def _spill(self, run: Iterable[Property]):
+        spool: Spool[Property] = Spool(self.folder)
+        spool.extend(run)
+        self.runs.append(spool)
+        if len(self.runs) >= MAX_RUNS:
+            merged: Spool[Property] = Spool(self.folder)
+            merged.extend(merge_runs(self.runs))
+            self.close()
+            self.runs = [merged]
+
+    def __iter__(self) -> Iterator[Property]:
+        if self._memory is not None:
+            return iter(self._memory)
+        if self.presorted:
+            return unique_last(chain.from_iterable(self._blocks()))
+        return merge_runs(self.runs)
+
+    def close(self):
+        """
+        Delete the temporary runs
+        """
+        for run in self.runs:
+            run.close()
+
+    def __enter__(self) -> "SortedProperties":
+        return self
+
+    def __exit__(self, *exc: Any):
+        self.close()
+
+
+def iter_sorted_diff(
+    left: Iterable[Property], right: Iterable[Property]
+) -> Iterator[Change]:
+    """
+    Merge-join two streams of properties sorted by unique keys, and yield
+    (change, key, left value, right value) in key order like iter_diff, the value
+    of a missing side is None
+    """
+    left_items, right_items = iter(left), iter(right)
+    left_item, right_item = next(left_items, None), next(right_items, None)
+    while left_item is not None and right_item is not None:
+        left_key, left_value = left_item
+        right_key, right_value = right_item
+        if left_key == right_key:
+            if left_value != right_value:
+                yield UPDATED, left_key, left_value, right_value
+            left_item, right_item = next(left_items, None), next(right_items, None)
+        elif left_key < right_key:
+            yield DELETED, left_key, left_value, None
+            left_item = next(left_items, None)
+        else:
+            yield ADDED, right_key, None, right_value
+            right_item = next(right_items, None)
+    if left_item is not None:
+        yield DELETED, left_item[0], left_item[1], None
+        for key, value in left_items:
+            yield DELETED, key, value, None
+    if right_item is not None:
+        yield ADDED, right_item[0], None, right_item[1]
+        for key, value in right_items:
+            yield ADDED, key, None, value
@@ -0,0 +1,227 @@
+"""
+opt-in instrumentation of the cli tools: wall time per phase, counters, peak memory
+and profiling
+"""
+
+import os
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+from time import perf_counter
+from typing import Any, Dict, Iterable, Iterator, Optional, Set, TextIO, TypeVar
+
+TIMINGS_ENV = "PROPERTIES_TOOLS_TIMINGS"
+PROFILE_ENV = "PROPERTIES_TOOLS_PROFILE"
+STDERR = "-"
+# values of the environment variables switching the timings off, or on stderr
+_ENV_OFF = ("", "0", "false", "no")
+_ENV_ON = ("1", "true", "yes")
+
+T = TypeVar("T")
+
+
+class Timings:
+    """
+    Wall time per phase and counters, a disabled instance does nothing. Distinct
+    phases must not overlap, a phase nested in itself is only measured once, and
+    the time not spent in any phase is reported in the rest phase.
+    """
+
+    def __init__(self, enabled: bool = False, rest: str = "other"):
+        self.enabled = enabled
+        self.rest = rest
+        self.phases: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+        self._active: Set[str] = set()
+        self._start = perf_counter()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        Add the time spent in the block to the phase
+        """
+        if not self.enabled or name in self._active:
+            yield
+            return
+        self._active.add(name)
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + perf_counter() - start
+            self._active.discard(name)
+
+    def iterate(
+        self, name: str, items: Iterable[T], counter: Optional[str] = None
+    ) -> Iterator[T]:
+        """
+        Add the time spent producing the items to the phase, and count them
+        """
+        if not self.enabled:
+            return iter(items)
+        return self._iterate(name, iter(items), counter)
+
+    def _iterate(
+        self, name: str, items: Iterator[T], counter: Optional[str]
+    ) -> Iterator[T]:
+        phases, count = self.phases, 0
+        phases.setdefault(name, 0.0)
+        try:
+            while True:
+                start = perf_counter()
+                try:
+                    item = next(items)
+                finally:
+                    phases[name] += perf_counter() - start
+                count += 1
+                yield item
+        except StopIteration:
+            return
+        finally:
+            if counter is not None:
+                self.count(counter, count)
+
+    def count(self, name: str, value: int = 1):
+        """
+        Add the value to the counter
+        """
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def stream(self, name: str, stream: TextIO) -> TextIO:
+        """
+        Return the stream, writes are added to the phase
+        """
+        if not self.enabled:
+            return stream
+        return _TimedStream(stream, self, name)  # type: ignore
+
+    def report(
+        self, peak_rss: Optional[int] = None, peak_memory: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Return the total time, phases, counters, peak resident size and peak traced
+        memory in bytes
+        """
+        total = perf_counter() - self._start
+        phases = dict(self.phases)
+        phases[self.rest] = max(0.0, total - sum(phases.values()))
+        return {
+            "total": total,
+            "phases": phases,
+            "counters": dict(self.counters),
+            "peak_rss": peak_rss,
+            "peak_memory": peak_memory,
+        }
+
+
+class _TimedStream:
+    def __init__(self, stream: TextIO, timings: Timings, name: str):
+        self.stream = stream
+        self.timings = timings
+        self.name = name
+
+    def write(self, text: str) -> int:
+        with self.timings.phase(self.name):
+            return self.stream.write(text)
+
+    def flush(self):
+        with self.timings.phase(self.name):
+            self.stream.flush()
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """
+    Human readable report
+    """
+    total = report["total"]
+    lines = [f"timings: {total:.3f}s"]
+    for name, elapsed in report["phases"].items():
+        share = 100 * elapsed / total if total > 0 else 0
+        lines.append(f"  {name:<10} {elapsed:9.3f}s {share:5.1f}%")
+    if report["counters"]:
+        lines.append(
+            "counters: "
+            + ", ".join(f"{name}={value}" for name, value in report["counters"].items())
+        )
+    for name, label in (("peak_rss", "peak rss"), ("peak_memory", "peak memory")):
+        if report[name] is not None:
+            lines.append(f"{label}: {report[name] / 1024 / 1024:.1f} MiB")
+    return "\n".join(lines)
+
+
+def peak_rss() -> Optional[int]:
+    """
+    Peak resident set size of the process in bytes, None if not available
+    """
+    try:
+        import resource  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        return None
+    out = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macos
+    return out if sys.platform == "darwin" else out * 1024
+
+
+def env_timings() -> Optional[str]:
+    """
+    Return the timings destination set in the environment: None if unset or off
+    ("0", "false", "no"), stderr for "1", "true" or "yes", else a report path
+    """
+    value = os.getenv(TIMINGS_ENV, "").strip()
+    if value.lower() in _ENV_OFF:
+        return None
+    if value.lower() in _ENV_ON:
+        return STDERR
+    return value
+
+
+@contextmanager
+def instrument(
+    timings: Optional[str] = None,
+    profile: Optional[Path] = None,
+    trace_memory: bool = False,
+    rest: str = "other",
+) -> Iterator[Timings]:
+    """
+    Measure the block: timings are written to stderr ("-") or to a json file,
+    profile is a file to dump cProfile stats to, both default to the environment.
+    Peak memory of python allocations is traced with tracemalloc if trace_memory
+    is set, which slows the run down several times.
+    """
+    # pylint: disable=import-outside-toplevel
+    if timings is None:
+        timings = env_timings()
+    if profile is None and os.getenv(PROFILE_ENV):
+        profile = Path(os.environ[PROFILE_ENV])
+
+    out = Timings(enabled=timings is not None, rest=rest)
+    trace_memory = trace_memory and out.enabled
+    profiler = None
+    if trace_memory:
+        import tracemalloc
+
+        tracemalloc.start()
+    if profile is not None:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        yield out
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(profile)
+        if timings is not None:
+            peak = None
+            if trace_memory:
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+            report = out.report(peak_rss=peak_rss(), peak_memory=peak)
+            if timings == STDERR:
+                print(format_report(report), file=sys.stderr)
+            else:
+                import json
+
+                Path(timings).write_text(json.dumps(report, indent=2) + "\n")
@@ -0,0 +1,186 @@
+"""
+token-level diff of values: values are split on delimiters and only the changed
+tokens are reported, within a size, edit and time bound
+"""
+
+import re
+from functools import lru_cache
+from time import perf_counter
+from typing import List, Optional, Pattern, Sequence, Tuple
+
+from .diffing import ADDED, DELETED
+
+DELIMITERS = " ,;:"
+# values larger than this, old and new together, are not split
+MAX_SIZE = 1024 * 1024
+# maximum number of deleted and inserted tokens
+MAX_EDITS = 1000
+# maximum time spent on a value, in seconds
+TIMEOUT = 0.05
+
+Chunk = Tuple[Optional[str], str]
+
+
+@lru_cache(maxsize=None)
+def _split_pattern(delimiters: str) -> Pattern[str]:
+    return re.compile(f"([{re.escape(delimiters)}]+)")
+
+
+def split_tokens(text: str, delimiters: str = DELIMITERS) -> List[str]:
+    """
+    Split a value into tokens, runs of delimiters are tokens too so that joining
+    the tokens gives the value back
+    """
+    if len(delimiters) == 0:
+        return [text] if text else []
+    return [token for token in _split_pattern(delimiters).split(text) if token]
+
+
+def _edit_script(
+    old: Sequence[str], new: Sequence[str], max_edits: int, deadline: float
+) -> Optional[List[Chunk]]:
+    """
+    Myers O(ND) diff, return the tokens tagged None (common), DELETED or ADDED, None
+    if more than max_edits edits are needed or the deadline is reached
+    """
+    n, m = len(old), len(new)
+    if n == 0 or m == 0:
+        # only insertions or deletions
+        return [(ADDED, token) for token in new] + [(DELETED, token) for token in old]
+    limit = min(n + m, max_edits)
+    offset = limit + 1
+    furthest = [0] * (2 * limit + 3)
+    # furthest x reached on every diagonal k = x - y, before each step
+    trace: List[List[int]] = []
+    for d in range(limit + 1):
+        if d > 0 and perf_counter() > deadline:
+            return None
+        trace.append(furthest[offset - d - 1 : offset + d + 2])
+        for k in range(-d, d + 1, 2):
+            if k == -d or (
+                k != d and furthest[offset + k - 1] < furthest[offset + k + 1]
+            ):
+                x = furthest[offset + k + 1]
+            else:
+                x = furthest[offset + k - 1] + 1
+            y = x - k
+            while x < n and y < m and old[x] == new[y]:
+                x, y = x + 1, y + 1
+            furthest[offset + k] = x
+            if x >= n and y >= m:
+                return _backtrack(trace, old, new)
+    return None
+
+
+def _backtrack(
+    trace: List[List[int]], old: Sequence[str], new: Sequence[str]
+) -> List[Chunk]:
+    x, y = len(old), len(new)
+    out: List[Chunk] = []
+    for d in range(len(trace) - 1, -1, -1):
+        furthest, base = trace[d], d + 1
+        k = x - y
+        if k == -d or (k != d and furthest[base + k - 1] < furthest[base + k + 1]):
+            prev_k = k + 1
+        else:
+            prev_k = k - 1
+        prev_x = furthest[base + prev_k]
+        prev_y = prev_x - prev_k
+        while x > prev_x and y > prev_y:
+            x, y = x - 1, y - 1
+            out.append((None, old[x]))
+        if d > 0:
+            if x == prev_x:
+                y -= 1
+                out.append((ADDED, new[y]))
+            else:
+                x -= 1
+                out.append((DELETED, old[x]))
+    out.reverse()
+    return out
+
+
+def diff_tokens(
+    old: str,
+    new: str,
+    delimiters: str = DELIMITERS,
+    max_size: int = MAX_SIZE,
+    max_edits: int = MAX_EDITS,
+    timeout: float = TIMEOUT,
+) -> Optional[List[Chunk]]:
+    """
+    Compare two values token by token and return chunks of text tagged None for
+    common text, DELETED or ADDED, the deleted text of a change comes before its
+    added text. Return None if the values are too large, need too many edits or
+    take too long to compare, the values should then be shown whole.
+    """
+    if len(old) + len(new) > max_size:
+        return None
+    deadline = perf_counter() + timeout
+    old_tokens = split_tokens(old, delimiters)
+    new_tokens = split_tokens(new, delimiters)
+    # common prefix and suffix are trimmed before the diff
+    start = 0
+    end = min(len(old_tokens), len(new_tokens))
+    while start < end and old_tokens[start] == new_tokens[start]:
+        start += 1
+    suffix = 0
+    while suffix < end - start and old_tokens[-1 - suffix] == new_tokens[-1 - suffix]:
+        suffix += 1
+    script = _edit_script(
+        old_tokens[start : len(old_tokens) - suffix],
+        new_tokens[start : len(new_tokens) - suffix],
+        max_edits,
+        deadline,
+    )
+    if script is None:
+        return None
+
+    if delimiters:
+        # changes only separated by delimiters are shown as one change
+        pattern = _split_pattern(delimiters)
+        relabeled: List[Chunk] = []
+        for position, (tag, token) in enumerate(script):
+            if (
+                tag is None
+                and 0 < position < len(script) - 1
+                and script[position - 1][0] is not None
+                and script[position + 1][0] is not None
+                and pattern.fullmatch(token)
+            ):
+                relabeled += [(DELETED, token), (ADDED, token)]
+            else:
+                relabeled.append((tag, token))
+        script = relabeled
+
+    out: List[Chunk] = []
+    if start > 0:
+        out.append((None, "".join(old_tokens[:start])))
+    common: List[str] = []
+    deleted: List[str] = []
+    added: List[str] = []
+
+    def flush():
+        if deleted:
+            out.append((DELETED, "".join(deleted)))
+            deleted.clear()
+        if added:
+            out.append((ADDED, "".join(added)))
+            added.clear()
+        if common:
+            out.append((None, "".join(common)))
+            common.clear()
+
+    for tag, token in script:
+        if tag is None:
+            if deleted or added:
+                flush()
+            common.append(token)
+        else:
+            if common:
+                flush()
+            (deleted if tag == DELETED else added).append(token)
+    flush()
+    if suffix > 0:
+        out.append((None, "".join(old_tokens[len(old_tokens) - suffix :])))
+    return out
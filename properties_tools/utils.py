@@ -1,102 +1,608 @@
-from dataclasses import dataclass, field
-from datetime import datetime
-from functools import cached_property
+import re
+import sys
+from functools import lru_cache, partial
+from io import BufferedReader, RawIOBase, TextIOWrapper
+from itertools import islice
 from pathlib import Path
-from typing import Dict, Generator, Optional, Tuple
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Pattern,
+    TextIO,
+    Tuple,
+)
+
+CHUNK_SIZE = 64 * 1024
+ENCODING = "utf-8"
+STDIN = "-"
+# magic bytes of the compressed formats and the module decoding them
+_COMPRESSIONS = ((b"\x1f\x8b", "gzip"), (b"BZh", "bz2"), (b"\xfd7zXZ\x00", "lzma"))
+_MAGIC_SIZE = 6
+ENGINES = ("line", "regex", "java")
+JAVA_COMMENT_CHARS = "#!"
+KEY_REGEX_PREFIX = "re:"
+_JAVA_WHITESPACES = " \t\f"
+_JAVA_KEY = re.compile(r"((?:[^=: \t\f\\]|\\.)*)[ \t\f]*[=:]?[ \t\f]*(.*)")
+_JAVA_SIMPLE_KEY = re.compile(r"([^=: \t\f]*)[ \t\f]*[=:]?[ \t\f]*(.*)")
+_JAVA_ESCAPE = re.compile(r"\\(u[0-9a-fA-F]{4}|.)")
+_JAVA_ESCAPES = {"t": "\t", "n": "\n", "r": "\r", "f": "\f"}
 
 
-@dataclass
 class ParsedLine:
-    line: str
-    separator_char: str = field(default="=")
-    comment_char: str = field(default="#")
-
-    def __post_init__(self):
-        if (
-            len(self.line) > 0
-            and not self.is_comment()
-            and self.separator_char not in self.line
-        ):
-            raise ValueError("no separator found")
+    """
+    A line of a properties file: an empty line, a comment or a key/value property.
+    The line is split once when the object is built, slots keep the per-line
+    memory footprint low when loading large files
+    """
 
-    def __str__(self):
-        return self.line
+    __slots__ = ("line", "_key", "_value")
 
-    @cached_property
-    def _elements(self) -> Tuple[Optional[str], Optional[str], Optional[str]]:
-        """
-        Parse a line and return key,value,comment or None if empty line
-        """
-        if len(self.line) == 0:
-            # empty line
-            return (None, None, None)
-        if self.line.startswith(self.comment_char):
-            # comment line
-            return (None, None, self.line)
-        if self.separator_char not in self.line:
+    def __init__(self, line: str, separator_char: str = "=", comment_char: str = "#"):
+        self.line = line
+        self._key: Optional[str] = None
+        self._value: Optional[str] = None
+        if len(line) == 0 or line.startswith(comment_char):
+            # empty line or comment line
+            return
+        key, separator, value = line.partition(separator_char)
+        if len(separator) == 0:
             # invalid line
-            raise ValueError(f"no separator '{self.separator_char}'")
-
-        # valid line
-        key, _, value = self.line.partition(self.separator_char)
+            raise ValueError("no separator found")
         # remove useless whitespaces
         key, value = key.strip(), value.strip()
         # remove optional double quotes
         if len(value) > 1 and value[0] == value[-1] == '"':
             value = value[1:-1]
-        return (key, value, None)
+        self._key, self._value = key, value
+
+    def __str__(self):
+        return self.line
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.line!r})"
+
+    def __eq__(self, other):
+        if not isinstance(other, ParsedLine):
+            return NotImplemented
+        return (self.line, self._key, self._value) == (
+            other.line,
+            other._key,
+            other._value,
+        )
+
+    __hash__ = None  # type: ignore
+
+    @classmethod
+    def from_parts(
+        cls, line: str, key: Optional[str] = None, value: Optional[str] = None
+    ) -> "ParsedLine":
+        """
+        Build a parsed line from a key and a value already parsed
+        """
+        out = cls.__new__(cls)
+        out.line, out._key, out._value = line, key, value
+        return out
 
     def is_comment(self):
-        return self.line.startswith(self.comment_char)
+        return self._key is None and len(self.line) > 0
 
     def is_property(self):
-        return self._elements[0] is not None and self._elements[1] is not None
+        return self._key is not None
 
     @property
     def key(self) -> str:
-        out = self._elements[0]
+        out = self._key
         assert out is not None
         return out
 
     @property
     def value(self) -> str:
-        out = self._elements[1]
+        out = self._value
         assert out is not None
         return out
 
 
 def file_date(file: Path):
+    from datetime import datetime  # pylint: disable=import-outside-toplevel
+
+    if is_stdin(file):
+        return now()
     return datetime.isoformat(
         datetime.fromtimestamp(file.stat().st_mtime), timespec="seconds", sep=" "
     )
 
 
+def now():
+    from datetime import datetime  # pylint: disable=import-outside-toplevel
+
+    return datetime.now().isoformat(timespec="seconds", sep=" ")
+
+
+def file_digest(file: Path, chunk_size: int = CHUNK_SIZE) -> str:
+    """
+    Return the hex digest of the file content, the file is read by chunks
+    """
+    from hashlib import blake2b  # pylint: disable=import-outside-toplevel
+
+    out = blake2b(digest_size=20)
+    with file.open("rb") as stream:
+        for chunk in iter(partial(stream.read, chunk_size), b""):
+            out.update(chunk)
+    return out.hexdigest()
+
+
+class _StdinText(TextIOWrapper):
+    """
+    Text stream over the standard input, closing it detaches the binary stream
+    instead of closing it, so that sys.stdin stays usable
+    """
+
+    def close(self):
+        try:
+            self.detach()
+        except ValueError:
+            # already detached
+            pass
+
+
+class _Prefixed(RawIOBase):
+    """
+    Binary stream reading bytes already consumed from a stream, then the rest of
+    the stream, which is not closed
+    """
+
+    def __init__(self, prefix: bytes, stream: BufferedReader):
+        super().__init__()
+        self._prefix = prefix
+        self._stream = stream
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self._prefix:
+            data, self._prefix = (
+                self._prefix[: len(buffer)],
+                self._prefix[len(buffer) :],
+            )
+        else:
+            data = self._stream.read1(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+
+def is_stdin(file: Path) -> bool:
+    """
+    Check if the file is "-", the standard input
+    """
+    return str(file) == STDIN
+
+
+def _compression(magic: bytes) -> Optional[str]:
+    return next(
+        (module for prefix, module in _COMPRESSIONS if magic.startswith(prefix)), None
+    )
+
+
+def is_compressed(file: Path) -> bool:
+    """
+    Check if the file is compressed with gzip, bzip2 or xz
+    """
+    with file.open("rb") as stream:
+        return _compression(stream.read(_MAGIC_SIZE)) is not None
+
+
+def open_text(file: Path, encoding: str = ENCODING) -> TextIO:
+    """
+    Open a file, or the standard input for "-", as a text stream. Files compressed
+    with gzip, bzip2 or xz are detected from their first bytes and decoded while
+    they are read.
+    """
+    # pylint: disable=import-outside-toplevel
+    from importlib import import_module
+
+    if is_stdin(file):
+        stream = sys.stdin.buffer
+        magic = stream.peek(_MAGIC_SIZE)[:_MAGIC_SIZE]
+        if len(magic) < _MAGIC_SIZE:
+            # a pipe may deliver fewer bytes than the magic at first, read them
+            # all then put them back in front of the stream
+            magic = stream.read(_MAGIC_SIZE)
+            stream = BufferedReader(_Prefixed(magic, stream))
+        module = _compression(magic)
+        if module is None:
+            return _StdinText(stream, encoding=encoding)
+        # the decompressing streams do not close a stream they did not open
+        return import_module(module).open(stream, "rt", encoding=encoding)
+    with file.open("rb") as probe:
+        module = _compression(probe.read(_MAGIC_SIZE))
+    if module is None:
+        return file.open(encoding=encoding)
+    return import_module(module).open(file, "rt", encoding=encoding)
+
+
+def _key_regex(pattern: str) -> str:
+    if pattern.startswith(KEY_REGEX_PREFIX):
+        regex = pattern[len(KEY_REGEX_PREFIX) :]
+        try:
+            re.compile(regex)
+        except re.error as ex:
+            raise ValueError(f"Invalid pattern {pattern}: {ex}") from ex
+        return f"(?s:.*?(?:{regex}))"
+    from fnmatch import translate  # pylint: disable=import-outside-toplevel
+
+    return translate(pattern)
+
+
+def key_filter(
+    include: Iterable[str] = (), exclude: Iterable[str] = ()
+) -> Optional[Pattern[str]]:
+    """
+    Compile include and exclude patterns into a single regular expression matching
+    the selected keys: keys matching an include pattern, or any key if there is
+    none, and no exclude pattern. Patterns are globs, or regular expressions
+    searched in the key with the "re:" prefix. Return None if there is no pattern.
+    """
+    include, exclude = list(include), list(exclude)
+    if len(include) == 0 and len(exclude) == 0:
+        return None
+    out = ""
+    if len(include) > 0:
+        out += f"(?={'|'.join(map(_key_regex, include))})"
+    if len(exclude) > 0:
+        out += f"(?!{'|'.join(map(_key_regex, exclude))})"
+    return re.compile(out)
+
+
+def key_matcher(patterns: Iterable[str]) -> Optional[Callable[[str], Any]]:
+    """
+    Compile patterns, like key_filter, into a function telling if a key matches
+    any of them, None if there is no pattern
+    """
+    out = key_filter(include=patterns)
+    return None if out is None else out.match
+
+
+def iter_lines(stream: TextIO, chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """
+    Read a text stream by fixed-size chunks and yield lines without their line
+    terminator, so that at most one chunk plus one partial line is kept in memory
+    """
+    pending: List[str] = []
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        lines = chunk.split("\n")
+        if len(lines) == 1:
+            # no line terminator in this chunk
+            pending.append(chunk)
+            continue
+        pending.append(lines[0])
+        yield "".join(pending)
+        yield from islice(lines, 1, len(lines) - 1)
+        pending = [lines[-1]]
+    last = "".join(pending)
+    if len(last) > 0:
+        yield last
+
+
+def iter_chunks(stream: TextIO, chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+    """
+    Read a text stream by fixed-size chunks and yield blocks of complete lines,
+    every block ends with a line terminator
+    """
+    pending: List[str] = []
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        end = chunk.rfind("\n") + 1
+        if end == 0:
+            # no line terminator in this chunk
+            pending.append(chunk)
+            continue
+        pending.append(chunk[:end])
+        yield "".join(pending)
+        pending = [chunk[end:]]
+    last = "".join(pending)
+    if len(last) > 0:
+        yield last + "\n"
+
+
 def parse_file(
-    file: Path, separator: str = "=", comment_char: str = "#"
+    file: Path,
+    separator: str = "=",
+    comment_char: str = "#",
+    chunk_size: int = CHUNK_SIZE,
+    keys: Optional[Pattern[str]] = None,
+    encoding: str = ENCODING,
 ) -> Generator[ParsedLine, None, None]:
     """
-    Parse a properties file and yiels parsed lines
+    Parse a properties file and yiels parsed lines, the file is streamed by
+    chunks of chunk_size characters, see open_text. With a keys filter, only the
+    selected properties are yielded, other lines are skipped before being parsed.
     """
-    for lineno, line in enumerate(file.read_text().splitlines(), 1):
-        try:
-            yield ParsedLine(line, separator_char=separator, comment_char=comment_char)
-        except ValueError as ex:
-            raise syntax_error(ex, file, line, lineno)
+    selected = keys.match if keys is not None else None
+    with open_text(file, encoding=encoding) as stream:
+        for lineno, line in enumerate(iter_lines(stream, chunk_size=chunk_size), 1):
+            if selected is not None:
+                if len(line) == 0 or line.startswith(comment_char):
+                    continue
+                key, found, _ = line.partition(separator)
+                if found and not selected(key.strip()):
+                    continue
+            try:
+                yield ParsedLine(
+                    line, separator_char=separator, comment_char=comment_char
+                )
+            except ValueError as ex:
+                raise syntax_error(ex, file, line, lineno)
+
+
+@lru_cache(maxsize=None)
+def _bulk_pattern(separator: str, comment_char: str) -> Pattern[str]:
+    """
+    Pattern matching exactly one line, groups are: comment, key, separator, value
+    and invalid line. Greedy patterns are used, keys and values are stripped after.
+    """
+    sep = re.escape(separator)
+    if len(separator) == 1:
+        key = f"[^{sep}\\n]*"
+    else:
+        key = f"(?:(?!{sep})[^\\n])*"
+    return re.compile(f"(?:({re.escape(comment_char)}.*)|({key})({sep})(.*)|(.+)|)\\n")
+
+
+def parse_file_bulk(
+    file: Path,
+    separator: str = "=",
+    comment_char: str = "#",
+    chunk_size: int = CHUNK_SIZE,
+    keys: Optional[Pattern[str]] = None,
+    encoding: str = ENCODING,
+) -> Tuple[List[str], List[str]]:
+    """
+    Bulk parsing engine: tokenize blocks of lines with a compiled pattern and return
+    the keys and values arrays, in file order, without building ParsedLine objects.
+    Invalid lines are reported by the line engine. With a keys filter, rows of the
+    other keys are dropped before their value is extracted.
+    """
+    out_keys: List[str] = []
+    values: List[str] = []
+    for block_keys, block_values in iter_file_bulk(
+        file,
+        separator=separator,
+        comment_char=comment_char,
+        chunk_size=chunk_size,
+        keys=keys,
+        encoding=encoding,
+    ):
+        out_keys.extend(block_keys)
+        values.extend(block_values)
+    return out_keys, values
+
+
+def iter_file_bulk(
+    file: Path,
+    separator: str = "=",
+    comment_char: str = "#",
+    chunk_size: int = CHUNK_SIZE,
+    keys: Optional[Pattern[str]] = None,
+    encoding: str = ENCODING,
+) -> Iterator[Tuple[List[str], List[str]]]:
+    """
+    Like parse_file_bulk, but yield the keys and values arrays of every block of
+    lines, so that only one block is kept in memory
+    """
+    pattern = _bulk_pattern(separator, comment_char)
+    lineno = 0
+    with open_text(file, encoding=encoding) as stream:
+        for text in iter_chunks(stream, chunk_size=chunk_size):
+            rows = pattern.findall(text)
+            invalid = next((i for i, row in enumerate(rows) if row[4]), None)
+            if invalid is not None:
+                line = rows[invalid][4]
+                try:
+                    ParsedLine(
+                        line, separator_char=separator, comment_char=comment_char
+                    )
+                except ValueError as ex:
+                    raise syntax_error(ex, file, line, lineno + invalid + 1)
+            if keys is None:
+                properties = [row for row in rows if row[2]]
+            else:
+                selected = keys.match
+                properties = [
+                    row for row in rows if row[2] and selected(row[1].strip())
+                ]
+            yield [row[1].strip() for row in properties], [
+                (
+                    value[1:-1]
+                    if len(value) > 1 and value[0] == value[-1] == '"'
+                    else value
+                )
+                for value in [row[3].strip() for row in properties]
+            ]
+            lineno += len(rows)
+
+
+def _java_escape(match) -> str:
+    escaped = match.group(1)
+    if len(escaped) == 5:
+        return chr(int(escaped[1:], 16))
+    if escaped == "u":
+        raise ValueError("malformed \\uxxxx encoding")
+    return _JAVA_ESCAPES.get(escaped, escaped)
+
+
+def java_unescape(text: str) -> str:
+    """
+    Decode the escape sequences of a key or a value in Java properties
+    """
+    if "\\" not in text:
+        return text
+    out = _JAVA_ESCAPE.sub(_java_escape, text)
+    if "\\u" in text:
+        # surrogate pairs, like Java strings
+        out = out.encode("utf-16-le", "surrogatepass").decode("utf-16-le")
+    return out
+
+
+def java_escape(text: str, key: bool = False) -> str:
+    """
+    Encode a key or a value to be written in Java properties
+    """
+    out = (
+        text.replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+        .replace("\f", "\\f")
+    )
+    if key:
+        out = re.sub(r"([=: #!])", r"\\\1", out)
+    elif out.startswith(" "):
+        out = "\\" + out
+    return out
+
+
+def _java_continues(text: str) -> bool:
+    """
+    A line continues on the next line if it ends with an odd number of backslashes
+    """
+    return (
+        len(text) > 0
+        and text[-1] == "\\"
+        and (len(text) - len(text.rstrip("\\"))) % 2 == 1
+    )
+
+
+def parse_file_java(
+    file: Path,
+    chunk_size: int = CHUNK_SIZE,
+    keys: Optional[Pattern[str]] = None,
+    encoding: str = ENCODING,
+) -> Generator[ParsedLine, None, None]:
+    """
+    Parse a properties file with the Java grammar: "#" and "!" comments, "=", ":"
+    or whitespace separators, lines continued with a trailing backslash and escape
+    sequences. The file is streamed by chunks, a parsed line holds all the physical
+    lines of a continued line. With a keys filter, only the selected properties are
+    yielded.
+    """
+    from_parts = ParsedLine.from_parts
+    selected = keys.match if keys is not None else None
+    with open_text(file, encoding=encoding) as stream:
+        lines = enumerate(iter_lines(stream, chunk_size=chunk_size), 1)
+        for lineno, line in lines:
+            text = line.lstrip(_JAVA_WHITESPACES)
+            if len(text) == 0 or text[0] in JAVA_COMMENT_CHARS:
+                # blank line or comment line
+                if selected is None:
+                    yield from_parts(line)
+            elif "\\" not in text:
+                # no escape sequence nor continuation
+                key, value = _JAVA_SIMPLE_KEY.match(text).groups()
+                if selected is None or selected(key):
+                    yield from_parts(line, key, value)
+            else:
+                parsed = read_java_property(file, lineno, line, lines)
+                if selected is None or selected(parsed.key):
+                    yield parsed
+
+
+def read_java_property(
+    file: Path, lineno: int, line: str, lines: Iterator[Tuple[int, str]]
+) -> ParsedLine:
+    """
+    Parse a Java property starting at the given physical line, the following
+    physical lines of a continued line are read from lines, an iterator of
+    (line number, line)
+    """
+    text = line.lstrip(_JAVA_WHITESPACES)
+    if "\\" not in text:
+        key, value = _JAVA_SIMPLE_KEY.match(text).groups()
+        return ParsedLine.from_parts(line, key, value)
+    physical = [(lineno, line)]
+    if _java_continues(text):
+        parts = [text[:-1]]
+        for lineno, line in lines:
+            physical.append((lineno, line))
+            text = line.lstrip(_JAVA_WHITESPACES)
+            if not _java_continues(text):
+                parts.append(text)
+                break
+            parts.append(text[:-1])
+        text = "".join(parts)
+    try:
+        key, value = map(java_unescape, _JAVA_KEY.match(text).groups())
+    except ValueError as ex:
+        lineno, line = next(
+            (
+                item
+                for item in physical
+                if any(
+                    escape.group(1) == "u" for escape in _JAVA_ESCAPE.finditer(item[1])
+                )
+            ),
+            physical[0],
+        )
+        raise syntax_error(ex, file, line, lineno)
+    return ParsedLine.from_parts("\n".join(item[1] for item in physical), key, value)
 
 
 def propertiesfile_to_dict(
-    file: Path, separator="=", comment_char="#"
+    file: Path,
+    separator="=",
+    comment_char="#",
+    engine: str = "line",
+    keys: Optional[Pattern[str]] = None,
+    encoding: str = ENCODING,
 ) -> Dict[str, str]:
     """
-    Parse a properties file and return the dict of key:value
+    Parse a properties file and return the dict of key:value, using the line
+    engine (ParsedLine objects), the regex engine (bulk parsing) or the java engine
+    (Java grammar, the separator and comment char are ignored). With a keys filter,
+    see key_filter, other keys are skipped by the parser. The file can be "-" for
+    the standard input, and can be compressed, see open_text.
     """
-    if not file.exists():
+    if not is_stdin(file) and not file.exists():
         raise FileExistsError(f"Cannot find file {file}")
     if not separator:
         raise ValueError("Invalid separator")
+    if engine == "regex":
+        bulk_keys, values = parse_file_bulk(
+            file,
+            separator=separator,
+            comment_char=comment_char,
+            keys=keys,
+            encoding=encoding,
+        )
+        return dict(zip(bulk_keys, values))
+    if engine == "java":
+        return {
+            l.key: l.value
+            for l in parse_file_java(file, keys=keys, encoding=encoding)
+            if l.is_property()
+        }
+    if engine != "line":
+        raise ValueError(f"Invalid engine {engine}")
     return {
         l.key: l.value
-        for l in parse_file(file, separator=separator, comment_char=comment_char)
+        for l in parse_file(
+            file,
+            separator=separator,
+            comment_char=comment_char,
+            keys=keys,
+            encoding=encoding,
+        )
         if l.is_property()
     }
 
@@ -1,5 +1,6 @@
 # pylint: disable=missing-function-docstring,missing-class-docstring
 from datetime import datetime
+from io import BufferedReader, BytesIO, TextIOWrapper
 from os import getenv, utime
 from pathlib import Path
 from re import fullmatch
@@ -18,6 +19,13 @@ def set_mtime(file: Path, date_str: str):
     utime(file, (timestamp, timestamp))
 
 
+def fake_stdin(data: bytes) -> TextIOWrapper:
+    """
+    A standard input reading data, with a buffer that can be peeked
+    """
+    return TextIOWrapper(BufferedReader(BytesIO(data)))  # type: ignore
+
+
 def format_line(text: str, variables: Dict[str, Any]):
     return text.format(**variables)
 
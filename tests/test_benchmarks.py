@@ -0,0 +1,43 @@
+# pylint: disable=missing-function-docstring
+"""
+test for the benchmark suite
+"""
+
+import json
+from pathlib import Path
+
+from benchmarks.generator import generate
+from benchmarks.run import main
+from properties_tools.diffing import diff_dicts
+from properties_tools.utils import propertiesfile_to_dict
+
+
+def test_generator(tmp_path: Path):
+    first, second = tmp_path / "first.properties", tmp_path / "second.properties"
+    generate(first, 1000, comment_ratio=0.1)
+    generate(second, 1000, comment_ratio=0.1)
+    assert first.read_text() == second.read_text()
+    assert len(propertiesfile_to_dict(first)) == 1000
+
+    changed = tmp_path / "changed.properties"
+    generate(changed, 1000, comment_ratio=0.1, change_ratio=0.3)
+    result = diff_dicts(propertiesfile_to_dict(first), propertiesfile_to_dict(changed))
+    for keys in (result.added, result.deleted, result.updated):
+        assert 50 < len(keys) < 150
+
+
+def test_run(tmp_path: Path):
+    output = tmp_path / "results.json"
+    main(["--keys", "100", "200", "--repeat", "1", "--output", str(output)])
+    results = json.loads(output.read_text())["results"]
+    assert {item["name"] for item in results} == {
+        "parse_file",
+        "propertiesfile_to_dict",
+        "diff",
+        "patch",
+        "render_simple",
+        "render_diff",
+        "render_wdiff",
+    }
+    assert len(results) == 14
+    main(["--keys", "100", "--repeat", "1", "--compare", str(output)])
@@ -0,0 +1,92 @@
+# pylint: disable=missing-function-docstring,unused-import,redefined-outer-name
+"""
+test for parsed files cache
+"""
+
+from os import utime
+from pathlib import Path
+
+import pytest
+from properties_tools import cache as cache_module
+from properties_tools.cache import ParsedCache, default_cache, load_properties
+from properties_tools.utils import key_filter, propertiesfile_to_dict
+
+from . import samples
+
+
+def test_cache_hit(tmp_path: Path, samples: Path, monkeypatch):
+    cache = ParsedCache(tmp_path / "cache")
+    sample = samples / "sample1.properties"
+    expected = propertiesfile_to_dict(sample)
+    assert cache.load(sample) == expected
+    assert len(list((tmp_path / "cache").iterdir())) == 1
+
+    def fail(*_args, **_kwargs):
+        raise AssertionError("file should not be parsed")
+
+    monkeypatch.setattr(cache_module, "propertiesfile_to_dict", fail)
+    assert load_properties(sample, cache=cache) == expected
+    with pytest.raises(AssertionError):
+        cache.load(sample, separator=":")
+    with pytest.raises(AssertionError):
+        cache.load(sample, keys=key_filter(["database.*"]))
+
+
+def test_cache_invalidation(tmp_path: Path, samples: Path):
+    cache = ParsedCache(tmp_path / "cache")
+    sample = samples / "sample1.properties"
+    stat = sample.stat()
+    assert cache.load(sample)["database.port"] == "5432"
+    sample.write_text(sample.read_text().replace("5432", "1234"))
+    # same size and mtime, only the content changed
+    utime(sample, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert cache.load(sample)["database.port"] == "1234"
+    assert len(list((tmp_path / "cache").iterdir())) == 2
+
+
+def test_cache_eviction(tmp_path: Path, samples: Path):
+    cache = ParsedCache(tmp_path / "cache", max_size=1)
+    cache.load(samples / "sample1.properties")
+    cache.load(samples / "sample2.properties")
+    assert len(list((tmp_path / "cache").iterdir())) == 1
+
+    cache = ParsedCache(tmp_path / "cache2")
+    files = [samples / f"sample{i}.properties" for i in (1, 2, 3)]
+    entries = [cache.entry(file) for file in files]
+    for index, file in enumerate(files):
+        cache.load(file)
+        utime(entries[index], ns=(index, index))
+    # use sample1 again, sample2 is now the least recently used
+    cache.load(files[0])
+    cache.max_size = sum(entry.stat().st_size for entry in entries) - 1
+    cache.evict()
+    assert [entry.exists() for entry in entries] == [True, False, True]
+
+
+def test_default_cache(tmp_path: Path, monkeypatch):
+    monkeypatch.delenv(cache_module.CACHE_ENV, raising=False)
+    assert default_cache() is None
+    monkeypatch.setenv(cache_module.CACHE_ENV, str(tmp_path))
+    monkeypatch.setenv(cache_module.CACHE_SIZE_ENV, "64")
+    cache = default_cache()
+    assert cache is not None
+    # in MB, like --cache-size
+    assert (cache.folder, cache.max_size) == (tmp_path, 64 * 1024 * 1024)
+    cache = default_cache(max_size=0)
+    assert cache is not None and cache.max_size == 0
+
+
+def test_cli_cache_size(tmp_path: Path, samples: Path, monkeypatch, capsys):
+    from properties_tools.diff import run  # pylint: disable=import-outside-toplevel
+
+    monkeypatch.delenv(cache_module.CACHE_ENV, raising=False)
+    left, right = samples / "sample1.properties", samples / "sample2.properties"
+    folder = tmp_path / "cache"
+    monkeypatch.setenv(cache_module.CACHE_SIZE_ENV, "64")
+    run([str(left), str(right), "--cache", str(folder)])
+    assert len(list(folder.glob("*.pickle"))) == 2
+    # 0 is a size, not unset: only the entry just written is kept
+    folder = tmp_path / "empty"
+    run([str(left), str(right), "--cache", str(folder), "--cache-size", "0"])
+    assert len(list(folder.glob("*.pickle"))) == 1
+    capsys.readouterr()
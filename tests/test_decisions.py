@@ -0,0 +1,103 @@
+# pylint: disable=missing-function-docstring,unused-import,redefined-outer-name
+"""
+test for decision files
+"""
+
+from pathlib import Path
+
+import pytest
+from properties_tools.decisions import (
+    ACCEPT,
+    REJECT,
+    DecisionFile,
+    DecisionPlanner,
+    PlannedChange,
+    SourcePlan,
+    decide,
+)
+from properties_tools.patching import ADD, DELETE, KEEP, UPDATE
+from properties_tools.utils import file_digest, parse_file
+
+from . import samples
+
+
+def test_decide():
+    changes = [
+        PlannedChange(UPDATE, "database.user", "test", "dbuser"),
+        PlannedChange(DELETE, "database.host", "localhost"),
+        PlannedChange(ADD, "app.name", new="foo"),
+    ]
+    decide(changes, accept=["database.*"], default=REJECT)
+    assert [c.decision for c in changes] == [ACCEPT, ACCEPT, REJECT]
+    decide(changes, accept=["*"], reject=["*.host"])
+    assert [c.decision for c in changes] == [ACCEPT, REJECT, ACCEPT]
+    decide(changes, reject=["app.*"])
+    assert [c.decision for c in changes] == [ACCEPT, REJECT, REJECT]
+
+
+def test_planner(samples: Path):
+    source = samples / "sample1.properties"
+    plan = SourcePlan(
+        str(source),
+        file_digest(source),
+        [
+            PlannedChange(UPDATE, "database.type", "postgresql", "mysql"),
+            PlannedChange(DELETE, "database.host", "localhost", decision=REJECT),
+            PlannedChange(ADD, "database.version", new="12"),
+        ],
+    )
+    plan.verify(source)
+    assert plan.patches() == {"database.type": "mysql", "database.version": "12"}
+    assert plan.decisions() == {
+        "database.type": True,
+        "database.host": False,
+        "database.version": True,
+    }
+    planner = DecisionPlanner(plan)
+    actions = {
+        line.key: action for action, line in planner.steps(parse_file(source)) if action
+    }
+    assert actions == {
+        "database.type": UPDATE,
+        "database.host": DELETE,
+        "database.port": KEEP,
+        "database.user": KEEP,
+        "database.password": KEEP,
+    }
+    assert planner.additions() == ["database.version"]
+
+    source.write_text(source.read_text() + "\nfoo=bar\n")
+    with pytest.raises(ValueError, match="has changed"):
+        plan.verify(source)
+
+
+def test_save_load(tmp_path: Path):
+    plans = DecisionFile(
+        separator=":",
+        engine="java",
+        encoding="latin-1",
+        sources=[
+            SourcePlan(
+                "a.properties",
+                "0123",
+                [
+                    PlannedChange(UPDATE, "key", "old", 'new "é"'),
+                    PlannedChange(ADD, "other", new="1", decision=REJECT),
+                ],
+            ),
+            SourcePlan("b.properties", "4567"),
+        ],
+    )
+    file = tmp_path / "plan.json"
+    plans.save(file)
+    # one change per line, in utf-8 whatever the locale
+    assert len(file.read_text(encoding="utf-8").splitlines()) == 8
+    assert 'new \\"é\\"' in file.read_bytes().decode("utf-8")
+    assert DecisionFile.load(file) == plans
+    assert plans.find(Path("b.properties")) is plans.sources[1]
+    with pytest.raises(ValueError):
+        plans.find(Path("c.properties"))
+
+    file.write_text(file.read_text().replace('"reject"', '"maybe"'))
+    with pytest.raises(ValueError, match="Invalid decision"):
+        DecisionFile.load(file)
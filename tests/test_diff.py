@@ -2,14 +2,20 @@
 """
 test for diff cli
 """
+
+import gzip
+import json
+import lzma
+import sys
 from pathlib import Path
 from shlex import split
 
 import pytest
 from properties_tools import __version__
+from properties_tools import diff as diff_module
 from properties_tools.diff import run
 
-from . import TEMPLATES_DIR, assert_capsys, samples
+from . import TEMPLATES_DIR, assert_capsys, fake_stdin, samples, set_mtime
 
 
 def template(filename: str):
@@ -264,3 +270,279 @@ def test_colors(capsys, samples: Path):
         stdout_reference=template("test_colors_diff.out"),
         stderr_reference="",
     )
+
+
+def test_directories(capsys, samples: Path):
+    left, right = samples / "left", samples / "right"
+    for folder in (left / "sub", right / "sub"):
+        folder.mkdir(parents=True)
+    for source, target in (
+        ("sample1.properties", left / "app.properties"),
+        ("sample2.properties", right / "app.properties"),
+        ("sample1.properties", left / "sub" / "db.properties"),
+        ("sample1_alt.properties", right / "sub" / "db.properties"),
+        ("sample3.properties", left / "only_left.properties"),
+        ("sample3.properties", right / "sub" / "only_right.properties"),
+    ):
+        target.write_text((samples / source).read_text())
+        set_mtime(target, "2020-12-12T12:00:00")
+    for jobs in (1, 2):
+        run(split(f"{left} {right} --mode diff --jobs {jobs}"))
+        assert_capsys(
+            capsys,
+            samples,
+            stdout_reference=template("test_directories.out"),
+            stderr_reference="",
+        )
+
+
+def test_directory_and_file(capsys, samples: Path):
+    with pytest.raises(SystemExit):
+        run(split(f"{samples} {samples / 'sample1.properties'}"))
+    assert_capsys(
+        capsys,
+        samples,
+        stdout_reference="",
+        stderr_reference="ERROR: Cannot compare a directory with a file\n",
+    )
+
+
+def test_engine(capsys, samples: Path):
+    for engine in ("line", "regex"):
+        run(
+            split(
+                f"{samples / 'sample1.properties'} {samples / 'sample2.properties'} --wdiff --engine {engine}"
+            )
+        )
+        assert_capsys(
+            capsys,
+            samples,
+            stdout_reference=template("test_wdiff.out"),
+            stderr_reference="",
+        )
+    with pytest.raises(SystemExit):
+        run(
+            split(
+                f"{samples / 'sample1.properties'} {samples / 'sample1.properties'} --sep / --engine regex"
+            )
+        )
+    assert_capsys(
+        capsys,
+        samples,
+        stdout_reference="",
+        stderr_reference=template("test_bad_sep.err"),
+    )
+
+
+def test_snapshot(capsys, samples: Path):
+    snapshot = samples / "sample1.snapshot"
+    run(split(f"{samples / 'sample1.properties'} --save-snapshot {snapshot}"))
+    set_mtime(snapshot, "2020-12-12T12:00:00")
+    run(split(f"{snapshot} {samples / 'sample2.properties'} -m diff"))
+    assert_capsys(
+        capsys,
+        samples,
+        stdout_reference=template("test_snapshot.out"),
+        stderr_reference="",
+    )
+    with pytest.raises(SystemExit):
+        run(
+            split(
+                f"{samples / 'sample1.properties'} {samples / 'sample2.properties'} --save-snapshot {snapshot}"
+            )
+        )
+
+
+def test_samefile_parsed_once(capsys, samples: Path, monkeypatch):
+    parsed = []
+    load_properties = diff_module.load_properties
+
+    def spy(file, *args, **kwargs):
+        parsed.append(file)
+        return load_properties(file, *args, **kwargs)
+
+    monkeypatch.setattr(diff_module, "load_properties", spy)
+    copy = samples / "copy.properties"
+    copy.write_bytes((samples / "sample1.properties").read_bytes())
+    run(split(f"{samples / 'sample1.properties'} {copy}"))
+    assert parsed == [samples / "sample1.properties"]
+    assert "are similar" in capsys.readouterr().out
+
+
+def test_format_jsonl(capsys, samples: Path):
+    left, right = samples / "sample1.properties", samples / "sample2.properties"
+    run(split(f"{left} {right} --format jsonl"))
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert records == [
+        {"type": "deleted", "key": "database.host", "left": "localhost"},
+        {
+            "type": "updated",
+            "key": "database.type",
+            "left": "postgresql",
+            "right": "mysql",
+        },
+        {"type": "updated", "key": "database.user", "left": "test", "right": "dbuser"},
+        {"type": "added", "key": "database.version", "right": "12"},
+        {
+            "type": "summary",
+            "left_file": str(left),
+            "right_file": str(right),
+            "added": 1,
+            "deleted": 1,
+            "updated": 2,
+            "similar": False,
+        },
+    ]
+
+
+def test_format_json(capsys, samples: Path):
+    left, right = samples / "sample1.properties", samples / "sample2.properties"
+    run(split(f"{left} {right} --format json -A -D"))
+    records = json.loads(capsys.readouterr().out)
+    assert [r["type"] for r in records] == ["deleted", "added", "summary"]
+    assert records[-1]["updated"] == 2
+    run(split(f"{left} {left} --format json"))
+    records = json.loads(capsys.readouterr().out)
+    assert [r["similar"] for r in records] == [True]
+
+
+def test_format_directories(capsys, samples: Path):
+    left, right = samples / "left", samples / "right"
+    left.mkdir()
+    right.mkdir()
+    (left / "app.properties").write_text((samples / "sample1.properties").read_text())
+    (right / "app.properties").write_text((samples / "sample2.properties").read_text())
+    (left / "only.properties").write_text("foo=bar\n")
+    run(split(f"{left} {right} --format jsonl -U --jobs 1"))
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [(r["type"], r["file"]) for r in records] == [
+        ("updated", "app.properties"),
+        ("updated", "app.properties"),
+        ("summary", "app.properties"),
+        ("only_in_left", "only.properties"),
+    ]
+
+
+def test_timings(capsys, tmp_path: Path, samples: Path):
+    left, right = samples / "sample1.properties", samples / "sample2.properties"
+    run(split(f"{left} {right} --format jsonl"))
+    expected = capsys.readouterr().out
+    report = tmp_path / "timings.json"
+    run(split(f"{left} {right} --format jsonl --timings-file {report}"))
+    assert capsys.readouterr().out == expected
+    data = json.loads(report.read_text())
+    assert set(data["phases"]) == {"parse", "diff", "print", "render"}
+    assert data["counters"] == {"left_keys": 5, "right_keys": 5, "changes": 4}
+
+    run(split(f"{left} {right} --nocolor --timings --profile {tmp_path / 'run.prof'}"))
+    assert "counters: left_keys=5" in capsys.readouterr().err
+    assert (tmp_path / "run.prof").is_file()
+
+
+def test_include_exclude(capsys, samples: Path):
+    left, right = samples / "sample1.properties", samples / "sample2.properties"
+    run(
+        split(
+            f"{left} {right} --format jsonl --include 'database.*' --exclude 're:(host|user)$'"
+        )
+    )
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [(r["type"], r.get("key")) for r in records] == [
+        ("updated", "database.type"),
+        ("added", "database.version"),
+        ("summary", None),
+    ]
+
+    run(split(f"{left} {right} --nocolor --include 'app.*'"))
+    assert capsys.readouterr().out == f"Files {left} and {right} are similar\n"
+
+    with pytest.raises(SystemExit):
+        run(split(f"{left} {right} --include 're:['"))
+    assert "Invalid pattern re:[" in capsys.readouterr().err
+
+
+def test_tokens(capsys, tmp_path: Path):
+    left, right = tmp_path / "left.properties", tmp_path / "right.properties"
+    left.write_text("jvm.opts=-Xmx1g -Xms512m\nclasspath=a.jar:b.jar:c.jar\n")
+    right.write_text("jvm.opts=-Xmx2g -Xms512m\nclasspath=a.jar:c.jar\n")
+    run(split(f"--nocolor -q --tokens {left} {right}"))
+    assert capsys.readouterr().out.splitlines()[1:] == [
+        "classpath=a.jar:[-b.jar:-]c.jar",
+        "jvm.opts=[--Xmx1g-]{+-Xmx2g+} -Xms512m",
+    ]
+    run(split(f"--nocolor -q --tokens --delimiters ' ' {left} {right}"))
+    assert capsys.readouterr().out.splitlines()[1] == (
+        "classpath=[-a.jar:b.jar:c.jar-]{+a.jar:c.jar+}"
+    )
+    with pytest.raises(SystemExit):
+        run(split(f"--tokens --diff {left} {right}"))
+
+
+def test_external(capsys, samples: Path):
+    left, right = samples / "sample1.properties", samples / "sample2.properties"
+    for options in ("--nocolor", "--simple", "--diff --quote", "--format jsonl -U"):
+        run(split(f"{left} {right} {options}"))
+        expected = capsys.readouterr().out
+        for engine in ("line", "regex"):
+            run(split(f"{left} {right} {options} --external --engine {engine}"))
+            assert capsys.readouterr().out == expected
+    run(split(f"{left} {left} --nocolor --external --run-size 1"))
+    assert capsys.readouterr().out == f"Files {left} and {left} are similar\n"
+
+    with pytest.raises(SystemExit):
+        run(split(f"{samples} {samples} --external"))
+    assert "--external only compares two properties files" in capsys.readouterr().err
+    with pytest.raises(SystemExit):
+        run(split(f"{left} --save-snapshot {samples / 'snapshot'} --external"))
+    with pytest.raises(SystemExit):
+        run(split(f"{left} {right} --external --run-size 0"))
+    assert "--run-size must be at least 1" in capsys.readouterr().err
+
+    # same errors as without --external
+    empty = samples / "empty.properties"
+    empty.write_text("# no property\n")
+    for files in (f"{empty} {right}", f"{left} {empty}", f"{empty} {empty}"):
+        with pytest.raises(SystemExit):
+            run(split(f"{files} --external"))
+        assert "Cannot find any property in" in capsys.readouterr().err
+    run(split(f"{empty} {right} --external --include 'data*' --nocolor -q"))
+    assert "database.type" in capsys.readouterr().out
+
+
+def test_stdin_compressed(capsys, tmp_path: Path, samples: Path, monkeypatch):
+    left, right = samples / "sample1.properties", samples / "sample2.properties"
+    run(split(f"{left} {right} -q --nocolor"))
+    expected = [line for line in capsys.readouterr().out.splitlines() if line[0] != "#"]
+
+    compressed = tmp_path / "sample1.properties.xz"
+    compressed.write_bytes(lzma.compress(left.read_bytes()))
+    for options in ("", "--external"):
+        monkeypatch.setattr(sys, "stdin", fake_stdin(gzip.compress(right.read_bytes())))
+        run(split(f"{compressed} - -q --nocolor {options}"))
+        lines = capsys.readouterr().out.splitlines()
+        assert lines[0] == f"# Only in {compressed} (left)"
+        assert [line for line in lines if line[0] != "#"] == expected
+
+    latin1 = tmp_path / "latin1.properties"
+    latin1.write_bytes("name=caf\xe9\n".encode("latin-1"))
+    monkeypatch.setattr(sys, "stdin", fake_stdin(b"name=the\n"))
+    run(split(f"- {latin1} -q --nocolor --encoding latin-1"))
+    assert capsys.readouterr().out.splitlines()[1] == "name=[-the-]{+caf\xe9+}"
+
+    with pytest.raises(SystemExit):
+        run(split("- -"))
+
+
+def test_snapshot_java(capsys, tmp_path: Path):
+    left, right = tmp_path / "left.properties", tmp_path / "right.properties"
+    left.write_text("a b\nlong = first \\\n    second\n")
+    right.write_text("a c\nlong = first second\n")
+    snapshot = tmp_path / "left.snapshot"
+    run(split(f"--engine java {left} --save-snapshot {snapshot}"))
+    capsys.readouterr()
+    run(split(f"--engine java {snapshot} {right} -m diff --nocolor"))
+    out = capsys.readouterr().out
+    assert "-a=b" in out.replace(" ", "") and "long" not in out
+    with pytest.raises(SystemExit):
+        run(split(f"{snapshot} {right}"))
+    assert "was taken with the java engine" in capsys.readouterr().err
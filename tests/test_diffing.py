@@ -0,0 +1,77 @@
+# pylint: disable=missing-function-docstring,unused-import,redefined-outer-name
+"""
+test for diff api
+"""
+
+from pathlib import Path
+
+from properties_tools.diffing import (
+    ADDED,
+    DELETED,
+    UPDATED,
+    diff_dicts,
+    diff_files,
+    iter_diff,
+    same_content,
+)
+from properties_tools.utils import propertiesfile_to_dict
+
+from . import samples
+
+
+def test_diff_files(samples: Path):
+    result = diff_files(samples / "sample1.properties", samples / "sample2.properties")
+    assert not result.is_similar()
+    assert result.added == ["database.version"]
+    assert result.deleted == ["database.host"]
+    assert result.updated == ["database.type", "database.user"]
+    assert result.left["database.type"] == "postgresql"
+    assert result.right["database.type"] == "mysql"
+
+
+def test_diff_similar(samples: Path):
+    result = diff_files(
+        samples / "sample1.properties", samples / "sample1_alt.properties"
+    )
+    assert result.is_similar()
+
+
+def test_iter_diff():
+    left = {"a": "1", "b": "2", "c": "3", "e": "5"}
+    right = {"b": "2", "c": "0", "d": "4", "f": "6", "g": "7"}
+    assert list(iter_diff(left, right)) == [
+        (DELETED, "a"),
+        (UPDATED, "c"),
+        (ADDED, "d"),
+        (DELETED, "e"),
+        (ADDED, "f"),
+        (ADDED, "g"),
+    ]
+    assert list(iter_diff({}, {"": "x"})) == [(ADDED, "")]
+    assert list(iter_diff({"": "x"}, {})) == [(DELETED, "")]
+    assert diff_dicts({}, {}).is_similar()
+
+
+def test_same_content(samples: Path):
+    sample1 = samples / "sample1.properties"
+    copy = samples / "copy.properties"
+    copy.write_bytes(sample1.read_bytes())
+    assert same_content(sample1, copy)
+    assert not same_content(sample1, samples / "sample1_alt.properties")
+    copy.write_bytes(sample1.read_bytes().replace(b"5432", b"1234"))
+    assert not same_content(sample1, copy)
+
+
+def test_diff_dicts_reordered():
+    left = {"a": "1", "b": "2", "c": "3"}
+    right = {"c": "3", "a": "1", "b": "2"}
+    assert diff_dicts(left, right).is_similar()
+    assert diff_dicts(left, {**right, "c": "0"}).updated == ["c"]
+
+
+def test_changes(samples: Path):
+    left = propertiesfile_to_dict(samples / "sample1.properties")
+    right = propertiesfile_to_dict(samples / "sample2.properties")
+    result = diff_dicts(left, right)
+    assert list(result.changes()) == list(iter_diff(left, right))
+    assert list(result.compact().changes()) == list(iter_diff(left, right))
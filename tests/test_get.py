@@ -0,0 +1,36 @@
+# pylint: disable=missing-function-docstring,unused-import,redefined-outer-name
+"""
+test for get cli
+"""
+
+from pathlib import Path
+from shlex import split
+
+import pytest
+from properties_tools import __version__
+from properties_tools.get import run
+
+from . import samples
+
+
+def test_version(capsys):
+    with pytest.raises(SystemExit):
+        run(split("--version"))
+    assert __version__ in capsys.readouterr().out
+
+
+def test_get(capsys, samples: Path):
+    sample = samples / "sample1.properties"
+    run(split(f"{sample} database.user database.port"))
+    assert capsys.readouterr().out == "test\n5432\n"
+    assert (samples / "sample1.properties.idx").is_file()
+    run(split(f"{sample} database.host --rebuild"))
+    assert capsys.readouterr().out == "localhost\n"
+
+
+def test_missing_key(capsys, samples: Path):
+    with pytest.raises(SystemExit):
+        run(split(f"{samples / 'sample1.properties'} database.port foo bar"))
+    captured = capsys.readouterr()
+    assert captured.out == "5432\n"
+    assert "Cannot find foo, bar" in captured.err
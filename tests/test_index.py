@@ -0,0 +1,76 @@
+# pylint: disable=missing-function-docstring,unused-import,redefined-outer-name
+"""
+test for properties index
+"""
+
+import os
+from pathlib import Path
+
+import pytest
+from properties_tools.index import (
+    PropertiesIndex,
+    build_index,
+    index_path,
+    open_index,
+)
+from properties_tools.utils import propertiesfile_to_dict
+
+from . import samples, set_mtime
+
+
+def test_index(samples: Path):
+    for sample in samples.glob("*.properties"):
+        build_index(sample)
+        assert index_path(sample).is_file()
+        with PropertiesIndex(sample) as index:
+            for key, value in propertiesfile_to_dict(sample).items():
+                assert index.get(key) == value
+            assert index.get("missing") is None
+            assert index.get("") is None
+
+
+def test_index_duplicates_and_crlf(tmp_path: Path):
+    source = tmp_path / "dup.properties"
+    source.write_bytes('# é\r\nb=1\r\na = "x"\r\nb=2\r\nz=ü\r\nlast=end'.encode())
+    build_index(source)
+    with PropertiesIndex(source) as index:
+        assert [index.get(key) for key in ("a", "b", "z", "last")] == [
+            "x",
+            "2",
+            "ü",
+            "end",
+        ]
+
+
+def test_index_outdated(samples: Path):
+    sample = samples / "sample1.properties"
+    build_index(sample)
+    sample.write_text(sample.read_text() + "\nnew=1\n")
+    with pytest.raises(ValueError):
+        PropertiesIndex(sample)
+    with open_index(sample) as index:
+        assert index.get("new") == "1"
+    # same size, other mtime
+    set_mtime(sample, "2021-01-01T00:00:00")
+    with pytest.raises(ValueError):
+        PropertiesIndex(sample)
+
+
+def test_open_index_options(samples: Path):
+    sample = samples / "sample3.properties"
+    with open_index(sample) as index:
+        assert index.separator == "="
+    with pytest.raises(SyntaxError):
+        open_index(sample, separator="/")
+    with pytest.raises(FileExistsError):
+        open_index(samples / "missing.properties")
+
+
+def test_index_mode(samples: Path):
+    sample = samples / "sample1.properties"
+    umask = os.umask(0o022)
+    try:
+        # readable by the other users of a shared file
+        assert build_index(sample).stat().st_mode & 0o777 == 0o644
+    finally:
+        os.umask(umask)
@@ -0,0 +1,85 @@
+# pylint: disable=missing-function-docstring,unused-import,redefined-outer-name
+"""
+test for merge cli
+"""
+
+import json
+from pathlib import Path
+from shlex import split
+
+import pytest
+from properties_tools import __version__
+from properties_tools import merge as merge_module
+from properties_tools.merge import run
+
+from . import samples
+
+
+def test_version(capsys):
+    with pytest.raises(SystemExit):
+        run(split("--version"))
+    assert __version__ in capsys.readouterr().out
+
+
+def test_merge(capsys, samples: Path):
+    # sample1 is the base, sample1_alt adds quotes, sample2 changes values
+    run(
+        split(
+            f"{samples / 'sample1.properties'} {samples / 'sample1_alt.properties'} {samples / 'sample2.properties'} --nocolor"
+        )
+    )
+    captured = capsys.readouterr()
+    assert captured.out.splitlines() == [
+        "database.type=mysql",
+        'database.port = "5432"',
+        "database.user=dbuser",
+        'database.password = "foobar"',
+        "database.version=12",
+    ]
+    assert captured.err == ""
+
+
+def test_conflicts(capsys, tmp_path: Path):
+    base, ours, theirs = (tmp_path / f"{n}.properties" for n in "abc")
+    base.write_text("# base\nkey=0\nother=0\n")
+    ours.write_text("# ours\nkey=1\nother=0\n")
+    theirs.write_text("key=2\nother=2\n")
+    conflicts = tmp_path / "conflicts.json"
+    with pytest.raises(SystemExit) as error:
+        run(split(f"{base} {ours} {theirs} --nocolor --conflicts {conflicts}"))
+    assert error.value.code == 1
+    captured = capsys.readouterr()
+    assert captured.out.splitlines() == ["# ours", "key=1", "other=2"]
+    assert captured.err == "CONFLICT key: base=0, ours=1, theirs=2\n"
+    assert json.loads(conflicts.read_text()) == [
+        {"key": "key", "base": "0", "ours": "1", "theirs": "2"}
+    ]
+
+    run(split(f"{base} {ours} {theirs} --nocolor --theirs -o {ours} -f"))
+    assert ours.read_text() == "# ours\nkey=2\nother=2\n"
+    with pytest.raises(SystemExit):
+        run(split(f"{base} {ours} {theirs} --theirs -o {ours}"))
+
+
+def test_ours_parsed_once(capsys, samples: Path, monkeypatch):
+    parsed = []
+    parse_file = merge_module.parse_file
+    load_properties = merge_module.load_properties
+
+    def spy(file, *args, **kwargs):
+        parsed.append(file.name)
+        return parse_file(file, *args, **kwargs)
+
+    def load_spy(file, *args, **kwargs):
+        parsed.append(file.name)
+        return load_properties(file, *args, **kwargs)
+
+    monkeypatch.setattr(merge_module, "parse_file", spy)
+    monkeypatch.setattr(merge_module, "load_properties", load_spy)
+    files = ("sample1.properties", "sample1_alt.properties", "sample2.properties")
+    run(split(" ".join(str(samples / name) for name in files)))
+    assert sorted(parsed) == sorted(files)
+    capsys.readouterr()
+    with pytest.raises(SystemExit):
+        run(split(f"{samples / files[0]} {samples / 'missing'} {samples / files[2]}"))
+    assert "Cannot find file" in capsys.readouterr().err
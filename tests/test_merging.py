@@ -0,0 +1,99 @@
+# pylint: disable=missing-function-docstring,unused-import,redefined-outer-name
+"""
+test for merge api
+"""
+
+from properties_tools.merging import (
+    OURS,
+    THEIRS,
+    Conflict,
+    LineMerger,
+    merge_dicts,
+)
+from properties_tools.utils import ParsedLine
+
+BASE = {"same": "0", "ours": "0", "theirs": "0", "both": "0", "del": "0", "mod": "0"}
+OURS_DATA = {"same": "0", "ours": "1", "theirs": "0", "both": "1", "mod": "1", "o": "1"}
+THEIRS_DATA = {"same": "0", "ours": "0", "theirs": "2", "both": "2", "t": "2"}
+
+
+def test_merge_dicts():
+    result = merge_dicts(BASE, OURS_DATA, THEIRS_DATA)
+    assert result.merged == {
+        "same": "0",
+        "ours": "1",
+        "theirs": "2",
+        "both": "1",
+        "mod": "1",
+        "o": "1",
+        "t": "2",
+    }
+    assert result.conflicts == [
+        Conflict("both", "0", "1", "2"),
+        Conflict("mod", "0", "1", None),
+    ]
+    assert not result.is_clean()
+
+
+def test_merge_dicts_favor():
+    assert merge_dicts(BASE, OURS_DATA, THEIRS_DATA, favor=OURS).merged == (
+        merge_dicts(BASE, OURS_DATA, THEIRS_DATA).merged
+    )
+    result = merge_dicts(BASE, OURS_DATA, THEIRS_DATA, favor=THEIRS)
+    assert result.merged["both"] == "2"
+    assert "mod" not in result.merged
+    # deleted by ours, changed by theirs
+    result = merge_dicts({"a": "0"}, {}, {"a": "2"}, favor=THEIRS)
+    assert result.conflicts == [Conflict("a", "0", None, "2")]
+    assert result.merged == {"a": "2"}
+    assert merge_dicts({"a": "0"}, {}, {"a": "2"}).merged == {}
+
+
+def test_merge_clean():
+    result = merge_dicts({"a": "0", "b": "0"}, {"a": "1", "b": "0"}, {"a": "1"})
+    assert result.is_clean()
+    assert result.merged == {"a": "1"}
+
+
+def test_line_merger():
+    lines = [ParsedLine("# head")]
+    lines += [ParsedLine(f"{key} = {value}") for key, value in OURS_DATA.items()]
+    expected = [
+        "# head",
+        "same = 0",
+        "ours = 1",
+        "theirs=2",
+        "both = 1",
+        "mod = 1",
+        "o = 1",
+        "t=2",
+    ]
+    for favor in (None, OURS, THEIRS):
+        merger = LineMerger(BASE, THEIRS_DATA, favor=favor)
+        out = list(merger.merge(lines))
+        if favor == THEIRS:
+            # conflicts take theirs values: updated and deleted
+            assert out == expected[:4] + ["both=2", "o = 1", "t=2"]
+        else:
+            assert out == expected
+        # same resolution as merge_dicts
+        result = merge_dicts(BASE, OURS_DATA, THEIRS_DATA, favor=favor)
+        assert merger.conflicts == result.conflicts
+        assert merger.is_clean() == result.is_clean()
+
+
+def test_line_merger_java():
+    lines = [ParsedLine.from_parts("a\\ key:1", "a key", "1")]
+    merger = LineMerger({"a key": "1"}, {"a key": "2", "b": "\t"}, engine="java")
+    assert list(merger.merge(lines)) == ["a\\ key=2", "b=\\t"]
+
+
+def test_line_merger_duplicates():
+    # every line is resolved, the last one tells the conflict, like in a dict
+    lines = [ParsedLine("a=1"), ParsedLine("a=0")]
+    merger = LineMerger({"a": "0"}, {"a": "2"})
+    assert list(merger.merge(lines)) == ["a=1", "a=2"]
+    assert merger.is_clean()
+    merger = LineMerger({"a": "0"}, {"a": "2"})
+    assert list(merger.merge(lines[::-1])) == ["a=2", "a=1"]
+    assert merger.conflicts == [Conflict("a", "0", "1", "2")]
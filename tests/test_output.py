@@ -0,0 +1,58 @@
+# pylint: disable=missing-function-docstring
+"""
+test for output helpers
+"""
+
+from io import StringIO
+from pathlib import Path
+
+import pytest
+from properties_tools.color import Color
+from properties_tools.output import LineTemplate, OutputSink, atomic_output
+
+
+def test_template():
+    assert LineTemplate()("foo", "=", "bar") == "foo=bar"
+    assert LineTemplate("[-", "-]")("foo") == "[-foo-]"
+    assert LineTemplate("- ", style=Color(False).red)("foo") == "- foo"
+    assert LineTemplate("- ", style=Color(True).red)("foo") == Color(True).red("- foo")
+
+
+def test_sink():
+    stream = StringIO()
+    sink = OutputSink(stream, buffer_size=10)
+    sink.write("foo")
+    assert stream.getvalue() == ""
+    sink.write("bar bar")
+    assert stream.getvalue() == "foo\nbar bar\n"
+    with sink:
+        sink.write("")
+        sink.write("baz")
+    assert stream.getvalue() == "foo\nbar bar\n\nbaz\n"
+
+
+def test_atomic_output(tmp_path: Path):
+    target = tmp_path / "target.properties"
+    target.write_text("old\n")
+    target.chmod(0o640)
+    with pytest.raises(KeyboardInterrupt):
+        with atomic_output(target) as stream:
+            stream.write("new\n")
+            raise KeyboardInterrupt()
+    assert target.read_text() == "old\n"
+    assert list(tmp_path.iterdir()) == [target]
+    with atomic_output(target) as stream:
+        stream.write("new\n")
+    assert target.read_text() == "new\n"
+    assert target.stat().st_mode & 0o777 == 0o640
+    assert list(tmp_path.iterdir()) == [target]
+
+    # written through a symbolic link
+    link = tmp_path / "link.properties"
+    link.symlink_to(target)
+    with atomic_output(link) as stream:
+        stream.write("linked\n")
+    assert link.is_symlink()
+    assert target.read_text() == "linked\n"
+    assert target.stat().st_mode & 0o777 == 0o640
+    assert sorted(tmp_path.iterdir()) == [link, target]
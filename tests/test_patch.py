@@ -3,6 +3,10 @@
 test for patch cli
 """
 
+import gzip
+import json
+import lzma
+import sys
 from pathlib import Path
 from shlex import split
 
@@ -10,7 +14,7 @@ import pytest
 from properties_tools import __version__
 from properties_tools.patch import run
 
-from . import TEMPLATES_DIR, assert_capsys, samples
+from . import TEMPLATES_DIR, assert_capsys, fake_stdin, samples
 
 
 def template(filename: str):
@@ -201,3 +205,266 @@ def test_color(capsys, samples: Path):
         stdout_reference=template("test_color.out"),
         stderr_reference="",
     )
+
+
+def test_multiple_sources(capsys, tmp_path, samples: Path):
+    sources = []
+    for name in ("first", "second", "third"):
+        source = samples / name / "app.properties"
+        source.parent.mkdir()
+        source.write_text((samples / "sample1.properties").read_text())
+        sources.append(source)
+    sources[2].rename(samples / "third" / "other.properties")
+    sources[2] = samples / "third" / "other.properties"
+
+    with pytest.raises(SystemExit):
+        run(
+            split(
+                f"{' '.join(map(str, sources))} --patch {samples / 'sample2.properties'} -ADU --output {tmp_path / 'out'}"
+            )
+        )
+    assert "same name" in capsys.readouterr().err
+
+    for jobs in (1, 2):
+        output = tmp_path / f"output{jobs}"
+        run(
+            split(
+                f"{' '.join(map(str, sources[1:]))} --patch {samples / 'sample2.properties'} -ADU --output {output} --jobs {jobs}"
+            )
+        )
+        assert_capsys(
+            capsys,
+            samples,
+            stdout_reference=template("test_output.out").read_text() * 2,
+            stderr_reference=f"{sources[1]}: 1 added, 2 updated, 1 deleted\n"
+            + f"{sources[2]}: 1 added, 2 updated, 1 deleted\n"
+            + "2 files patched: 2 added, 4 updated, 2 deleted\n",
+        )
+        for name in ("app.properties", "other.properties"):
+            assert (output / name).read_text() == template(
+                "test_output.out"
+            ).read_text()
+
+    run(
+        split(
+            f"{' '.join(map(str, sources))} --patch {samples / 'sample2.properties'} -A --overwrite"
+        )
+    )
+    for source in sources:
+        assert source.read_text() == template("test_add.out").read_text()
+
+
+def test_multiple_sources_interactive(samples: Path):
+    with pytest.raises(SystemExit):
+        run(
+            split(
+                f"{samples / 'sample1.properties'} {samples / 'sample1_alt.properties'} --patch {samples / 'sample2.properties'} -A -i"
+            )
+        )
+
+
+def test_force(tmp_path, samples: Path):
+    output = tmp_path / "output.properties"
+    output.write_text("foo=bar\n")
+    run(
+        split(
+            f"{samples / 'sample1.properties'}  --patch {samples / 'sample2.properties'} -ADU --output {output} --force"
+        )
+    )
+    assert output.read_text() == template("test_output.out").read_text()
+
+
+def test_java(capsys, tmp_path: Path):
+    source = tmp_path / "source.properties"
+    source.write_text("! java\nmulti = a, \\\n    b\nkey\\ 1 : foo\nold=1\n")
+    patch = tmp_path / "patch.properties"
+    patch.write_text("multi=a, c\nkey\\ 1=foo\nnew\\:key = x\\ty\n")
+    run(split(f"{source} -p {patch} -ADU --engine java --comments"))
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0] == "! java"
+    assert lines[1].endswith("update: multi = a, \\")
+    assert lines[2:4] == ["#     b", "multi=a, c"]
+    assert lines[4] == "key\\ 1 : foo"
+    assert lines[5].endswith("remove: old=1")
+    assert lines[7] == "new\\:key=x\\ty"
+
+
+def test_comments_layers(capsys, tmp_path: Path, samples: Path):
+    overlay = tmp_path / "overlay.properties"
+    overlay.write_text("database.user=admin\n")
+    run(
+        split(
+            f"{samples / 'sample1.properties'} -p {samples / 'sample2.properties'} -p {overlay} -AU --comments"
+        )
+    )
+    lines = capsys.readouterr().out.splitlines()
+    assert any(
+        l.endswith(
+            f"update: database.type=postgresql  (from {samples / 'sample2.properties'})"
+        )
+        for l in lines
+    )
+    assert any(
+        l.endswith(f"update: database.user=test  (from {overlay})") for l in lines
+    )
+    assert "database.user=admin" in lines
+    assert any(
+        l.endswith(f"add: database.version  (from {samples / 'sample2.properties'})")
+        for l in lines
+    )
+
+
+def test_overwrite_interrupted(capsys, samples: Path):
+    source = samples / "sample1.properties"
+    content = source.read_text() + "\ninvalid line\n"
+    source.write_text(content)
+    with pytest.raises(SystemExit):
+        run(split(f"{source} -p {samples / 'sample2.properties'} -ADU -w"))
+    assert "no separator found" in capsys.readouterr().err
+    assert source.read_text() == content
+    assert sorted(samples.glob(".*")) == []
+
+
+def test_timings(capsys, tmp_path: Path, samples: Path, monkeypatch):
+    report = tmp_path / "timings.json"
+    monkeypatch.setenv("PROPERTIES_TOOLS_TIMINGS", str(report))
+    output = tmp_path / "output.properties"
+    run(
+        split(
+            f"{samples / 'sample1.properties'} -p {samples / 'sample2.properties'} -ADU -o {output}"
+        )
+    )
+    capsys.readouterr()
+    data = json.loads(report.read_text())
+    assert set(data["phases"]) == {"parse", "print", "write", "plan"}
+    assert data["counters"]["added"] == 1
+    assert data["counters"]["lines"] == len(
+        (samples / "sample1.properties").read_text().splitlines()
+    )
+
+
+def test_decisions(capsys, tmp_path: Path, samples: Path, monkeypatch):
+    monkeypatch.chdir(samples)
+    plan = tmp_path / "plan.json"
+    run(
+        split(
+            f"sample1.properties -p sample2.properties -ADU --write-plan {plan} --reject database.user"
+        )
+    )
+    out, err = capsys.readouterr()
+    assert out == ""
+    assert err == "sample1.properties: 4 changes, 3 accepted, 1 rejected\n"
+    assert [
+        (change["action"], change["key"], change["decision"])
+        for change in json.loads(plan.read_text())["sources"][0]["changes"]
+    ] == [
+        ("update", "database.type", "accept"),
+        ("delete", "database.host", "accept"),
+        ("update", "database.user", "reject"),
+        ("add", "database.version", "accept"),
+    ]
+
+    # replay, with decisions overridden on the command line
+    run(split(f"--decisions {plan} --nocolor --reject database.host"))
+    assert capsys.readouterr().out == "\n".join(
+        [
+            "# just a comment",
+            "database.type=mysql",
+            "database.host=localhost",
+            "database.port=5432",
+            "# and another comment",
+            "database.user=test",
+            "database.password=foobar",
+            "database.version=12",
+            "",
+        ]
+    )
+
+    # sources are found from another directory
+    monkeypatch.chdir(tmp_path)
+    run(split(f"--decisions {plan} --nocolor"))
+    assert "database.type=mysql" in capsys.readouterr().out
+    run(split(f"{samples / 'sample1.properties'} --decisions {plan} --nocolor"))
+    assert "database.type=mysql" in capsys.readouterr().out
+
+    # the source changed since the plan was made
+    source = samples / "sample1.properties"
+    source.write_text(source.read_text() + "\nfoo=bar\n")
+    with pytest.raises(SystemExit):
+        run(split(f"--decisions {plan} -w"))
+    assert "has changed since the plan was written" in capsys.readouterr().err
+    assert "foo=bar" in source.read_text()
+
+
+def test_decisions_args(samples: Path):
+    source, patch = samples / "sample1.properties", samples / "sample2.properties"
+    for args in (
+        f"{source} -ADU",
+        f"-p {patch} -ADU",
+        f"{source} -p {patch} -ADU --accept 'database.*'",
+        f"{source} -p {patch} -ADU --write-plan plan.json -w",
+        f"{source} -p {patch} -ADU --decisions plan.json",
+        f"{source} -p {patch} -ADU --write-plan plan.json --decisions plan.json",
+    ):
+        with pytest.raises(SystemExit):
+            run(split(args))
+
+
+def test_include_exclude(capsys, samples: Path):
+    source = samples / "sample1.properties"
+    run(
+        split(
+            f"{source} -p {samples / 'sample2.properties'} -ADU --nocolor --exclude database.host --exclude 'database.u*'"
+        )
+    )
+    assert capsys.readouterr().out == "\n".join(
+        [
+            "# just a comment",
+            "database.type=mysql",
+            "database.host=localhost",
+            "database.port=5432",
+            "# and another comment",
+            "database.user=test",
+            "database.password=foobar",
+            "database.version=12",
+            "",
+        ]
+    )
+
+
+def test_stdin_compressed(capsys, tmp_path: Path, samples: Path, monkeypatch):
+    source, patch = samples / "sample1.properties", samples / "sample2.properties"
+    run(split(f"{source} -p {patch} -ADU --nocolor"))
+    expected = capsys.readouterr().out
+
+    compressed = tmp_path / "sample1.properties.xz"
+    compressed.write_bytes(lzma.compress(source.read_bytes()))
+    monkeypatch.setattr(sys, "stdin", fake_stdin(gzip.compress(patch.read_bytes())))
+    run(split(f"{compressed} -p - -ADU --nocolor"))
+    assert capsys.readouterr().out == expected
+    monkeypatch.setattr(sys, "stdin", fake_stdin(source.read_bytes()))
+    run(split(f"- -p {patch} -ADU --nocolor -o {tmp_path / 'out.properties'}"))
+    assert (tmp_path / "out.properties").read_text() == expected
+
+    monkeypatch.setattr(sys, "stdin", fake_stdin(b""))
+    with pytest.raises(SystemExit):
+        run(split(f"{compressed} -p {patch} -U -w"))
+    assert "Cannot overwrite compressed file" in capsys.readouterr().err
+    for args in (
+        "- -p - -U",
+        f"- -p {patch} -U -i",
+        f"- {source} -p {patch} -U",
+        f"- -p {patch} -U --write-plan plan.json",
+    ):
+        with pytest.raises(SystemExit):
+            run(split(args))
+
+
+def test_encoding(tmp_path: Path):
+    source, patch = tmp_path / "source.properties", tmp_path / "patch.properties"
+    source.write_bytes("name=caf\xe9\nother=1\n".encode("latin-1"))
+    patch.write_bytes("name=th\xe9\n".encode("latin-1"))
+    run(split(f"{source} -p {patch} -U -w --encoding latin-1"))
+    assert source.read_bytes() == "name=th\xe9\nother=1\n".encode("latin-1")
+    with pytest.raises(SystemExit):
+        run(split(f"{source} -p {patch} -U"))
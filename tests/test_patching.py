@@ -0,0 +1,99 @@
+# pylint: disable=missing-function-docstring,unused-import,redefined-outer-name
+"""
+test for patch planning
+"""
+
+from pathlib import Path
+
+from properties_tools.patching import (
+    DELETE,
+    KEEP,
+    UPDATE,
+    PatchLayers,
+    PatchPlan,
+    PatchPlanner,
+    plan_patch,
+)
+from properties_tools.utils import (
+    ParsedLine,
+    key_filter,
+    parse_file,
+    propertiesfile_to_dict,
+)
+
+from . import samples
+
+
+def test_plan(samples: Path):
+    plan = plan_patch(
+        parse_file(samples / "sample1.properties"),
+        propertiesfile_to_dict(samples / "sample2.properties"),
+    )
+    assert plan == PatchPlan(
+        add=["database.version"],
+        update={"database.type", "database.user"},
+        delete={"database.host"},
+        keep={"database.port", "database.password"},
+    )
+
+
+def test_plan_samefile(samples: Path):
+    plan = plan_patch(
+        parse_file(samples / "sample1.properties"),
+        propertiesfile_to_dict(samples / "sample1_alt.properties"),
+    )
+    assert len(plan.add) == len(plan.update) == len(plan.delete) == 0
+    assert len(plan.keep) == 5
+
+
+def test_planner_steps():
+    planner = PatchPlanner({"a": "1", "b": "2", "d": "4"})
+    steps = list(
+        planner.steps(
+            ParsedLine(line) for line in ("# comment", "a=1", "", "b=3", "c=3")
+        )
+    )
+    assert [action for action, _ in steps] == [None, KEEP, None, UPDATE, DELETE]
+    assert planner.additions() == ["d"]
+
+
+def test_planner_keys():
+    planner = PatchPlanner({"a": "1", "b": "2", "d": "4"}, keys=key_filter(["a", "c"]))
+    steps = list(planner.steps(ParsedLine(line) for line in ("a=2", "b=3", "c=3")))
+    assert [action for action, _ in steps] == [UPDATE, KEEP, DELETE]
+    assert planner.additions() == []
+
+
+def test_plan_large():
+    size = 200000
+    source = (ParsedLine(f"key{i}=value{i}") for i in range(size))
+    patches = {f"key{i}": f"value{i}" for i in range(size // 2, size + size // 2)}
+    plan = plan_patch(source, patches)
+    assert len(plan.add) == len(plan.delete) == size // 2
+    assert len(plan.keep) == size // 2
+    assert len(plan.update) == 0
+
+
+def test_patch_layers():
+    layers = PatchLayers()
+    bottom = {"a": "1", "b": "1"}
+    top = {"b": "2", "c": "2"}
+    layers.add("bottom", bottom)
+    layers.add("top", top)
+    expected = {**bottom, **top}
+    assert dict(layers) == expected
+    assert list(layers) == list(expected)
+    assert len(layers) == 3
+    assert (layers["a"], layers["b"], layers.get("c"), layers.get("d")) == (
+        "1",
+        "2",
+        "2",
+        None,
+    )
+    assert "c" in layers and "d" not in layers
+    assert [layers.source(key) for key in "abc"] == ["bottom", "top", "top"]
+    # layers are not copied
+    assert layers.layers[0] is bottom
+    assert plan_patch([ParsedLine("a=0")], layers) == plan_patch(
+        [ParsedLine("a=0")], expected
+    )
@@ -0,0 +1,93 @@
+# pylint: disable=missing-function-docstring,unused-import,redefined-outer-name
+"""
+test for snapshots
+"""
+
+from pathlib import Path
+
+import pytest
+from properties_tools import snapshot as snapshot_module
+from properties_tools.diffing import diff_dicts
+from properties_tools.snapshot import Snapshot, diff_snapshot, is_snapshot, value_hash
+from properties_tools.utils import key_filter, propertiesfile_to_dict
+
+from . import samples
+
+
+def test_roundtrip(tmp_path: Path, samples: Path):
+    sample = samples / "sample1.properties"
+    snapshot = Snapshot.build(sample)
+    assert snapshot.keys == sorted(snapshot.keys)
+    snapshot.save(tmp_path / "sample1.snapshot")
+    assert is_snapshot(tmp_path / "sample1.snapshot")
+    assert not is_snapshot(sample)
+    assert not is_snapshot(tmp_path / "missing.snapshot")
+    assert Snapshot.load(tmp_path / "sample1.snapshot") == snapshot
+    with pytest.raises(ValueError):
+        Snapshot.load(sample)
+
+
+def test_diff_snapshot(samples: Path, monkeypatch):
+    left, right = samples / "sample1.properties", samples / "sample2.properties"
+    left_data, right_data = propertiesfile_to_dict(left), propertiesfile_to_dict(right)
+    snapshot = Snapshot.build(left)
+    expected = diff_dicts(left_data, right_data)
+
+    loaded = []
+    iter_lines = snapshot_module.iter_lines
+
+    def spy(*args, **kwargs):
+        loaded.append(args[0])
+        return iter_lines(*args, **kwargs)
+
+    monkeypatch.setattr(snapshot_module, "iter_lines", spy)
+    result = diff_snapshot(snapshot, right_data)
+    assert (result.added, result.deleted, result.updated) == (
+        expected.added,
+        expected.deleted,
+        expected.updated,
+    )
+    # the left file is only parsed when a left value is needed
+    assert len(loaded) == 0
+    for key in result.deleted + result.updated:
+        assert result.left[key] == left_data[key]
+    assert len(loaded) == 1
+
+
+def test_diff_snapshot_changed_source(samples: Path):
+    left, right = samples / "sample1.properties", samples / "sample2.properties"
+    left_data = propertiesfile_to_dict(left)
+    snapshot = Snapshot.build(left)
+    left.write_text(left.read_text() + "\n# changed\n")
+    result = diff_snapshot(snapshot, propertiesfile_to_dict(right))
+    for key in result.updated:
+        assert result.left[key] == f"<{value_hash(left_data[key])}>"
+
+
+def test_snapshot_keys(samples: Path):
+    left, right = samples / "sample1.properties", samples / "sample2.properties"
+    keys = key_filter(exclude=["database.host"])
+    right_data = propertiesfile_to_dict(right, keys=keys)
+    for snapshot in (Snapshot.build(left, keys=keys), Snapshot.build(left)):
+        result = diff_snapshot(snapshot, right_data, keys=keys)
+        assert (result.added, result.deleted, result.updated) == (
+            ["database.version"],
+            [],
+            ["database.type", "database.user"],
+        )
+
+
+def test_snapshot_java(tmp_path: Path):
+    left, right = tmp_path / "left.properties", tmp_path / "right.properties"
+    left.write_text(
+        "! comment\na b\nlong = first \\\n    second\nescaped\\ key:\\u00e9\n"
+    )
+    right.write_text("a c\nlong = first\nescaped\\ key = e\n")
+    snapshot = Snapshot.build(left, engine="java")
+    assert snapshot.engine == "java"
+    assert snapshot.keys == ["a", "escaped key", "long"]
+    # physical line numbers, the continued line spans lines 3 and 4
+    assert snapshot.lines == [2, 5, 3]
+    result = diff_snapshot(snapshot, propertiesfile_to_dict(right, engine="java"))
+    assert result.updated == ["a", "escaped key", "long"]
+    assert [result.left[key] for key in result.updated] == ["b", "é", "first second"]
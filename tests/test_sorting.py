@@ -0,0 +1,126 @@
+# pylint: disable=missing-function-docstring
+"""
+test for the out-of-core diff
+"""
+
+import sys
+from pathlib import Path
+from random import Random
+
+import pytest
+from properties_tools import sorting as sorting_module
+from properties_tools.diffing import iter_diff
+from properties_tools.sorting import (
+    Spool,
+    SortedProperties,
+    iter_sorted_diff,
+    unique_last,
+)
+from properties_tools.utils import key_filter, propertiesfile_to_dict
+
+from . import fake_stdin
+
+
+def write_properties(file: Path, keys: int, seed: int = 0, shuffle: bool = True):
+    random = Random(seed)
+    lines = [f"key.{random.randrange(keys)} = value{random.randrange(3)}"]
+    lines += [f"key.{random.randrange(keys)}={i}" for i in range(keys)]
+    lines += ["# comment", ""]
+    if shuffle:
+        random.shuffle(lines)
+    else:
+        lines.sort(key=lambda line: line.partition("=")[0].strip())
+    file.write_text("\n".join(lines) + "\n")
+
+
+def test_spool(tmp_path: Path):
+    with Spool(tmp_path, batch_size=3) as spool:
+        spool.extend(range(5))
+        spool.append(5)
+        assert len(spool) == 6
+        first, second = iter(spool), iter(spool)
+        assert [next(first), next(first), next(first), next(first)] == [0, 1, 2, 3]
+        assert list(second) == list(range(6))
+        assert list(first) == [4, 5]
+        assert list(spool) == list(range(6))
+
+
+def test_unique_last():
+    assert not list(unique_last([]))
+    assert list(unique_last([("a", "1"), ("a", "2"), ("b", "3")])) == [
+        ("a", "2"),
+        ("b", "3"),
+    ]
+
+
+@pytest.mark.parametrize("engine", ["line", "regex", "java"])
+def test_sorted_properties(tmp_path: Path, monkeypatch, engine: str):
+    monkeypatch.setattr(sorting_module, "MAX_RUNS", 4)
+    file = tmp_path / "file.properties"
+    write_properties(file, 20000)
+    expected = sorted(propertiesfile_to_dict(file, engine=engine).items())
+    for run_size in (10**9, 10**5):
+        with SortedProperties(file, engine=engine, run_size=run_size) as data:
+            assert not data.presorted
+            assert data.properties == 20001
+            assert (len(data.runs) > 1) == (run_size < 10**9)
+            assert list(data) == expected
+            assert list(data) == expected
+
+    keys = key_filter(include=["key.1*"])
+    with SortedProperties(file, engine=engine, keys=keys, run_size=10**5) as data:
+        assert list(data) == [item for item in expected if item[0].startswith("key.1")]
+
+
+def test_presorted(tmp_path: Path, monkeypatch):
+    file = tmp_path / "file.properties"
+    write_properties(file, 5000, shuffle=False)
+    expected = sorted(propertiesfile_to_dict(file).items())
+    for run_size in (10**9, 10**5):
+        with SortedProperties(file, run_size=run_size) as data:
+            assert data.presorted and not data.runs
+            assert list(data) == expected
+
+    # an unsorted file starting sorted is sorted from what was already read
+    file.write_text(file.read_text() + "a=1\n")
+    blocks = []
+    iter_blocks = sorting_module.iter_blocks
+
+    def spy(*args, **kwargs):
+        blocks.append(args[0])
+        return iter_blocks(*args, **kwargs)
+
+    monkeypatch.setattr(sorting_module, "iter_blocks", spy)
+    with SortedProperties(file, run_size=10**9) as data:
+        assert not data.presorted
+        assert list(data) == [("a", "1")] + expected
+    assert blocks == [file]
+
+
+def test_iter_sorted_diff(tmp_path: Path):
+    left, right = tmp_path / "left.properties", tmp_path / "right.properties"
+    write_properties(left, 300, seed=1)
+    write_properties(right, 300, seed=2)
+    left_data, right_data = propertiesfile_to_dict(left), propertiesfile_to_dict(right)
+    with SortedProperties(left, run_size=1000) as left_sorted, SortedProperties(
+        right, run_size=1000
+    ) as right_sorted:
+        assert list(iter_sorted_diff(left_sorted, right_sorted)) == [
+            (change, key, left_data.get(key), right_data.get(key))
+            for change, key in iter_diff(left_data, right_data)
+        ]
+    assert not list(iter_sorted_diff([], []))
+    assert list(iter_sorted_diff([("a", "1")], [])) == [("deleted", "a", "1", None)]
+
+
+def test_stdin(tmp_path: Path, monkeypatch):
+    file = tmp_path / "file.properties"
+    write_properties(file, 5000, shuffle=False)
+    # sorted at first, then unsorted after the run size is exceeded
+    file.write_text(file.read_text() + "a=1\n")
+    expected = sorted(propertiesfile_to_dict(file).items())
+    for run_size in (0, 10**5, 10**9):
+        monkeypatch.setattr(sys, "stdin", fake_stdin(file.read_bytes()))
+        with SortedProperties(Path("-"), run_size=run_size) as data:
+            assert not data.presorted
+            assert list(data) == expected
@@ -0,0 +1,91 @@
+# pylint: disable=missing-function-docstring,unused-import,redefined-outer-name
+"""
+guard the startup time: modules imported by the library and the cli entrypoints
+"""
+
+import sys
+from subprocess import run
+from typing import Dict
+
+import pytest
+
+from . import samples
+
+HEAVY_MODULES = {
+    "cProfile",
+    "argparse",
+    "colorama",
+    "concurrent.futures.process",
+    "datetime",
+    "hashlib",
+    "importlib.metadata",
+    "pickle",
+    "tempfile",
+}
+# generous budget in microseconds, only meant to catch a new heavy import
+IMPORT_BUDGET = 150000
+
+
+def importtime(code: str) -> Dict[str, int]:
+    """
+    Run python code with -X importtime and return the cumulative import time of
+    every imported module
+    """
+    process = run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    out = {}
+    for line in process.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.split("|")
+            if cumulative.strip().isdigit():
+                out[name.strip()] = int(cumulative)
+    return out
+
+
+@pytest.mark.parametrize(
+    "module",
+    [
+        "properties_tools",
+        "properties_tools.utils",
+        "properties_tools.diffing",
+        "properties_tools.patching",
+        "properties_tools.cache",
+        "properties_tools.index",
+        "properties_tools.merging",
+        "properties_tools.decisions",
+        "properties_tools.sorting",
+    ],
+)
+def test_library_imports(module: str):
+    modules = importtime(f"import {module}")
+    assert module in modules
+    assert HEAVY_MODULES.isdisjoint(modules)
+    assert modules[module] < IMPORT_BUDGET
+
+
+@pytest.mark.parametrize(
+    "module",
+    [
+        "properties_tools.diff",
+        "properties_tools.patch",
+        "properties_tools.get",
+        "properties_tools.timings",
+    ],
+)
+def test_cli_imports(module: str):
+    modules = importtime(f"import {module}")
+    assert HEAVY_MODULES.isdisjoint(modules)
+    assert modules[module] < IMPORT_BUDGET
+
+
+def test_cli_nocolor(samples):
+    modules = importtime(
+        "from properties_tools.diff import run; "
+        f"run(['--nocolor', '{samples / 'sample1.properties'}', '{samples / 'sample2.properties'}'])"
+    )
+    assert "colorama" not in modules
+    assert "importlib.metadata" not in modules
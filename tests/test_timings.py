@@ -0,0 +1,93 @@
+# pylint: disable=missing-function-docstring
+"""
+test for the instrumentation of the cli tools
+"""
+
+import json
+import pstats
+from io import StringIO
+from pathlib import Path
+
+from properties_tools.timings import (
+    PROFILE_ENV,
+    STDERR,
+    TIMINGS_ENV,
+    Timings,
+    env_timings,
+    format_report,
+    instrument,
+)
+
+
+def test_disabled():
+    timings = Timings()
+    items = [1, 2, 3]
+    stream = StringIO()
+    with timings.phase("parse"):
+        assert timings.iterate("parse", items, counter="lines") is not items
+    timings.count("lines")
+    assert timings.stream("print", stream) is stream
+    assert timings.phases == {} and timings.counters == {}
+
+
+def test_phases():
+    timings = Timings(enabled=True, rest="plan")
+    with timings.phase("parse"):
+        # nested in itself, only measured once
+        with timings.phase("parse"):
+            pass
+    assert list(timings.iterate("diff", "abc", counter="changes")) == ["a", "b", "c"]
+    stream = StringIO()
+    timings.stream("print", stream).write("foo")
+    assert stream.getvalue() == "foo"
+    timings.count("keys", 2)
+    timings.count("keys")
+
+    report = timings.report()
+    assert list(report["phases"]) == ["parse", "diff", "print", "plan"]
+    assert abs(sum(report["phases"].values()) - report["total"]) < 1e-6
+    assert report["counters"] == {"changes": 3, "keys": 3}
+    assert report["peak_memory"] is None
+    assert format_report(report).startswith("timings: ")
+
+
+def test_instrument_stderr(capsys, monkeypatch):
+    monkeypatch.delenv(TIMINGS_ENV, raising=False)
+    with instrument() as timings:
+        assert not timings.enabled
+    assert capsys.readouterr().err == ""
+
+    monkeypatch.setenv(TIMINGS_ENV, "1")
+    with instrument(trace_memory=True) as timings:
+        assert timings.enabled
+        timings.count("lines", 42)
+        data = list(range(1000))
+    err = capsys.readouterr().err
+    assert "counters: lines=42" in err
+    assert "peak memory: " in err
+    assert len(data) == 1000
+
+
+def test_env_timings(monkeypatch):
+    monkeypatch.delenv(TIMINGS_ENV, raising=False)
+    assert env_timings() is None
+    for value in ("", "0", "false", "No"):
+        monkeypatch.setenv(TIMINGS_ENV, value)
+        assert env_timings() is None
+    for value in ("1", "true", "YES"):
+        monkeypatch.setenv(TIMINGS_ENV, value)
+        assert env_timings() == STDERR
+    monkeypatch.setenv(TIMINGS_ENV, "timings.json")
+    assert env_timings() == "timings.json"
+
+
+def test_instrument_files(tmp_path: Path, monkeypatch):
+    report, profile = tmp_path / "timings.json", tmp_path / "run.prof"
+    monkeypatch.setenv(PROFILE_ENV, str(profile))
+    with instrument(str(report), rest="plan") as timings:
+        with timings.phase("parse"):
+            sorted(range(1000))
+    data = json.loads(report.read_text())
+    assert list(data["phases"]) == ["parse", "plan"]
+    assert data["peak_memory"] is None
+    assert pstats.Stats(str(profile)).total_calls > 0
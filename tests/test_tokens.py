@@ -0,0 +1,61 @@
+# pylint: disable=missing-function-docstring
+"""
+test for token-level diff of values
+"""
+
+from random import Random
+
+from properties_tools.diffing import ADDED, DELETED
+from properties_tools.tokens import diff_tokens, split_tokens
+
+
+def test_split_tokens():
+    assert split_tokens("-Xmx1g  -Dfoo=bar,a:b") == [
+        "-Xmx1g",
+        "  ",
+        "-Dfoo=bar",
+        ",",
+        "a",
+        ":",
+        "b",
+    ]
+    assert split_tokens("a b", "") == ["a b"]
+    assert split_tokens("") == []
+
+
+def test_diff_tokens():
+    assert diff_tokens(
+        "-Xmx1g -Xms512m -cp a.jar:b.jar", "-Xmx2g -Xms512m -cp a.jar:c.jar:b.jar"
+    ) == [
+        (DELETED, "-Xmx1g"),
+        (ADDED, "-Xmx2g"),
+        (None, " -Xms512m -cp a.jar"),
+        (ADDED, ":c.jar"),
+        (None, ":b.jar"),
+    ]
+    assert diff_tokens("a b", "c d") == [(DELETED, "a b"), (ADDED, "c d")]
+    assert diff_tokens("a,b", "a;b", delimiters=",") == [
+        (DELETED, "a,b"),
+        (ADDED, "a;b"),
+    ]
+
+
+def test_diff_tokens_random():
+    random = Random(0)
+    for _ in range(500):
+        old, new = (
+            " ".join(random.choice("abcd") for _ in range(random.randint(0, 10)))
+            for _ in range(2)
+        )
+        chunks = diff_tokens(old, new)
+        assert "".join(text for tag, text in chunks if tag != ADDED) == old
+        assert "".join(text for tag, text in chunks if tag != DELETED) == new
+
+
+def test_diff_tokens_bounds():
+    random = Random(0)
+    old, new = (" ".join(str(random.random()) for _ in range(2000)) for _ in range(2))
+    assert diff_tokens(old, new) is None
+    assert diff_tokens(old, new, max_edits=10**6, timeout=0) is None
+    assert diff_tokens(old, old + " x", max_size=len(old)) is None
+    assert diff_tokens(old, old + " x", timeout=0) == [(None, old), (ADDED, " x")]
@@ -0,0 +1,331 @@
+# pylint: disable=missing-function-docstring,unused-import,redefined-outer-name
+"""
+test for parsing utils
+"""
+
+import bz2
+import gzip
+import lzma
+import sys
+from io import BufferedReader, RawIOBase, StringIO, TextIOWrapper
+from pathlib import Path
+from random import Random
+
+import pytest
+from properties_tools.utils import (
+    ParsedLine,
+    iter_lines,
+    java_escape,
+    java_unescape,
+    key_filter,
+    key_matcher,
+    open_text,
+    parse_file,
+    parse_file_bulk,
+    parse_file_java,
+    propertiesfile_to_dict,
+)
+
+from . import fake_stdin, samples
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64 * 1024])
+def test_iter_lines(chunk_size: int):
+    for text in ("", "a", "a\n", "a\nb", "a\n\nb\n", "\n\n", "foo=bar\nfoo2=bar2\n"):
+        assert (
+            list(iter_lines(StringIO(text), chunk_size=chunk_size)) == text.splitlines()
+        )
+
+
+def test_parse_file_chunks(samples: Path):
+    for sample in samples.glob("*.properties"):
+        expected = [str(line) for line in parse_file(sample)]
+        assert expected == sample.read_text().splitlines()
+        for chunk_size in (1, 5, 16):
+            assert [
+                str(line) for line in parse_file(sample, chunk_size=chunk_size)
+            ] == expected
+
+
+def test_parse_file_crlf(tmp_path: Path):
+    file = tmp_path / "crlf.properties"
+    file.write_bytes(b"# comment\r\nfoo=bar\r\n\r\nbar=baz")
+    assert [str(line) for line in parse_file(file, chunk_size=1)] == [
+        "# comment",
+        "foo=bar",
+        "",
+        "bar=baz",
+    ]
+
+
+def test_syntax_error_lineno(tmp_path: Path):
+    file = tmp_path / "invalid.properties"
+    file.write_text("foo=bar\n# comment\n\nfoo2=bar2\ninvalid line\n")
+    with pytest.raises(SyntaxError) as error:
+        propertiesfile_to_dict(file)
+    assert error.value.lineno == 5
+    for chunk_size in (1, 4, 1024):
+        with pytest.raises(SyntaxError) as error:
+            list(parse_file(file, chunk_size=chunk_size))
+        assert error.value.lineno == 5
+        assert error.value.text == "invalid line"
+        assert error.value.filename == str(file)
+
+
+def test_parsed_line():
+    line = ParsedLine(' foo.bar = "some value" ')
+    assert line.is_property() and not line.is_comment()
+    assert (line.key, line.value) == ("foo.bar", "some value")
+    assert str(line) == ' foo.bar = "some value" '
+    assert not hasattr(line, "__dict__")
+
+    line = ParsedLine("foo:bar=baz", separator_char=":")
+    assert (line.key, line.value) == ("foo", "bar=baz")
+
+    line = ParsedLine("# foo=bar")
+    assert line.is_comment() and not line.is_property()
+    with pytest.raises(AssertionError):
+        line.key  # pylint: disable=pointless-statement
+
+    line = ParsedLine("")
+    assert not line.is_comment() and not line.is_property()
+
+    assert ParsedLine("foo=bar") == ParsedLine("foo=bar")
+    assert ParsedLine("foo=bar") != ParsedLine("foo = bar")
+
+    with pytest.raises(ValueError):
+        ParsedLine("foo bar")
+
+
+def parse_with(engine: str, file: Path, **kwargs):
+    try:
+        return propertiesfile_to_dict(file, engine=engine, **kwargs)
+    except SyntaxError as error:
+        return (str(error), error.filename, error.lineno, error.text)
+
+
+@pytest.mark.parametrize(
+    "separator,comment_char", [("=", "#"), (":", "!"), ("::", "#"), ("^", "//")]
+)
+def test_engines(tmp_path: Path, separator: str, comment_char: str):
+    rnd = Random(42)
+    alphabet = ["a", "b", " ", "\t", '"', "=", ":", "#", "!", "/", "^", "\x0c"]
+    alphabet += ["\x1c", "\xa0", " ", "\x85", "é"]
+    file = tmp_path / "fuzz.properties"
+    for _ in range(300):
+        lines = []
+        for _ in range(rnd.randint(0, 8)):
+            line = "".join(rnd.choices(alphabet, k=rnd.randint(0, 10)))
+            if rnd.random() < 0.8 and separator not in line:
+                line += separator + line
+            lines.append(line)
+        file.write_text("\n".join(lines) + rnd.choice(["", "\n"]))
+        expected = parse_with(
+            "line", file, separator=separator, comment_char=comment_char
+        )
+        assert (
+            parse_with("regex", file, separator=separator, comment_char=comment_char)
+            == expected
+        ), repr(file.read_text())
+
+
+def test_engines_samples(samples: Path):
+    for sample in samples.glob("*.properties"):
+        assert propertiesfile_to_dict(sample, engine="regex") == propertiesfile_to_dict(
+            sample, engine="line"
+        )
+    with pytest.raises(ValueError):
+        propertiesfile_to_dict(samples / "sample1.properties", engine="foo")
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 64 * 1024])
+def test_bulk_syntax_error(tmp_path: Path, chunk_size: int):
+    file = tmp_path / "invalid.properties"
+    file.write_text("foo=bar\n# comment\n\nfoo2=bar2\ninvalid line\n")
+    with pytest.raises(SyntaxError) as error:
+        parse_file_bulk(file, chunk_size=chunk_size)
+    assert (error.value.lineno, error.value.text) == (5, "invalid line")
+    assert error.value.msg == "Invalid file, no separator found"
+
+
+JAVA_SAMPLE = """# comment
+! bang comment
+   
+key1=value1
+key2 : value2
+key3 value3
+  key4\\ with\\ space = v\\u0041lue\\tx  
+multi = first, \\
+        second, \\
+    third
+trailing\\\\
+smile=\\uD83D\\uDE00
+empty
+e\\:s=1
+last=continued \\
+"""
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 64 * 1024])
+def test_parse_file_java(tmp_path: Path, chunk_size: int):
+    file = tmp_path / "java.properties"
+    file.write_text(JAVA_SAMPLE)
+    lines = list(parse_file_java(file, chunk_size=chunk_size))
+    assert [l.is_comment() for l in lines[:3]] == [True, True, True]
+    assert {l.key: l.value for l in lines if l.is_property()} == {
+        "key1": "value1",
+        "key2": "value2",
+        "key3": "value3",
+        "key4 with space": "vAlue\tx  ",
+        "multi": "first, second, third",
+        "trailing\\": "",
+        "smile": "\U0001f600",
+        "empty": "",
+        "e:s": "1",
+        "last": "continued ",
+    }
+    # continued lines keep their physical lines
+    assert "".join(str(l) + "\n" for l in lines) == JAVA_SAMPLE
+    assert (
+        propertiesfile_to_dict(file, engine="java")["multi"] == "first, second, third"
+    )
+
+
+def test_parse_file_java_syntax_error(tmp_path: Path):
+    file = tmp_path / "invalid.properties"
+    file.write_text("foo=bar\nmulti=a\\\n  b\\\n  \\\\u\\u12\n")
+    with pytest.raises(SyntaxError) as error:
+        list(parse_file_java(file))
+    assert (error.value.lineno, error.value.text) == (4, "  \\\\u\\u12")
+    assert error.value.msg == "Invalid file, malformed \\uxxxx encoding"
+
+
+def test_java_escape():
+    for text in ["a b", "x=y:z#!", "back\\slash", "tab\tnl\n", "  lead", "é"]:
+        assert java_unescape(java_escape(text, key=True)) == text
+        assert java_unescape(java_escape(text)) == text
+    assert java_escape(" a=b") == "\\ a=b"
+    assert java_escape(" a=b", key=True) == "\\ a\\=b"
+
+
+def test_engines_java_samples(samples: Path):
+    for sample in samples.glob("*.properties"):
+        java = propertiesfile_to_dict(sample, engine="java")
+        line = propertiesfile_to_dict(sample)
+        assert list(java) == list(line)
+        # double quotes are part of the value in java properties
+        assert [value.strip('"') for value in java.values()] == list(line.values())
+
+
+def test_key_matcher():
+    assert key_matcher([]) is None
+    matcher = key_matcher(["database.*", "app.?ame"])
+    assert matcher("database.host")
+    assert matcher("app.name")
+    assert not matcher("app.names")
+    assert not matcher("my.database.host")
+    assert not matcher("DATABASE.host")
+
+
+def test_key_filter():
+    assert key_filter() is None
+    keys = key_filter(["database.*", r"re:\.(name|id)$"], ["*.password"])
+    assert keys.match("database.host")
+    assert keys.match("app.name")
+    assert keys.match("app.sub.id")
+    assert not keys.match("app.names")
+    assert not keys.match("database.password")
+    keys = key_filter(exclude=["re:^build\\.", "*.checksum"])
+    assert keys.match("app.name")
+    assert not keys.match("build.timestamp")
+    assert not keys.match("file.checksum")
+    with pytest.raises(ValueError, match="Invalid pattern"):
+        key_filter(["re:["])
+
+
+@pytest.mark.parametrize("engine", ["line", "regex", "java"])
+def test_engines_key_filter(tmp_path: Path, engine: str):
+    file = tmp_path / "filter.properties"
+    file.write_text("# comment\na.x=1\nb.x=2\n\na.y = 3\nc=4\n")
+    keys = key_filter(["a.*", "c"], ["*.y"])
+    assert propertiesfile_to_dict(file, engine=engine, keys=keys) == {
+        "a.x": "1",
+        "c": "4",
+    }
+    # invalid lines are still reported
+    file.write_text("b.x=2\ninvalid\n")
+    if engine != "java":
+        with pytest.raises(SyntaxError):
+            propertiesfile_to_dict(file, engine=engine, keys=keys)
+
+
+def test_open_text(tmp_path: Path, monkeypatch):
+    text = "# café\nkey=välue\n" * 1000
+    files = {
+        "plain": text.encode(),
+        "gz": gzip.compress(text.encode()),
+        "bz2": bz2.compress(text.encode()),
+        "xz": lzma.compress(text.encode()),
+    }
+    for suffix, data in files.items():
+        file = tmp_path / f"file.{suffix}"
+        file.write_bytes(data)
+        with open_text(file) as stream:
+            assert stream.read() == text
+        monkeypatch.setattr(sys, "stdin", fake_stdin(data))
+        with open_text(Path("-")) as stream:
+            assert stream.read() == text
+        # the standard input is left open, and empty
+        assert not sys.stdin.buffer.closed
+        with open_text(Path("-")) as stream:
+            assert stream.read() == ""
+
+    file = tmp_path / "latin1.properties"
+    file.write_bytes(lzma.compress(text.encode("latin-1")))
+    with open_text(file, encoding="latin-1") as stream:
+        assert stream.read() == text
+    with pytest.raises(UnicodeDecodeError):
+        propertiesfile_to_dict(file)
+
+
+@pytest.mark.parametrize("engine", ["line", "regex", "java"])
+def test_engines_stdin(samples: Path, monkeypatch, engine: str):
+    sample = samples / "sample1.properties"
+    monkeypatch.setattr(sys, "stdin", fake_stdin(gzip.compress(sample.read_bytes())))
+    assert propertiesfile_to_dict(Path("-"), engine=engine) == propertiesfile_to_dict(
+        sample, engine=engine
+    )
+
+
+class OneByteReader(RawIOBase):
+    """
+    Pipe delivering one byte per read
+    """
+
+    def __init__(self, data: bytes):
+        super().__init__()
+        self.data = data
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if not self.data:
+            return 0
+        buffer[0], self.data = self.data[0], self.data[1:]
+        return 1
+
+
+def test_open_text_slow_stdin(monkeypatch):
+    text = "key=välue\n" * 100
+    # the first read is shorter than the magic bytes, or the whole input is
+    for data, expected in (
+        (gzip.compress(text.encode()), text),
+        (text.encode(), text),
+        (b"a=1", "a=1"),
+    ):
+        stdin = TextIOWrapper(BufferedReader(OneByteReader(data)))  # type: ignore
+        monkeypatch.setattr(sys, "stdin", stdin)
+        with open_text(Path("-")) as stream:
+            assert stream.read() == expected
+        assert not sys.stdin.buffer.closed